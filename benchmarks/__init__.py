@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+r"""
+Benchmarks for `pylatexenc` (not installed with the package).
+
+Measures the throughput and peak memory of
+``LatexWalker.get_latex_nodes()``, ``LatexNodes2Text.latex_to_text()``,
+``LatexWalker.extract_latex_nodes()`` and
+``UnicodeToLatexEncoder.unicode_to_latex()`` on generated corpora (see
+:py:mod:`benchmarks.corpora`).  Run from the root of the source tree with::
+
+    python -m benchmarks --output results.json
+
+and compare with the results of an earlier version with::
+
+    python -m benchmarks --baseline results.json
+
+See ``python -m benchmarks --help`` for more options.
+"""
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+from __future__ import print_function, unicode_literals
+
+import sys
+import io
+import json
+import argparse
+
+from . import corpora as _corpora
+from . import runner
+
+
+def main(argv=None):
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Measure the performance of pylatexenc on generated corpora."
+    )
+
+    parser.add_argument('--size', type=int, default=200000,
+                        help="Approximate number of characters of each corpus "
+                        "(default %(default)d)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Number of timed runs of each benchmark; the best time "
+                        "is reported (default %(default)d)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Random seed for generating the corpora (default %(default)d)")
+    parser.add_argument('--corpus', action='append', dest='corpus_names',
+                        choices=[ name for (name, _) in _corpora.corpora ],
+                        help="Only use the given corpus (may be repeated)")
+    parser.add_argument('--benchmark', action='append', dest='benchmark_names',
+                        choices=[ name for (name, _) in runner.benchmarks ],
+                        help="Only run the given benchmark (may be repeated)")
+    parser.add_argument('--no-memory', action='store_false', dest='measure_memory',
+                        default=True,
+                        help="Don't measure the peak memory (which requires an "
+                        "additional, slower run)")
+    parser.add_argument('--output', '-o', metavar='FILE',
+                        help="Save the results as JSON in FILE")
+    parser.add_argument('--baseline', '-b', metavar='FILE',
+                        help="Compare the results with the JSON results saved in FILE; "
+                        "the exit status is 1 if there are regressions")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Relative decrease of throughput, or increase of peak "
+                        "memory, that is reported as a regression (default %(default)s)")
+
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        # read it first, in case it doesn't exist
+        with io.open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = runner.run_benchmarks(
+        size=args.size,
+        repeat=args.repeat,
+        corpus_names=args.corpus_names,
+        benchmark_names=args.benchmark_names,
+        measure_memory=args.measure_memory,
+        seed=args.seed,
+        log=print,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        (lines, regressions) = runner.compare_results(results, baseline,
+                                                      tolerance=args.tolerance)
+        print()
+        print("Compared with {} (pylatexenc {}):".format(
+            args.baseline, baseline['info'].get('pylatexenc_version')
+        ))
+        for line in lines:
+            print(line)
+        if regressions:
+            print("{} regression(s)".format(len(regressions)))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+r"""
+Generated corpora for the benchmarks.
+
+Each corpus generator is called as ``generate(size, rng)``, where `size` is
+the approximate total number of characters to generate and `rng` is a
+``random.Random`` instance, and returns a list of LaTeX strings.  Most
+corpora consist of a single document; the ``bibtex_fields`` corpus consists
+of many tiny strings, like the fields of a bibliography database.
+
+The generators only use `rng` for randomness, so that the corpora are the
+same on every run and the results can be compared against a baseline.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import os.path
+import io
+
+
+_words = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+    'tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam '
+    'quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo '
+    'consequat duis aute irure in reprehenderit voluptate velit esse cillum '
+    'eu fugiat nulla pariatur excepteur sint occaecat cupidatat non proident '
+    'sunt culpa qui officia deserunt mollit anim id est laborum'
+).split()
+
+
+def _text(rng, nwords):
+    return ' '.join(rng.choice(_words) for _ in range(nwords))
+
+
+def _fill(size, make_piece, sep='\n\n'):
+    # concatenate pieces until the total size is reached
+    pieces = []
+    n = 0
+    while n < size:
+        p = make_piece(len(pieces))
+        pieces.append(p)
+        n += len(p) + len(sep)
+    return [ sep.join(pieces) ]
+
+
+def nested_groups(size, rng):
+    def piece(i):
+        depth = rng.randint(5, 40)
+        return (
+            ''.join('{' + _text(rng, 1) + ' ' for _ in range(depth))
+            + _text(rng, 3)
+            + ''.join(' }' for _ in range(depth))
+        )
+    return _fill(size, piece, sep=' ')
+
+
+_math_pieces = (
+    r'$x_{%(i)d}^2 + y_{%(i)d}^2 = z^2$',
+    r'$\alpha + \beta \leq \frac{\gamma}{\delta_{%(i)d}}$',
+    r'\( \sum_{k=1}^{n} k = \frac{n(n+1)}{2} \)',
+    r'$$\int_0^\infty e^{-x^2}\,dx = \frac{\sqrt{\pi}}{2}$$',
+    '\\begin{equation}\n  \\mathbf{A}\\vec{v}_{%(i)d} = \\lambda \\vec{v}_{%(i)d}\n'
+    '\\end{equation}',
+    '\\begin{align}\n  a &= b + c \\\\\n  \\hat{d} &\\approx \\tilde{e}^{%(i)d}\n'
+    '\\end{align}',
+    r'\[ \left( \begin{array}{cc} 1 & 0 \\ 0 & 1 \end{array} \right) \]',
+)
+
+def math_heavy(size, rng):
+    def piece(i):
+        return ' '.join(
+            [ _text(rng, 4) ]
+            + [ rng.choice(_math_pieces)%{'i': i} + ' ' + _text(rng, 2)
+                for _ in range(rng.randint(2, 5)) ]
+        )
+    return _fill(size, piece)
+
+
+def environments(size, rng):
+    names = ('itemize', 'enumerate', 'center', 'quote', 'minipage', 'figure')
+    def piece(i):
+        envs = [ rng.choice(names) for _ in range(rng.randint(1, 4)) ]
+        return (
+            ''.join('\\begin{%s}\n'%(e) for e in envs)
+            + ''.join('\\item %s\n'%(_text(rng, 3)) for _ in range(rng.randint(1, 4)))
+            + ''.join('\\end{%s}\n'%(e) for e in reversed(envs))
+        )
+    return _fill(size, piece, sep='')
+
+
+def long_comments(size, rng):
+    def piece(i):
+        if rng.random() < 0.6:
+            return '%' + _text(rng, rng.randint(20, 60))
+        return _text(rng, 8) + ' % ' + _text(rng, 10)
+    return _fill(size, piece, sep='\n')
+
+
+_accents = (
+    r"\'e", r'\`a', r'\^o', r'\"u', r'\~n', r'\c{c}', r'\v{s}', r'\H{o}',
+    r'\aa', r'\o', r'\ss', r'\AE', r'\l', r'\i', r'\={a}', r'\.{z}',
+)
+_specials = ( '~', '--', '---', "``", "''", '\\&', '\\%', '\\$', '\\#',
+              '\\_', '\\{', '\\}', '\\\\', '!`', '?`', '\\,', '\\;' )
+
+def specials_accents(size, rng):
+    def piece(i):
+        out = []
+        for _ in range(12):
+            r = rng.random()
+            if r < 0.4:
+                out.append(rng.choice(_words))
+            elif r < 0.7:
+                w = rng.choice(_words)
+                k = rng.randint(0, len(w))
+                out.append(w[:k] + '{' + rng.choice(_accents) + '}' + w[k:])
+            else:
+                out.append(rng.choice(_specials))
+        return ' '.join(out)
+    return _fill(size, piece, sep='\n')
+
+
+def verbatim_listings(size, rng):
+    def code(n):
+        return '\n'.join(
+            '  if (a[%d] < b) { x = {%s}; } %% \\not{parsed} $'%(k, rng.choice(_words))
+            for k in range(n)
+        )
+    def piece(i):
+        r = rng.random()
+        if r < 0.4:
+            return '\\begin{verbatim}\n%s\n\\end{verbatim}'%(code(rng.randint(3, 15)))
+        if r < 0.7:
+            return '\\begin{lstlisting}[language=C]\n%s\n\\end{lstlisting}'%(
+                code(rng.randint(3, 15))
+            )
+        return '%s \\verb+\\x{%d}+ %s'%(_text(rng, 6), i, _text(rng, 6))
+    return _fill(size, piece)
+
+
+def bibtex_fields(size, rng):
+    # many tiny strings, like the fields of BibTeX entries
+    templates = (
+        lambda: '{%s} and {%s}'%(_name(rng), _name(rng)),
+        lambda: 'Proc. {IEEE} Conf. on {%s} %s'%(_text(rng, 2).title(), _text(rng, 1)),
+        lambda: r'On the $\mathcal{O}(n \log n)$ {%s} of %s'%(_text(rng, 1), _text(rng, 2)),
+        lambda: _name(rng),
+        lambda: '%d--%d'%(rng.randint(1, 500), rng.randint(501, 999)),
+        lambda: r'\emph{%s} \& %s'%(_text(rng, 2), _text(rng, 2)),
+    )
+    strings = []
+    n = 0
+    while n < size:
+        s = rng.choice(templates)()
+        strings.append(s)
+        n += len(s)
+    return strings
+
+def _name(rng):
+    first = rng.choice(('Jos{\\\'e}', 'J{\\"u}rgen', 'Fran{\\c c}ois', 'Anna',
+                        'S{\\o}ren', '\\AA{}sa', 'Zo{\\"e}', 'Li'))
+    last = rng.choice(('M{\\"u}ller', 'Gar{\\c{c}}{\\\'\\i}a', 'Smith', 'Dvo{\\v r}{\\\'a}k',
+                       '{\\L}ukasiewicz', 'Nakamura', '{van der Waals}'))
+    return first + ' ' + last
+
+
+def article(size, rng):
+    # a "realistic" mixture, resembling a paper
+    gens = (math_heavy, environments, specials_accents, verbatim_listings)
+    preamble = (
+        '\\documentclass{article}\n\\usepackage{amsmath}\n'
+        '\\title{%s}\n\\author{%s}\n\\begin{document}\n\\maketitle\n'
+        '\\begin{abstract}\n%s\n\\end{abstract}\n'
+    )%(_text(rng, 6).title(), _name(rng), _text(rng, 60))
+    def piece(i):
+        r = rng.random()
+        if r < 0.15:
+            return '\\section{%s}\\label{sec:%d}'%(_text(rng, 3).title(), i)
+        if r < 0.55:
+            return '%s~\\cite{ref%d} %s, see Section~\\ref{sec:%d}.'%(
+                _text(rng, 30), i, _text(rng, 20), rng.randint(0, i)
+            )
+        gen = rng.choice(gens)
+        return gen(rng.randint(100, 600), rng)[0]
+    body = _fill(size, piece)[0]
+    return [ preamble + body + '\n\\end{document}\n' ]
+
+
+def test_input(size, rng):
+    # the LaTeX file used by the unit tests, repeated
+    fn = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'test', 'test_input_1.tex')
+    with io.open(fn, encoding='utf-8') as f:
+        s = f.read()
+    return [ s * max(1, size // len(s)) ]
+
+
+corpora = [
+    ('nested_groups', nested_groups),
+    ('math_heavy', math_heavy),
+    ('environments', environments),
+    ('long_comments', long_comments),
+    ('specials_accents', specials_accents),
+    ('verbatim_listings', verbatim_listings),
+    ('bibtex_fields', bibtex_fields),
+    ('article', article),
+    ('test_input', test_input),
+]
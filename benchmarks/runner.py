@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+r"""
+Running the benchmarks and comparing results against a baseline.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import gc
+import time
+import random
+import platform
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+try:
+    _clock = time.perf_counter
+except AttributeError:
+    # Python 2
+    _clock = time.time
+
+from pylatexenc.version import version_str
+from pylatexenc.latexwalker import LatexWalker, LatexWalkerEndOfStream
+from pylatexenc.latexwalker._helpers import _push_child_nodes
+from pylatexenc.latex2text import LatexNodes2Text
+from pylatexenc.latexencode import UnicodeToLatexEncoder
+
+from . import corpora as _corpora
+
+
+
+def count_tokens(s):
+    r"""
+    Return the number of tokens in `s`, as read one after the other by
+    :py:meth:`LatexWalker.get_token()` in the default parsing state.  This is
+    the amount of lexical work in the string; the parser may read some tokens
+    more than once, or read verbatim contents without tokenizing them.
+    """
+    lw = LatexWalker(s)
+    n = 0
+    pos = 0
+    while True:
+        try:
+            tok = lw.get_token(pos, chars_run=True)
+        except LatexWalkerEndOfStream:
+            return n
+        n += 1
+        pos = tok.pos + tok.len
+
+
+def count_nodes(nodelist):
+    r"""
+    Return the total number of nodes in the node tree(s) `nodelist`.
+    """
+    n = 0
+    stack = list(nodelist)
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        n += 1
+        _push_child_nodes(stack, node)
+    return n
+
+
+
+class Benchmark(object):
+    r"""
+    A function to measure on each corpus.
+
+    Subclasses implement `setup(strings)`, which prepares the input of the
+    benchmark from the corpus strings and returns the tuple `(inputs, chars,
+    tokens, nodes)` describing the amount of work in the inputs (`tokens` and
+    `nodes` may be `None`), and `run(inputs)`, which is timed.
+    """
+    name = None
+
+    def setup(self, strings):
+        raise NotImplementedError()
+
+    def run(self, inputs):
+        raise NotImplementedError()
+
+
+class GetLatexNodesBenchmark(Benchmark):
+    name = 'latexwalker'
+
+    def setup(self, strings):
+        nodes = sum(count_nodes(LatexWalker(s).get_latex_nodes()[0]) for s in strings)
+        tokens = sum(count_tokens(s) for s in strings)
+        return (strings, sum(len(s) for s in strings), tokens, nodes)
+
+    def run(self, inputs):
+        for s in inputs:
+            LatexWalker(s).get_latex_nodes()
+
+
+class LatexToTextBenchmark(GetLatexNodesBenchmark):
+    name = 'latex2text'
+
+    def setup(self, strings):
+        self.l2t = LatexNodes2Text()
+        return super(LatexToTextBenchmark, self).setup(strings)
+
+    def run(self, inputs):
+        l2t = self.l2t
+        for s in inputs:
+            l2t.latex_to_text(s)
+
+
+class ExtractLatexNodesBenchmark(GetLatexNodesBenchmark):
+    name = 'extract'
+
+    macronames = ('title', 'author', 'cite', 'label')
+    environmentnames = ('abstract',)
+
+    def run(self, inputs):
+        macronames = self.macronames
+        environmentnames = self.environmentnames
+        for s in inputs:
+            LatexWalker(s).extract_latex_nodes(macronames, environmentnames)
+
+
+class UnicodeToLatexBenchmark(Benchmark):
+    name = 'latexencode'
+
+    def setup(self, strings):
+        # encode the text that latex2text produces from the corpus, which
+        # contains the accented characters and symbols of the corpus
+        l2t = LatexNodes2Text()
+        inputs = [ l2t.latex_to_text(s) for s in strings ]
+        self.encoder = UnicodeToLatexEncoder(unknown_char_policy='keep',
+                                             unknown_char_warning=False)
+        return (inputs, sum(len(s) for s in inputs), None, None)
+
+    def run(self, inputs):
+        encoder = self.encoder
+        for s in inputs:
+            encoder.unicode_to_latex(s)
+
+
+benchmarks = [
+    ('latexwalker', GetLatexNodesBenchmark),
+    ('latex2text', LatexToTextBenchmark),
+    ('extract', ExtractLatexNodesBenchmark),
+    ('latexencode', UnicodeToLatexBenchmark),
+]
+
+
+
+def _measure_time(run, inputs, repeat):
+    # best of `repeat` runs, which is the least affected by other activity
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = _clock()
+        run(inputs)
+        dt = _clock() - t0
+        if best is None or dt < best:
+            best = dt
+    return best
+
+
+def _measure_peak_memory(run, inputs):
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(inputs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(size=200000, repeat=3, corpus_names=None, benchmark_names=None,
+                   measure_memory=True, seed=0, log=None):
+    r"""
+    Run the benchmarks `benchmark_names` (all benchmarks by default) on the
+    corpora `corpus_names` (all corpora by default), each generated with
+    approximately `size` characters.
+
+    Returns a dictionary which can be saved as JSON, with keys ``'info'``
+    (describing the python version, `pylatexenc` version and parameters) and
+    ``'results'``, a dictionary mapping ``'<benchmark>/<corpus>'`` to a
+    dictionary with the measured ``time`` (in seconds), the size of the input
+    (``chars``, ``tokens``, ``nodes``), the throughput (``chars_per_s``,
+    ``tokens_per_s``, ``nodes_per_s``) and the ``peak_memory`` (in bytes).
+    """
+    if log is None:
+        log = lambda msg: None
+
+    results = {}
+    for (corpus_name, generate) in _corpora.corpora:
+        if corpus_names and corpus_name not in corpus_names:
+            continue
+        strings = generate(size, random.Random(seed))
+        for (benchmark_name, benchmark_class) in benchmarks:
+            if benchmark_names and benchmark_name not in benchmark_names:
+                continue
+            benchmark = benchmark_class()
+            (inputs, chars, tokens, nodes) = benchmark.setup(strings)
+            t = _measure_time(benchmark.run, inputs, repeat)
+            peak_memory = None
+            if measure_memory:
+                peak_memory = _measure_peak_memory(benchmark.run, inputs)
+            r = {
+                'time': t,
+                'chars': chars,
+                'tokens': tokens,
+                'nodes': nodes,
+                'chars_per_s': chars / t if t else None,
+                'tokens_per_s': tokens / t if t and tokens is not None else None,
+                'nodes_per_s': nodes / t if t and nodes is not None else None,
+                'peak_memory': peak_memory,
+            }
+            key = benchmark_name + '/' + corpus_name
+            results[key] = r
+            log(format_result(key, r))
+
+    return {
+        'info': {
+            'pylatexenc_version': version_str,
+            'python_version': platform.python_version(),
+            'python_implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'size': size,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def _fmt_rate(x):
+    if x is None:
+        return '-'
+    for (factor, unit) in ((1e9, 'G'), (1e6, 'M'), (1e3, 'k')):
+        if x >= factor:
+            return '%.2f%s'%(x / factor, unit)
+    return '%.1f'%(x)
+
+
+def _fmt_bytes(x):
+    if x is None:
+        return '-'
+    return '%.1fMiB'%(x / 1048576.0)
+
+
+def format_result(key, r):
+    return '{:<32} {:>9.4f}s  {:>9} chars/s  {:>9} tokens/s  {:>9} nodes/s  {:>9} peak'.format(
+        key, r['time'], _fmt_rate(r['chars_per_s']), _fmt_rate(r['tokens_per_s']),
+        _fmt_rate(r['nodes_per_s']), _fmt_bytes(r['peak_memory'])
+    )
+
+
+def compare_results(results, baseline, tolerance=0.1):
+    r"""
+    Compare `results` against `baseline` (both as returned by
+    :py:func:`run_benchmarks()`).  Returns a tuple `(lines, regressions)`,
+    where `lines` describes the comparison for each benchmark found in both,
+    and `regressions` is a list of the keys of the benchmarks whose throughput
+    decreased, or whose peak memory increased, by more than the fraction
+    `tolerance` of the baseline value.
+
+    Only results obtained with the same corpus size and seed can be compared
+    meaningfully; a warning line is included if they differ.
+    """
+    lines = []
+    regressions = []
+
+    for k in ('size', 'seed'):
+        if results['info'].get(k) != baseline['info'].get(k):
+            lines.append("Warning: baseline was obtained with {}={!r} (now {!r})".format(
+                k, baseline['info'].get(k), results['info'].get(k)
+            ))
+
+    base_results = baseline['results']
+    for key in sorted(results['results']):
+        if key not in base_results:
+            continue
+        r = results['results'][key]
+        b = base_results[key]
+
+        speed = r['chars_per_s'] / b['chars_per_s']
+        regressed = speed < 1.0 - tolerance
+        line = '{:<32} speed {:>+7.1%}'.format(key, speed - 1.0)
+
+        if r.get('peak_memory') and b.get('peak_memory'):
+            mem = float(r['peak_memory']) / b['peak_memory']
+            regressed = regressed or mem > 1.0 + tolerance
+            line += '  peak memory {:>+7.1%}'.format(mem - 1.0)
+
+        if regressed:
+            regressions.append(key)
+            line += '  REGRESSION'
+        lines.append(line)
+
+    return (lines, regressions)
@@ -31,6 +31,16 @@
 import bisect
 bisect_right_nodupl = bisect.bisect_right
 
+import collections
+import multiprocessing
+import time
+
+try:
+    _clock = time.perf_counter
+except AttributeError:
+    # Python 2
+    _clock = time.time
+
 
 # ------------------------------------------------------------------------------
 
@@ -106,6 +116,259 @@ class PushPropOverride(object):
 
 
 
+# ------------------------------------------------------------------------------
+
+
+def _iter_chunks(iterable, chunksize):
+    chunk = []
+    for x in iterable:
+        chunk.append(x)
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# the function created by make_function() in each worker process
+_batch_worker_function = None
+
+def _batch_worker_init(make_function, make_function_args):
+    global _batch_worker_function
+    _batch_worker_function = make_function(*make_function_args)
+
+def _batch_worker_run(chunk):
+    fn = _batch_worker_function
+    return [ fn(x) for x in chunk ]
+
+
+def batch_map(make_function, make_function_args, iterable, jobs=1, chunksize=None):
+    r"""
+    Yield `fn(x)` for each item `x` of `iterable`, in the same order, where the
+    function `fn = make_function(*make_function_args)` is created only once in
+    each worker process.
+
+    If `jobs` is 1, everything happens in the current process.  Otherwise, the
+    items are sent to `jobs` worker processes (or as many as there are CPUs if
+    `jobs` is `None`) in chunks of `chunksize` items, to keep the
+    communication overhead low.  Only a few chunks per worker are sent in
+    advance, so that `iterable` is consumed as the results are needed.
+
+    The function `make_function` must be a module-level function, and its
+    arguments and the items and results must be picklable (the arguments
+    needn't be if worker processes are forked).
+    """
+    if jobs == 1:
+        fn = make_function(*make_function_args)
+        for x in iterable:
+            yield fn(x)
+        return
+
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    if chunksize is None:
+        chunksize = 64
+
+    pool = multiprocessing.Pool(jobs, initializer=_batch_worker_init,
+                                initargs=(make_function, make_function_args))
+    try:
+        pending = collections.deque()
+        for chunk in _iter_chunks(iterable, chunksize):
+            pending.append(pool.apply_async(_batch_worker_run, (chunk,)))
+            if len(pending) >= 4*jobs:
+                for r in pending.popleft().get():
+                    yield r
+        while pending:
+            for r in pending.popleft().get():
+                yield r
+        pool.close()
+    finally:
+        # stops the workers if the caller stopped iterating early or if there
+        # was an error
+        pool.terminate()
+        pool.join()
+
+
+
+# ------------------------------------------------------------------------------
+
+
+class PerformanceStats(object):
+    r"""
+    Counters and timings which describe where the work goes when parsing LaTeX
+    code, converting it to text, or encoding unicode text into LaTeX.
+
+    Provide an instance as the `stats=` argument to
+    :py:class:`pylatexenc.latexwalker.LatexWalker`,
+    :py:class:`pylatexenc.latex2text.LatexNodes2Text` and/or
+    :py:class:`pylatexenc.latexencode.UnicodeToLatexEncoder`; the same
+    instance can be shared by several objects, in which case the counts add
+    up.  If no `stats=` object is specified (the default), none of the code
+    that collects the statistics is run at all.
+
+    Statistics are only collected in the current process (work that is sent
+    to worker processes, e.g. with `jobs=` arguments, is not counted).
+
+    The following attributes are dictionaries mapping a key to a count or to a
+    time in seconds.  Macros are designated by keys of the form
+    ``'\macroname'``, environments by keys of the form
+    ``'\begin{envname}'`` and specials by their specials characters.
+
+    .. py:attribute:: tokens
+
+       The number of tokens read by
+       :py:meth:`~pylatexenc.latexwalker.LatexWalker.get_token()`, by token
+       type (see :py:class:`~pylatexenc.latexwalker.LatexToken`).  Tokens that
+       the parser reads several times (e.g., while looking ahead for optional
+       arguments) are counted each time.
+
+    .. py:attribute:: nodes
+
+       The number of nodes created, by node class name (e.g.,
+       ``'LatexMacroNode'``).
+
+    .. py:attribute:: args_calls
+    .. py:attribute:: args_time
+
+       The number of times the arguments of each macro, environment or
+       specials were parsed, and the total time spent doing so.  The time
+       includes parsing any macros contained in the arguments, so nested
+       constructs are counted more than once.  Macros, environments and
+       specials which don't accept any arguments are also listed.
+
+    .. py:attribute:: simplify_repl_calls
+    .. py:attribute:: simplify_repl_time
+
+       The number of calls to, and the total time spent in, the callable
+       `simplify_repl` of each macro, environment or specials by
+       :py:class:`~pylatexenc.latex2text.LatexNodes2Text`.  (These callables
+       typically convert their arguments to text, so the time of nested
+       callables is also included in the outer one.)
+
+    .. py:attribute:: encoder_rule_hits
+
+       The number of replacements made by each conversion rule of
+       :py:class:`~pylatexenc.latexencode.UnicodeToLatexEncoder`.  The key is
+       a string of the form ``'<index>:<name>'``, where `index` is the
+       position of the rule after built-in rule sets are expanded, and `name`
+       is the name of the built-in rule set (e.g., ``'defaults'``) or the type
+       of the custom rule (``'dict'``, ``'regex'`` or ``'callable'``).
+
+    The following attribute is a simple count:
+
+    .. py:attribute:: recovered_errors
+
+       The number of parse errors which were ignored in tolerant parsing
+       mode.
+
+    .. versionadded:: 2.11
+
+       This class was introduced in `pylatexenc 2.11`.
+    """
+    def __init__(self):
+        super(PerformanceStats, self).__init__()
+        self.reset()
+
+    def reset(self):
+        r"""
+        Set all counters and timings to zero.
+        """
+        self.tokens = {}
+        self.nodes = {}
+        self.args_calls = {}
+        self.args_time = {}
+        self.recovered_errors = 0
+        self.simplify_repl_calls = {}
+        self.simplify_repl_time = {}
+        self.encoder_rule_hits = {}
+
+    def format_report(self):
+        r"""
+        Return a human-readable summary of the collected statistics, as a
+        string with several lines.  Timings are listed from the largest to the
+        smallest.  Empty categories are omitted.
+        """
+        lines = []
+
+        def add_counts(title, counts):
+            if not counts:
+                return
+            lines.append("{} (total {}):".format(title, sum(counts.values())))
+            for k in sorted(counts, key=lambda k: (-counts[k], k)):
+                lines.append("  {:<40} {:>10}".format(k, counts[k]))
+
+        def add_timings(title, calls, times):
+            if not times:
+                return
+            lines.append("{} (total {:.6f}s):".format(title, sum(times.values())))
+            for k in sorted(times, key=lambda k: (-times[k], k)):
+                lines.append("  {:<40} {:>10} calls {:>12.6f}s".format(k, calls[k], times[k]))
+
+        add_counts("Tokens", self.tokens)
+        add_counts("Nodes", self.nodes)
+        add_timings("Argument parsing", self.args_calls, self.args_time)
+        if self.recovered_errors:
+            lines.append("Recovered parse errors: {}".format(self.recovered_errors))
+        add_timings("simplify_repl callables", self.simplify_repl_calls,
+                    self.simplify_repl_time)
+        add_counts("Encoder rule hits", self.encoder_rule_hits)
+
+        return "\n".join(lines)
+
+    # (INTERNAL.) Instrumentation hooks.  The objects which collect statistics
+    # only call these if they were given a stats object.
+
+    @staticmethod
+    def _key(what_kind, what_name):
+        if what_kind == 'macro':
+            return '\\' + what_name
+        if what_kind == 'environment':
+            return '\\begin{' + what_name + '}'
+        return what_name
+
+    _clock = staticmethod(_clock)
+
+    def _add_args_time(self, what_kind, what_name, t0):
+        dt = _clock() - t0
+        key = self._key(what_kind, what_name)
+        self.args_calls[key] = self.args_calls.get(key, 0) + 1
+        self.args_time[key] = self.args_time.get(key, 0.0) + dt
+
+    def _add_simplify_repl_time(self, what_kind, what_name, t0):
+        dt = _clock() - t0
+        key = self._key(what_kind, what_name)
+        self.simplify_repl_calls[key] = self.simplify_repl_calls.get(key, 0) + 1
+        self.simplify_repl_time[key] = self.simplify_repl_time.get(key, 0.0) + dt
+
+    def _wrap_get_token(self, get_token):
+        tokens = self.tokens
+        def counting_get_token(*args, **kwargs):
+            tok = get_token(*args, **kwargs)
+            t = tok.tok
+            if t is not None: # not an _EndOfStreamToken
+                tokens[t] = tokens.get(t, 0) + 1
+            return tok
+        return counting_get_token
+
+    def _wrap_make_node(self, make_node):
+        nodes = self.nodes
+        def counting_make_node(node_class, **kwargs):
+            k = node_class.__name__
+            nodes[k] = nodes.get(k, 0) + 1
+            return make_node(node_class, **kwargs)
+        return counting_make_node
+
+    def _wrap_encoder_rule(self, compiled_rule, key):
+        encoder_rule_hits = self.encoder_rule_hits
+        def counting_rule(s, p):
+            if compiled_rule(s, p):
+                encoder_rule_hits[key] = encoder_rule_hits.get(key, 0) + 1
+                return True
+            return None
+        return counting_rule
+
+
+
 # ------------------------------------------------------------------------------
 
 
@@ -47,6 +47,7 @@ from __future__ import print_function, unicode_literals
 import re
 import inspect
 import textwrap
+import functools
 
 
 # for Py3
@@ -71,6 +72,7 @@ _python_is_narrow_build = (sys.maxunicode < 0x10FFFF)
 from .. import latexwalker
 from .. import macrospec
 from .. import _util
+from ..macrospec._latexcontextdb import _get_shared_latex_context_db
 
 import logging
 logger = logging.getLogger(__name__)
@@ -676,9 +678,17 @@ def _parse_strict_latex_spaces_dict(strict_latex_spaces):
 
 from ._inputlatexfile import read_latex_file
 
+from .._util import PerformanceStats
 
 
 
+
+def _func(f):
+    # the plain function object behind a method (Py2 unbound methods are
+    # created anew on each attribute access)
+    return getattr(f, '__func__', f)
+
+
 class LatexNodes2Text(object):
     r"""
     Simplistic Latex-To-Text Converter.
@@ -699,10 +709,32 @@ class LatexNodes2Text(object):
       :py:class:`EnvironmentTextSpec`, and :py:class:`SpecialsTextSpec` objects.
 
       The default latex context database can be obtained using
-      :py:func:`get_default_latex_context_db()`.
+      :py:func:`get_default_latex_context_db()`.  If `latex_context` is not
+      specified or `None`, then the default database is used; it is created
+      only once and the same frozen (read-only) instance is shared by all
+      `LatexNodes2Text` instances.  If you need to modify the latex context,
+      get your own copy by calling :py:func:`get_default_latex_context_db()`
+      and specify it here explicitly, or use the `shared_default_context=False`
+      flag.
+
+      .. versionchanged:: 2.11
+
+         The default latex context is now a shared, frozen instance.
 
     Additional keyword arguments are flags which may influence the behavior:
 
+    - `shared_default_context=True|False`: If set to `False`, and if no
+      `latex_context` is specified, then this object uses its own modifiable
+      copy of the default latex context (as returned by
+      :py:func:`get_default_latex_context_db()`) instead of the shared frozen
+      instance, like in earlier versions of `pylatexenc`.  Its definitions can
+      then be changed, e.g., via
+      ``l2t.latex_context.add_context_category(...)``.
+
+      .. versionadded:: 2.11
+
+         The `shared_default_context` flag was introduced in `pylatexenc 2.11`.
+
     - `math_mode='text'|'with-delimiters'|'verbatim'|'remove'`: Specify how to
       treat chunks of LaTeX code that correspond to math modes.  If 'text' (the
       default), then the math mode contents is incorporated as normal text.  If
@@ -791,6 +823,22 @@ class LatexNodes2Text(object):
       ``étonnant`` but ``{\'etonnant}``
       becomes ``{étonnant}``.
 
+    - `parse_cache=None|LatexParseCache`: If set to a
+      :py:class:`pylatexenc.latexwalker.LatexParseCache` instance, then the
+      results of :py:meth:`latex_to_text()` are stored in and retrieved from
+      this cache.  (Results are not cached if a directory for input files was
+      set with :py:meth:`set_tex_input_directory()`, or if
+      :py:meth:`read_input_file()` is overridden.)
+
+    - `stats=None|PerformanceStats`: If set to a
+      :py:class:`pylatexenc.latexwalker.PerformanceStats` instance, then the
+      number of calls to, and the time spent in, the callable `simplify_repl`
+      of each macro, environment and specials are recorded in this object.
+      This object is also given to the
+      :py:class:`~pylatexenc.latexwalker.LatexWalker` created by
+      :py:meth:`latex_to_text()` (unless you specify another `stats=` object
+      in its `parse_flags`).
+
     .. versionadded: 1.4
 
        Added the `strict_latex_spaces`, `keep_braced_groups`, and
@@ -803,6 +851,10 @@ class LatexNodes2Text(object):
 
        Added the `fill_text=` flag.
 
+    .. versionadded: 2.11
+
+       Added the `parse_cache=` and `stats=` flags.
+
     Additionally, the following arguments are accepted for backwards compatibility:
 
     - `keep_inline_math=True|False`: Obsolete since `pylatexenc 2`.  If set to
@@ -843,6 +895,8 @@ class LatexNodes2Text(object):
     def __init__(self, latex_context=None, **flags):
         super(LatexNodes2Text, self).__init__()
 
+        shared_default_context = flags.pop('shared_default_context', True)
+
         if latex_context is None:
             if 'macro_dict' in flags or 'env_dict' in flags:
                 # LEGACY -- build a latex context using the given macro_dict
@@ -861,10 +915,13 @@ class LatexNodes2Text(object):
                                                    environments=env_dict.values(),
                                                    specials=[])
 
-            else:
-                # default -- use default
+            elif not shared_default_context:
                 latex_context = get_default_latex_context_db()
 
+            else:
+                # default -- use the shared default latex context
+                latex_context = _get_shared_latex_context_db(get_default_latex_context_db)
+
         self.latex_context = latex_context
 
         self.tex_input_directory = None
@@ -900,6 +957,9 @@ class LatexNodes2Text(object):
         if self.fill_text is True: # exactly boolean true, not an int
             self.fill_text = 80
 
+        self.parse_cache = flags.pop('parse_cache', None)
+        self.stats = flags.pop('stats', None)
+
         if 'text_replacements' in flags:
             del flags['text_replacements']
             _util.pylatexenc_deprecated_2(
@@ -1007,6 +1067,18 @@ class LatexNodes2Text(object):
         The `parse_flags` are keyword arguments to provide to the
         :py:class:`pylatexenc.latexwalker.LatexWalker` constructor.
         """
+        if self.parse_cache is not None and self.tex_input_directory is None \
+           and _func(type(self).read_input_file) is _func(LatexNodes2Text.read_input_file) \
+           and 'diagnostics' not in parse_flags:
+            return self.parse_cache._latex_to_text(
+                self, latex, parse_flags,
+                lambda: self._latex_to_text(latex, parse_flags)
+            )
+        return self._latex_to_text(latex, parse_flags)
+
+    def _latex_to_text(self, latex, parse_flags):
+        if self.stats is not None and 'stats' not in parse_flags:
+            parse_flags = dict(parse_flags, stats=self.stats)
         return self.nodelist_to_text(
             latexwalker.LatexWalker(latex, **parse_flags).get_latex_nodes()[0]
         )
@@ -1335,7 +1407,18 @@ class LatexNodes2Text(object):
                'specials_chars' in fn_args:
                 kwargs['specials_chars'] = node.specials_chars
 
-            r = simplify_repl(node, **kwargs)
+            stats = self.stats
+            if stats is None:
+                r = simplify_repl(node, **kwargs)
+            else:
+                t0 = stats._clock()
+                r = simplify_repl(node, **kwargs)
+                if node.isNodeType(latexwalker.LatexEnvironmentNode):
+                    stats._add_simplify_repl_time('environment', node.environmentname, t0)
+                elif node.isNodeType(latexwalker.LatexMacroNode):
+                    stats._add_simplify_repl_time('macro', node.macroname, t0)
+                elif node.isNodeType(latexwalker.LatexSpecialsNode):
+                    stats._add_simplify_repl_time('specials', node.specials_chars, t0)
             if r:
                 return r
             return '' # don't return None
@@ -1477,6 +1560,53 @@ class _PushEquationContext(_util.PushPropOverride):
 
 
 
+def _make_latex_to_text_function(latex_context, flags, parse_flags):
+    l2t = LatexNodes2Text(latex_context=latex_context, **flags)
+    return functools.partial(l2t.latex_to_text, **parse_flags)
+
+
+def latex_to_text_many(latex_strings, jobs=1, chunksize=None, latex_context=None,
+                       parse_flags=None, **flags):
+    r"""
+    Convert many independent pieces of LaTeX code to text.  Yields the text
+    representation of each string in `latex_strings` (any iterable), in the
+    same order.  The result is the same as::
+
+        l2t = LatexNodes2Text(latex_context=latex_context, **flags)
+        for latex in latex_strings:
+            yield l2t.latex_to_text(latex, **parse_flags)
+
+    The `flags` are passed to :py:class:`LatexNodes2Text` and the
+    `parse_flags` (a dictionary) are passed to
+    :py:class:`pylatexenc.latexwalker.LatexWalker`.
+
+    If `jobs` is different from 1, then the strings are converted in `jobs`
+    worker processes (or as many as there are CPUs if `jobs=None`).  Each
+    worker process creates its :py:class:`LatexNodes2Text` object only once.
+    The strings are sent to the workers and the results are sent back in
+    chunks of `chunksize` strings, to keep the communication overhead low for
+    short strings.  The iterable `latex_strings` is consumed progressively,
+    as the results are needed.
+
+    If the worker processes are not forked (e.g. on Windows), then the
+    `latex_context` and the flags must be picklable, which is the case for
+    the default latex context and for frozen latex contexts (see
+    :py:meth:`pylatexenc.macrospec.LatexContextDb.freeze()`) unless some specs
+    contain callables which can't be pickled.
+
+    .. versionadded:: 2.11
+
+       This function was introduced in `pylatexenc 2.11`.
+    """
+    return _util.batch_map(
+        _make_latex_to_text_function,
+        (latex_context, flags, parse_flags if parse_flags else {}),
+        latex_strings, jobs=jobs, chunksize=chunksize
+    )
+
+
+
+
 
 
 
@@ -30,7 +30,7 @@ import logging
 
 
 from .. import latexwalker
-from ..latex2text import LatexNodes2Text, _strict_latex_spaces_predef
+from ..latex2text import LatexNodes2Text, PerformanceStats, _strict_latex_spaces_predef
 from ..version import version_str
 
 
@@ -140,6 +140,11 @@ def main(argv=None):
 
     group = parser.add_argument_group("General options")
 
+    group.add_argument('--stats', action='store_true', default=False,
+                       help="Print statistics about the conversion (tokens, nodes, time "
+                       "spent parsing macro arguments and in simplify_repl callables, "
+                       "recovered errors) to standard error")
+
     group.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
                        const=logging.ERROR, default=logging.INFO,
                        help="Suppress warning messages")
@@ -172,8 +177,7 @@ def main(argv=None):
             sys.exit(1)
         latex = args.code
     else:
-        for line in fileinput.input(files=args.files):
-            latex += line
+        latex = ''.join(fileinput.input(files=args.files))
 
     if args.fill_text != -1:
         if args.fill_text is not None and len(args.fill_text):
@@ -183,9 +187,12 @@ def main(argv=None):
     else:
         fill_text = None
 
+    stats = PerformanceStats() if args.stats else None
+
     lw = latexwalker.LatexWalker(latex,
                                  tolerant_parsing=args.tolerant_parsing,
-                                 strict_braces=args.strict_braces)
+                                 strict_braces=args.strict_braces,
+                                 stats=stats)
 
     (nodelist, pos, len_) = lw.get_latex_nodes()
 
@@ -194,10 +201,14 @@ def main(argv=None):
                            strict_latex_spaces=args.strict_latex_spaces,
                            keep_braced_groups=args.keep_braced_groups,
                            keep_braced_groups_minlen=args.keep_braced_groups_minlen,
-                           fill_text=fill_text)
+                           fill_text=fill_text,
+                           stats=stats)
 
     print(ln2t.nodelist_to_text(nodelist))
 
+    if stats is not None:
+        sys.stderr.write(stats.format_report() + "\n")
+
 
 
 def run_main():
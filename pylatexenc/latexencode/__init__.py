@@ -132,6 +132,8 @@ from ._partial_latex_encoder import (
     PartialLatexToLatexEncoder,
 )
 
+from .._util import PerformanceStats
+
 
 
 # ------------------------------------------------
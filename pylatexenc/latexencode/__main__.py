@@ -30,7 +30,7 @@ import argparse
 import logging
 
 
-from ..latexencode import unicode_to_latex
+from ..latexencode import unicode_to_latex, UnicodeToLatexEncoder, PerformanceStats
 from ..version import version_str
 
 
@@ -67,6 +67,10 @@ def main(argv=None):
                         dest='unknown_char_policy', default='keep',
                         help="How to deal with nonascii characters with no known latex code equivalent.")
 
+    parser.add_argument('--stats', action='store_true', default=False,
+                        help="Print the number of replacements made by each conversion "
+                        "rule to standard error")
+
     parser.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
                         const=logging.ERROR, default=logging.INFO,
                         help="Suppress warning messages")
@@ -85,15 +89,29 @@ def main(argv=None):
     for line in fileinput.input(files=args.files):
         latex += line
 
-    result = unicode_to_latex(
-        latex,
-        non_ascii_only=args.non_ascii_only,
-        replacement_latex_protection=args.replacement_latex_protection,
-        unknown_char_policy=args.unknown_char_policy
-    )
+    if args.stats:
+        # unicode_to_latex() doesn't accept a stats object
+        stats = PerformanceStats()
+        result = UnicodeToLatexEncoder(
+            non_ascii_only=args.non_ascii_only,
+            replacement_latex_protection=args.replacement_latex_protection,
+            unknown_char_policy=args.unknown_char_policy,
+            stats=stats
+        ).unicode_to_latex(latex)
+    else:
+        stats = None
+        result = unicode_to_latex(
+            latex,
+            non_ascii_only=args.non_ascii_only,
+            replacement_latex_protection=args.replacement_latex_protection,
+            unknown_char_policy=args.unknown_char_policy
+        )
 
     sys.stdout.write(result)
 
+    if stats is not None:
+        sys.stderr.write(stats.format_report() + "\n")
+
 
 def run_main():
     try:
@@ -237,6 +237,13 @@ class UnicodeToLatexConversionRule:
 
 
 
+_rule_type_names = {
+    RULE_DICT: 'dict',
+    RULE_REGEX: 'regex',
+    RULE_CALLABLE: 'callable',
+}
+
+
 def get_builtin_conversion_rules(builtin_name):
     r"""
     Return a built-in set of conversion rules specified by a given name
@@ -429,6 +436,17 @@ class UnicodeToLatexEncoder(object):
            # result.chunks == [ r"\'e", ' ', r'\textrightarrow', ' ',
            #                    r'\ensuremath{\alpha}' ]
 
+    .. py:attribute:: stats
+
+       If set to a :py:class:`pylatexenc.latexwalker.PerformanceStats`
+       instance (also available as
+       ``pylatexenc.latexencode.PerformanceStats``), then the number of replacements made by each conversion rule
+       is recorded in this object.  (Default: None)
+
+       .. versionadded:: 2.11
+
+          The `stats` attribute was introduced in `pylatexenc 2.11`.
+
     .. warning::
       
        None of the above attributes should be modified after constructing the
@@ -448,6 +466,7 @@ class UnicodeToLatexEncoder(object):
         self.unknown_char_policy = kwargs.pop('unknown_char_policy', 'keep')
         self.unknown_char_warning = kwargs.pop('unknown_char_warning', True)
         self.latex_string_class = kwargs.pop('latex_string_class', unicode)
+        self.stats = kwargs.pop('stats', None)
 
         if kwargs:
             logger.warning("Ignoring unknown keyword arguments: %s", ",".join(kwargs.keys())) 
@@ -455,8 +474,10 @@ class UnicodeToLatexEncoder(object):
         super(UnicodeToLatexEncoder, self).__init__(**kwargs)
 
         # build generator that expands built-in conversion rules
+        # (along with the name of the built-in rule set they come from, if any)
         expanded_conversion_rules = itertools.chain.from_iterable(
-            (get_builtin_conversion_rules(r) if isinstance(r, basestring) else [ r ])
+            ([ (r, rule) for rule in get_builtin_conversion_rules(r) ]
+             if isinstance(r, basestring) else [ (None, r) ])
             for r in self.conversion_rules
         )
 
@@ -467,7 +488,7 @@ class UnicodeToLatexEncoder(object):
 
         # "pre-compile" rules and check rule types:
         self._compiled_rules = []
-        for rule in expanded_conversion_rules:
+        for (builtin_name, rule) in expanded_conversion_rules:
             if rule.rule_type == RULE_DICT:
                 self._compiled_rules.append(
                     functools.partial(self._apply_rule_dict, rule.rule, rule)
@@ -485,6 +506,15 @@ class UnicodeToLatexEncoder(object):
                 )
             else:
                 raise TypeError("Invalid rule type: {}".format(rule.rule_type))
+
+            if self.stats is not None:
+                # count the replacements made by this rule
+                key = '{}:{}'.format(
+                    len(self._compiled_rules) - 1,
+                    builtin_name or _rule_type_names[rule.rule_type]
+                )
+                self._compiled_rules[-1] = \
+                    self.stats._wrap_encoder_rule(self._compiled_rules[-1], key)
         
         # bad char policy:
         if isinstance(self.unknown_char_policy, basestring):
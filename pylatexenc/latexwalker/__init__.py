@@ -105,6 +105,7 @@ from ._types import (
     LatexWalkerError,
     LatexWalkerParseError,
     LatexWalkerEndOfStream,
+    LatexWalkerParseDiagnostic,
     #
     LatexToken,
     #
@@ -121,7 +122,17 @@ from ._types import (
 
 
 
-from ._walker import ParsingState, LatexWalker
+from ._walker import ParsingState, ParsingCursor, LatexWalker, get_latex_nodes_many
+
+from ._stream import LatexStreamWalker
+
+from ._nodetable import LatexNodeTable
+
+from ._events import LatexEvent
+
+from ._cache import LatexParseCache
+
+from .._util import PerformanceStats
 
 
 from ._get_defaultspecs import get_default_latex_context_db
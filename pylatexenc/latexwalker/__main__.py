@@ -30,7 +30,7 @@ import json
 import logging
 
 
-from ..latexwalker import LatexWalker, disp_node, make_json_encoder
+from ..latexwalker import LatexWalker, PerformanceStats, disp_node, make_json_encoder
 from ..version import version_str
 
 
@@ -76,6 +76,10 @@ def main(argv=None):
                         #help="Report errors for mismatching LaTeX braces (default no)"
                         help=argparse.SUPPRESS)
 
+    parser.add_argument('--stats', action='store_true', default=False,
+                        help="Print statistics about the parsing (tokens, nodes, time "
+                        "spent parsing macro arguments, recovered errors) to standard error")
+
     parser.add_argument('-q', '--quiet', dest='logging_level', action='store_const',
                         const=logging.ERROR, default=logging.INFO,
                         help="Suppress warning messages")
@@ -111,12 +115,14 @@ def main(argv=None):
             sys.exit(1)
         latex = args.code
     else:
-        for line in fileinput.input(files=args.files):
-            latex += line
+        latex = ''.join(fileinput.input(files=args.files))
     
+    stats = PerformanceStats() if args.stats else None
+
     latexwalker = LatexWalker(latex,
                               tolerant_parsing=args.tolerant_parsing,
-                              strict_braces=args.strict_braces)
+                              strict_braces=args.strict_braces,
+                              stats=stats)
 
     (nodelist, pos, len_) = latexwalker.get_latex_nodes()
 
@@ -125,17 +131,17 @@ def main(argv=None):
         for n in nodelist:
             disp_node(n)
         print('\n-------------\n')
-        return
-
-    if args.output_format == 'json':
+    elif args.output_format == 'json':
         json.dump({ 'nodelist': nodelist, },
                   sys.stdout,
                   cls=make_json_encoder(latexwalker),
                   indent=args.json_indent)
         sys.stdout.write("\n")
-        return
-    
-    raise ValueError("Invalid output format: "+args.output_format)
+    else:
+        raise ValueError("Invalid output format: "+args.output_format)
+
+    if stats is not None:
+        sys.stderr.write(stats.format_report() + "\n")
 
 
 
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+# Internal module. Internal API may move, disappear or otherwise change at any
+# time and without notice.
+
+from __future__ import print_function, unicode_literals
+
+import os
+import os.path
+import io
+import hashlib
+import pickle
+import tempfile
+import zlib
+import collections
+
+import logging
+logger = logging.getLogger(__name__)
+
+from ..version import version_str
+from ..macrospec._latexcontextdb import _fingerprint_data
+
+
+
+def _qualified_class_name(cls):
+    return '{}.{}'.format(cls.__module__, getattr(cls, '__qualname__', cls.__name__))
+
+
+class _NodesPickler(pickle.Pickler):
+    # Don't store the parsed string and the latex context in the pickled data;
+    # they are provided again when the nodes are loaded
+    def __init__(self, file, persistent_objects):
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self.persistent_ids = dict( (id(obj), name)
+                                    for (name, obj) in persistent_objects.items() )
+
+    def persistent_id(self, obj):
+        return self.persistent_ids.get(id(obj))
+
+
+class _NodesUnpickler(pickle.Unpickler):
+    def __init__(self, file, persistent_objects):
+        pickle.Unpickler.__init__(self, file)
+        self.persistent_objects = persistent_objects
+
+    def persistent_load(self, pid):
+        return self.persistent_objects[pid]
+
+
+
+class LatexParseCache(object):
+    r"""
+    A cache for the results of :py:meth:`LatexWalker.get_latex_nodes()` and of
+    :py:meth:`pylatexenc.latex2text.LatexNodes2Text.latex_to_text()`.  This is
+    useful if the same pieces of LaTeX code (e.g., titles, author lists, or
+    abstracts) are parsed over and over again.
+
+    To use the cache, create an instance and provide it as the `parse_cache=`
+    argument of :py:class:`LatexWalker` or of
+    :py:class:`pylatexenc.latex2text.LatexNodes2Text`.  The same cache may be
+    used by several walkers and converters.
+
+    Results are stored under a key computed from a hash of the input string,
+    of the parsing state (math mode), of the parse flags and converter flags,
+    of the classes of the walker and converter objects, of the fingerprint of
+    the latex context (see
+    :py:meth:`pylatexenc.macrospec.LatexContextDb.fingerprint()`), of the
+    `pylatexenc` version and of `invalidation_key`.  Modifying the latex
+    context thus invalidates the cached results automatically.  If anything
+    else changes the results (e.g., your own subclass of the walker was
+    changed), change `invalidation_key` to any other string.
+
+    Arguments:
+
+      - `max_entries`: the maximum number of results that are kept in memory.
+        The least recently used results are discarded first.
+
+      - `directory`: if not `None`, then results are also stored in files in
+        the given directory, where they can be found by other processes or in
+        later sessions.  Node lists are stored in a compressed pickle format,
+        without the parsed string and the latex context (which are provided
+        again when the nodes are loaded).  Results which cannot be pickled
+        (e.g., because of specs in a custom latex context which cannot be
+        pickled) are only kept in memory.
+
+        The files are loaded with :py:mod:`pickle`, so anyone who can write
+        to the directory can make your program run arbitrary code.  Only use
+        a directory that you trust and that only you can write to; never use
+        a shared or world-writable location such as ``/tmp``.  Missing
+        directories are created so that only their owner can access them.
+
+      - `invalidation_key`: an additional string which is part of all keys.
+
+    Only full parses of a string are cached, i.e., calls to
+    ``get_latex_nodes()`` with `pos=0` and without any `stop_upon_...` or
+    `read_max_nodes` arguments.  Results are not cached for walkers with a
+    `diagnostics` collector, and ``latex_to_text()`` results are not cached if
+    the converter can read input files (see
+    :py:meth:`~pylatexenc.latex2text.LatexNodes2Text.set_tex_input_directory()`).
+
+    .. warning::
+
+       Results stored in a cache `directory` are loaded with :py:mod:`pickle`,
+       which can run arbitrary code.  Only use a directory that you trust and
+       that no one else can write to (never a shared or temporary directory
+       such as ``/tmp``).
+
+    .. note::
+
+       The nodes returned from memory are the same objects that were returned
+       by the call which parsed the string, so you should not modify them
+       (e.g., don't give them to
+       :py:meth:`LatexWalker.get_latex_nodes_after_edit()`).
+       Their `parsing_state` refers to the latex walker which originally
+       parsed the string.
+
+    The following attributes count how the cache performs:
+
+    .. py:attribute:: hits
+
+       The number of results that were found in the cache (in memory or in
+       the directory).
+
+    .. py:attribute:: disk_hits
+
+       The number of results that were found in the cache directory.  These
+       are also counted in `hits`.
+
+    .. py:attribute:: misses
+
+       The number of results that had to be computed.
+
+    .. versionadded:: 2.11
+
+       This class was introduced in `pylatexenc 2.11`.
+    """
+    def __init__(self, max_entries=1024, directory=None, invalidation_key=None):
+        super(LatexParseCache, self).__init__()
+        self.max_entries = max_entries
+        self.directory = directory
+        self.invalidation_key = invalidation_key
+
+        self._entries = collections.OrderedDict()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def clear(self, directory=False):
+        r"""
+        Remove all results that are stored in memory.  If `directory=True`, then
+        also remove all the files stored in the cache directory.
+        """
+        self._entries.clear()
+        if directory and self.directory is not None:
+            for dirpath, dirnames, filenames in os.walk(self.directory):
+                for fn in filenames:
+                    if fn.endswith('.pickle'):
+                        os.remove(os.path.join(dirpath, fn))
+
+    def _get_latex_nodes(self, latex_walker, parsing_state, parse_nodes):
+        # (INTERNAL.) Called by LatexWalker.get_latex_nodes().  Returns the
+        # cached tuple (nodelist, pos, len) or calls parse_nodes() to compute it
+        key = self._make_key(
+            ('nodes',
+             _qualified_class_name(type(latex_walker)),
+             latex_walker.tolerant_parsing,
+             latex_walker.strict_braces,
+             parsing_state.in_math_mode,
+             parsing_state.math_mode_delimiter,
+             _fingerprint_data(parsing_state.latex_context, {})),
+            latex_walker.s
+        )
+        persistent_objects = {
+            's': latex_walker.s,
+            'latex_context': parsing_state.latex_context,
+            'parsing_state': parsing_state,
+        }
+        return self._get(key, parse_nodes, persistent_objects)
+
+    def _latex_to_text(self, l2t, latex, parse_flags, latex_to_text):
+        # (INTERNAL.) Called by LatexNodes2Text.latex_to_text().  Returns the
+        # cached text or calls latex_to_text() to compute it
+        key = self._make_key(
+            ('text',
+             _qualified_class_name(type(l2t)),
+             l2t.math_mode,
+             l2t.keep_comments,
+             sorted(l2t.strict_latex_spaces.items()),
+             l2t.keep_braced_groups,
+             l2t.keep_braced_groups_minlen,
+             l2t.fill_text,
+             _fingerprint_data(l2t.latex_context, {}),
+             _fingerprint_data(dict( (k, v) for (k, v) in parse_flags.items()
+                                     if k not in ('parse_cache', 'stats') ), {})),
+            latex
+        )
+        return self._get(key, latex_to_text, {})
+
+    def _make_key(self, what, s):
+        h = hashlib.sha1()
+        h.update(repr( (version_str, self.invalidation_key, what) ).encode('utf-8'))
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8', 'surrogatepass')
+        h.update(s)
+        return h.hexdigest()
+
+    def _get(self, key, compute, persistent_objects):
+
+        entries = self._entries
+
+        try:
+            value = entries.pop(key)
+        except KeyError:
+            pass
+        else:
+            # re-insert as the most recently used entry
+            entries[key] = value
+            self.hits += 1
+            return value
+
+        if self.directory is not None:
+            value = self._load(key, persistent_objects)
+            if value is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._add_entry(key, value)
+                return value
+
+        self.misses += 1
+        value = compute()
+        self._add_entry(key, value)
+        if self.directory is not None:
+            self._save(key, value, persistent_objects)
+        return value
+
+    def _add_entry(self, key, value):
+        entries = self._entries
+        while entries and len(entries) >= self.max_entries:
+            entries.popitem(last=False)
+        if self.max_entries > 0:
+            entries[key] = value
+
+    def _get_file_name(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + '.pickle')
+
+    def _load(self, key, persistent_objects):
+        fn = self._get_file_name(key)
+        try:
+            with open(fn, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        try:
+            return _NodesUnpickler(io.BytesIO(zlib.decompress(data)),
+                                   persistent_objects).load()
+        except Exception as e:
+            logger.debug("Ignoring invalid parse cache file %s: %s", fn, e)
+            return None
+
+    def _save(self, key, value, persistent_objects):
+        f = io.BytesIO()
+        try:
+            _NodesPickler(f, persistent_objects).dump(value)
+        except Exception as e:
+            logger.debug("Can't store parse result in the cache directory: %s", e)
+            return
+        data = zlib.compress(f.getvalue())
+
+        fn = self._get_file_name(key)
+        dirname = os.path.dirname(fn)
+        # (only the owner may access the directories that we create, as the
+        # files must not be modified by anyone else, see _load())
+        for d in (self.directory, dirname):
+            try:
+                os.makedirs(d, 0o700)
+            except OSError:
+                if not os.path.isdir(d):
+                    raise
+        # write to a temporary file first, so that other processes never see
+        # an incomplete file
+        (fd, tmpfn) = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmpf:
+                tmpf.write(data)
+            os.rename(tmpfn, fn)
+        except OSError:
+            # e.g. on Windows, another process stored the same file meanwhile
+            if os.path.exists(tmpfn):
+                os.remove(tmpfn)
@@ -0,0 +1,1227 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+# Internal module. Internal API may move, disappear or otherwise change at any
+# time and without notice.
+
+r"""
+Iterative parsing engine for :py:meth:`LatexWalker.get_latex_nodes()`.
+
+The recursive implementation in `LatexWalker` calls `get_latex_nodes()`,
+`get_latex_braced_group()`, `get_latex_environment()` and the macro argument
+parsers recursively for each group, environment, math block and macro
+argument.  The engine in this module produces exactly the same node tree
+(including the same errors, with the same `open_contexts`), but keeps track of
+the nested constructs using an explicit stack of frame objects instead of the
+Python call stack.  There is thus no limit on how deeply the LaTeX code can be
+nested.
+
+There is one frame class per construct that the recursive implementation
+handles in a separate function call:
+
+  - :py:class:`_NodesFrame` mirrors a call to `get_latex_nodes()`;
+
+  - :py:class:`_ArgsFrame` mirrors a call to
+    `MacroStandardArgsParser.parse_args()`, including the
+    `get_latex_expression()` and `get_latex_maybe_optional_arg()` calls it
+    makes;
+
+  - :py:class:`_EnvironmentFrame` mirrors a call to
+    `get_latex_environment()`.
+
+Exceptions are propagated down the frame stack in the same way Python would
+have propagated them through the recursive calls: each frame gets a chance to
+handle the error (e.g., ignore it in tolerant parsing mode, or add an entry to
+the exception's `open_contexts`) in its `handle_error()` method.
+
+Custom argument parsers (any `parse_args()` other than the one of
+`MacroStandardArgsParser`) are called normally; they may call the public
+`LatexWalker` methods, which use this engine in turn.
+
+The engine can also be run with `delegate_to_walker=True`, in which case only
+the top-level frame is handled by the engine and nested constructs are parsed
+by calling the corresponding `LatexWalker` methods.  This is used to provide
+:py:meth:`LatexWalker.iter_latex_nodes()` for walkers which do not use the
+iterative parsing engine.
+"""
+
+from __future__ import print_function, unicode_literals
+
+
+from .. import _util
+from .. import macrospec
+from ..macrospec import _argparsers as macrospec_argparsers
+from ._types import *
+from ._types import _EndOfStreamToken
+
+
+
+def _func(f):
+    # the plain function object behind a method (Py2 unbound methods are
+    # created anew on each attribute access)
+    return getattr(f, '__func__', f)
+
+
+# Whitespace strings stored in whitespace-only chars nodes.  There are only a
+# handful of distinct short whitespace strings in a typical document, so we
+# store them only once.
+_interned_spaces = {}
+_MAX_INTERNED_SPACE_LEN = 32
+
+def _intern_space(space):
+    if len(space) > _MAX_INTERNED_SPACE_LEN:
+        return space
+    return _interned_spaces.setdefault(space, space)
+
+
+_parse_exceptions = (LatexWalkerParseError, LatexWalkerEndOfStream)
+
+# the standard parse_args() methods; filled in the first time they are needed,
+# because the macrospec module might not be fully imported yet when this module
+# is imported
+_std_parse_args = {}
+
+def _init_std_parse_args():
+    _std_parse_args.update({
+        'macro': _func(macrospec.MacroSpec.parse_args),
+        'environment': _func(macrospec.EnvironmentSpec.parse_args),
+        'specials': _func(macrospec.SpecialsSpec.parse_args),
+        'args_parser': _func(macrospec_argparsers.MacroStandardArgsParser.parse_args),
+    })
+
+
+def _get_standard_args_parser(spec, which):
+    r"""
+    Return the spec's args parser if the engine can parse the arguments itself
+    (i.e., if neither the spec's nor the parser's `parse_args()` method were
+    overridden), or `None` otherwise.
+    """
+    if not _std_parse_args:
+        _init_std_parse_args()
+    if _func(type(spec).parse_args) is not _std_parse_args[which]:
+        return None
+    args_parser = spec.args_parser
+    if args_parser is None \
+       or _func(type(args_parser).parse_args) is not _std_parse_args['args_parser']:
+        return None
+    return args_parser
+
+
+def _has_no_args(args_parser):
+    # whether the standard args parser has no arguments to parse at all, in
+    # which case we don't need an _ArgsFrame
+    return args_parser._get_plan().no_args \
+        and not args_parser._like_pylatexenc1x_ignore_leading_star
+
+
+def _no_args_result(args_parser, pos):
+    # what MacroStandardArgsParser.parse_args() returns if there are no
+    # arguments
+    return (
+        macrospec_argparsers.ParsedMacroArgs(argspec=args_parser.argspec, argnlist=[]),
+        pos,
+        0
+    )
+
+
+def _closing_brace_for(brace_type):
+    # same as in LatexWalker.get_latex_braced_group()
+    if brace_type == '{':
+        return brace_type, '}'
+    elif brace_type == '[':
+        return brace_type, ']'
+    elif brace_type == '(':
+        return brace_type, ')'
+    elif brace_type == '<':
+        return brace_type, '>'
+    elif len(brace_type) == 2:
+        return brace_type[0], brace_type[1]
+    raise ValueError("Invalid brace type for get_latex_braced_group(): %s" %(brace_type))
+
+
+# possible values of `child_kind` in the different frames
+_CHILD_GROUP = 1
+_CHILD_MATH = 2
+_CHILD_ENVIRONMENT = 3
+_CHILD_MACRO_ARGS = 4
+_CHILD_SPECIALS_ARGS = 5
+_CHILD_ENVIRONMENT_ARGS = 6
+_CHILD_ENVIRONMENT_BODY = 7
+_CHILD_ARG_GROUP = 8
+
+# return value of _NodesFrame.read() if a child frame was pushed
+_PUSHED = object()
+
+
+
+class _LatexNodesParser(object):
+    r"""
+    Parse LaTeX code into nodes, using an explicit stack of frames.
+
+    Create one instance for each call to `LatexWalker.get_latex_nodes()` or
+    `LatexWalker.iter_latex_nodes()`.
+    """
+    def __init__(self, latex_walker, delegate_to_walker=False):
+        super(_LatexNodesParser, self).__init__()
+        self.latex_walker = latex_walker
+        self.delegate_to_walker = delegate_to_walker
+        # like latex_walker.get_token(), but returns an _EndOfStreamToken at
+        # the end of the string instead of raising LatexWalkerEndOfStream
+        self.get_token = latex_walker._get_token_or_eos_function()
+        self.stack = []
+        self.result = None
+        # results of the node frames which ran into the end of the stream (in
+        # tolerant parsing mode), see _NodesFrame.reuse_eof_frame()
+        self.eof_frames = {}
+
+    def parse_nodes(self, pos, stop_upon_closing_brace=None,
+                    stop_upon_end_environment=None, stop_upon_closing_mathmode=None,
+                    read_max_nodes=None, parsing_state=None):
+        r"""
+        Same as `LatexWalker.get_latex_nodes()`.
+        """
+        self.push(_NodesFrame(
+            self.latex_walker, pos, parsing_state,
+            stop_upon_closing_brace=stop_upon_closing_brace,
+            stop_upon_end_environment=stop_upon_end_environment,
+            stop_upon_closing_mathmode=stop_upon_closing_mathmode,
+            read_max_nodes=read_max_nodes,
+            strict_braces=None,
+        ))
+        return self.run()
+
+    def iter_nodes(self, pos, parsing_state, stop_upon_closing_brace=None,
+                   stop_upon_end_environment=None, stop_upon_closing_mathmode=None):
+        r"""
+        Generator which parses nodes starting at `pos`, like `parse_nodes()`,
+        but which yields each top-level node as soon as it is complete.
+
+        Yields tuples `(node, next_pos, next_parsing_state)`, where `next_pos`
+        and `next_parsing_state` are the position and the parsing state at
+        which parsing continues after `node`.  Once the generator is
+        exhausted, `self.result` is set to the return value of
+        `parse_nodes()`, i.e., a tuple `(nodelist, pos, len)` (where
+        `nodelist` is empty, as all nodes have been yielded).
+        """
+        root = _TopLevelNodesFrame(
+            self.latex_walker, pos, parsing_state,
+            stop_upon_closing_brace=stop_upon_closing_brace,
+            stop_upon_end_environment=stop_upon_end_environment,
+            stop_upon_closing_mathmode=stop_upon_closing_mathmode,
+            read_max_nodes=None,
+            strict_braces=None,
+        )
+        nodelist = root.nodelist
+        stack = self.stack
+        self.push(root)
+        while stack:
+            try:
+                stack[-1].step(self)
+            except _parse_exceptions as e:
+                self.propagate_error(e)
+            if nodelist:
+                nodes = list(nodelist)
+                del nodelist[:]
+                for j, node in enumerate(nodes):
+                    # the parsing state after the node is the one with which
+                    # the next node was created, or the current one
+                    if j + 1 < len(nodes):
+                        next_parsing_state = nodes[j+1].parsing_state
+                    else:
+                        next_parsing_state = root.parsing_state
+                    yield (node, node.pos + node.len, next_parsing_state)
+
+    def push(self, frame):
+        self.stack.append(frame)
+
+    def return_result(self, result):
+        r"""
+        Called by the frame at the top of the stack when it is done.  The frame
+        is removed from the stack and its result is passed on to the parent
+        frame.
+        """
+        self.stack.pop()
+        if not self.stack:
+            self.result = result
+            return
+        self.stack[-1].child_done(self, result)
+
+    def run(self):
+        stack = self.stack
+        while stack:
+            try:
+                stack[-1].step(self)
+            except _parse_exceptions as e:
+                self.propagate_error(e)
+        return self.result
+
+    def propagate_error(self, e):
+        r"""
+        Let the frames on the stack handle the error `e` that was raised while
+        running the frame at the top of the stack.  Each frame which doesn't
+        handle the error is removed from the stack.  If no frame handles the
+        error, it is raised.
+        """
+        stack = self.stack
+        while True:
+            try:
+                stack[-1].handle_error(self, e)
+                return
+            except _parse_exceptions as exc:
+                stack.pop()
+                if not stack:
+                    raise
+                e = exc
+
+
+class _NodesFrame(object):
+    r"""
+    The equivalent of a call to `LatexWalker.get_latex_nodes()`.
+    """
+    __slots__ = ('pos', 'parsing_state', 'lastchars_pos', 'lastchars_end',
+                 'nodelist', 'origpos', 'orig_parsing_state', 'include_brace_chars',
+                 'stop_upon_closing_brace', 'stop_upon_end_environment',
+                 'stop_upon_closing_mathmode', 'read_max_nodes',
+                 'strict_braces', 'end_now', 'child_kind', 'child_tok',)
+
+    def __init__(self, w, pos, parsing_state, stop_upon_closing_brace,
+                 stop_upon_end_environment, stop_upon_closing_mathmode,
+                 read_max_nodes, strict_braces):
+
+        include_brace_chars = None
+        if stop_upon_closing_brace:
+            if stop_upon_closing_brace == '}':
+                opening_brace_for_stop_upon_closing_brace = '{'
+            elif stop_upon_closing_brace == ']':
+                opening_brace_for_stop_upon_closing_brace = '['
+            elif stop_upon_closing_brace == ')':
+                opening_brace_for_stop_upon_closing_brace = '('
+            elif stop_upon_closing_brace == '>':
+                opening_brace_for_stop_upon_closing_brace = '<'
+            elif len(stop_upon_closing_brace) == 2:
+                opening_brace_for_stop_upon_closing_brace, stop_upon_closing_brace = \
+                    stop_upon_closing_brace
+            else:
+                opening_brace_for_stop_upon_closing_brace = None
+
+            if stop_upon_closing_brace != '}':
+                include_brace_chars = [
+                    (opening_brace_for_stop_upon_closing_brace, stop_upon_closing_brace)
+                ]
+
+        self.pos = pos
+        self.origpos = pos
+        self.parsing_state = parsing_state
+        self.orig_parsing_state = parsing_state
+        self.lastchars_pos = None
+        self.lastchars_end = None
+        self.nodelist = []
+        self.include_brace_chars = include_brace_chars
+        self.stop_upon_closing_brace = stop_upon_closing_brace
+        self.stop_upon_end_environment = stop_upon_end_environment
+        self.stop_upon_closing_mathmode = stop_upon_closing_mathmode
+        self.read_max_nodes = read_max_nodes
+        # value to which LatexWalker.strict_braces would have been temporarily
+        # set by get_latex_expression() in the recursive implementation, or
+        # `None`
+        self.strict_braces = strict_braces
+        self.end_now = None
+        self.child_kind = None
+        self.child_tok = None
+
+    def push_lastchars(self, pos, end):
+        # The characters s[pos:end] follow the last characters (if any).  We
+        # only keep track of the positions, the chars node extracts its string
+        # from the parsed string when needed.
+        if end == pos:
+            return
+        if self.lastchars_pos is None:
+            self.lastchars_pos = pos
+        self.lastchars_end = end
+
+    def flush_lastchars(self):
+        res = self.lastchars_pos, self.lastchars_end
+        self.lastchars_pos = None
+        self.lastchars_end = None
+        return res
+
+    def step(self, engine):
+        if self.end_now is not None:
+            r_endnow, self.end_now = self.end_now, None
+            self.finish(engine, r_endnow)
+            return
+        while True:
+            r_endnow = self.read(engine)
+            if r_endnow is _PUSHED:
+                return
+            if r_endnow:
+                self.finish(engine, r_endnow)
+                return
+
+    def finish(self, engine, r_endnow):
+        w = engine.latex_walker
+
+        if r_endnow.__class__ is _EndOfStreamToken and self.__class__ is _NodesFrame \
+           and self.read_max_nodes is None:
+            engine.eof_frames[self.eof_frame_key(self.origpos, self.orig_parsing_state)] = \
+                (list(self.nodelist), self.lastchars_pos, self.lastchars_end, self.pos,
+                 r_endnow)
+
+        # add last chars and last space
+        if isinstance(r_endnow, (_EndOfStreamToken, LatexWalkerEndOfStream)):
+            self.push_lastchars(pos=self.pos, end=self.pos+len(r_endnow.final_space))
+            self.pos += len(r_endnow.final_space)
+
+        if self.lastchars_pos is not None:
+            charspos, charsend = self.flush_lastchars()
+            strnode = w.make_node(LatexCharsNode,
+                                  parsing_state=self.parsing_state,
+                                  chars=None,
+                                  pos=charspos, len=charsend-charspos)
+            self.nodelist.append(strnode)
+
+        engine.return_result( (self.nodelist, self.origpos, self.pos - self.origpos) )
+
+    def node_added(self):
+        # Return True if we have read the maximum number of nodes requested
+        return self.read_max_nodes and len(self.nodelist) >= self.read_max_nodes
+
+    def eof_frame_key(self, pos, parsing_state):
+        return (pos, parsing_state, self.stop_upon_closing_brace,
+                self.stop_upon_end_environment, self.stop_upon_closing_mathmode,
+                self.strict_braces)
+
+    def reuse_eof_frame(self, engine, w):
+        r"""
+        If a node frame with the same stop conditions, which started at our
+        current position with our current parsing state, ran into the end of
+        the stream, then the rest of our nodes are the nodes it read.  Append
+        them and return the end-of-stream token.  Otherwise, return `None`.
+
+        In tolerant parsing mode, when the arguments of a macro can't be read
+        because the end of the stream is reached, the macro is parsed without
+        arguments and the parser continues after the macro name.  The nodes
+        that were read for the arguments are then read again.  Without
+        reusing them, unterminated nested arguments (e.g. ``\section[`` many
+        times over) would take exponential time to parse.
+        """
+        res = engine.eof_frames.get(self.eof_frame_key(self.pos, self.parsing_state))
+        if res is None:
+            return None
+        (nodelist, lastchars_pos, lastchars_end, pos, r_endnow) = res
+        if self.lastchars_pos is not None and nodelist:
+            if nodelist[0].__class__ is LatexCharsNode:
+                # we'd have to merge our characters with that node
+                return None
+            charspos, _ = self.flush_lastchars()
+            self.nodelist.append(w.make_node(LatexCharsNode,
+                                             parsing_state=self.parsing_state,
+                                             chars=None,
+                                             pos=charspos, len=self.pos-charspos))
+        self.nodelist.extend(nodelist)
+        if lastchars_pos is not None:
+            self.push_lastchars(lastchars_pos, lastchars_end)
+        self.pos = pos
+        return r_endnow
+
+    def read(self, engine):
+        r"""
+        Read a single token and process it, pushing a child frame for brace
+        blocks, environments etc. if needed, and appending stuff to nodelist.
+
+        Return `_PUSHED` if a child frame was pushed on the stack, True
+        whenever we should stop trying to read more, or an end-of-stream
+        token.
+        """
+        w = engine.latex_walker
+
+        if engine.eof_frames and self.__class__ is _NodesFrame:
+            r_endnow = self.reuse_eof_frame(engine, w)
+            if r_endnow is not None:
+                return r_endnow
+
+        try:
+            tok = engine.get_token(self.pos, include_brace_chars=self.include_brace_chars,
+                                   parsing_state=self.parsing_state,
+                                   chars_run=w.tokenize_chars_runs)
+        except LatexWalkerParseError as e:
+            # get_token() should not raise parse errors in tolerant_parsing
+            # mode, because this can lead to infinite loops (#37)
+            assert(not w.tolerant_parsing)
+            raise # exception will be handled in handle_error()
+
+        if tok.__class__ is _EndOfStreamToken:
+            if w.tolerant_parsing:
+                return tok
+            raise LatexWalkerEndOfStream(final_space=tok.final_space)
+
+        self.pos = tok.pos + tok.len
+
+        # if it's a char, just append it to the stream of last characters.
+        if tok.tok == 'char':
+            self.push_lastchars(pos=(tok.pos - len(tok.pre_space)),
+                                end=(tok.pos + tok.len))
+            return False
+
+        # if it's not a char, push the last `lastchars` into the node list
+        # before we do anything else
+        if self.lastchars_pos is not None:
+            charspos, _ = self.flush_lastchars()
+            strnode = w.make_node(LatexCharsNode,
+                                  parsing_state=self.parsing_state,
+                                  chars=None, # == chars + tok.pre_space
+                                  pos=charspos, len=tok.pos - charspos)
+            self.nodelist.append(strnode)
+            if self.node_added():
+                # adjust pos for return value of get_latex_nodes()
+                self.pos = tok.pos
+                return True
+        elif len(tok.pre_space):
+            # If we have pre_space, add a separate chars node that contains
+            # the spaces (see LatexWalker.get_latex_nodes()).
+            spacestrnode = w.make_node(LatexCharsNode,
+                                       parsing_state=self.parsing_state,
+                                       chars=_intern_space(tok.pre_space),
+                                       pos=tok.pos-len(tok.pre_space),
+                                       len=len(tok.pre_space))
+            self.nodelist.append(spacestrnode)
+            if self.node_added():
+                # adjust pos for return value of get_latex_nodes()
+                self.pos = tok.pos
+                return True
+
+        # and see what the token is.
+
+        if tok.tok == 'brace_close':
+            # we've reached the end of the group. stop the parsing.
+            if tok.arg != self.stop_upon_closing_brace:
+                raise LatexWalkerParseError(
+                    s=w.s,
+                    pos=tok.pos,
+                    msg="Unexpected mismatching closing brace: '%s'"%(tok.arg),
+                    get_lineno_colno=w._lineno_colno_getter(tok.pos)
+                )
+            return True
+
+        if tok.tok == 'end_environment':
+            # we've reached the end of an environment.
+            if not self.stop_upon_end_environment:
+                raise LatexWalkerParseError(
+                    s=w.s,
+                    pos=tok.pos,
+                    msg=("Unexpected closing environment: '{}'".format(tok.arg)),
+                    get_lineno_colno=w._lineno_colno_getter(tok.pos)
+                )
+            elif tok.arg != self.stop_upon_end_environment:
+                raise LatexWalkerParseError(
+                    s=w.s,
+                    pos=tok.pos,
+                    msg=("Unexpected mismatching closing environment: '{}', "
+                         "was expecting '{}'".format(tok.arg, self.stop_upon_end_environment)),
+                    get_lineno_colno=w._lineno_colno_getter(tok.pos)
+                )
+            return True
+
+        if tok.tok in ('mathmode_inline', 'mathmode_display'):
+            # see if we need to stop at a math mode
+            stop_upon_closing_mathmode = self.stop_upon_closing_mathmode
+            if stop_upon_closing_mathmode is not None:
+                if tok.arg == stop_upon_closing_mathmode:
+                    # all OK, found the closing mathmode.
+                    return True
+                if tok.arg in [r'\)', r'\]']:
+                    # this is definitely a closing math-mode delimiter, so
+                    # not a new math mode block.
+                    raise LatexWalkerParseError(
+                        s=w.s,
+                        pos=tok.pos,
+                        msg="Mismatching closing math mode: '{}', expected '{}'".format(
+                            tok.arg, stop_upon_closing_mathmode,
+                        ),
+                        get_lineno_colno=w._lineno_colno_getter(tok.pos)
+                    )
+                assert tok.arg in ['$', '$$', r'\(', r'\[']
+            elif tok.arg in [r'\)', r'\]']:
+                # unexpected close-math-mode delimiter, but no
+                # stop_upon_closing_mathmode was specified. Parse error.
+                raise LatexWalkerParseError(
+                    s=w.s,
+                    pos=tok.pos,
+                    msg="Unexpected closing math mode: '{}'".format(tok.arg),
+                    get_lineno_colno=w._lineno_colno_getter(tok.pos)
+                )
+
+            # we have encountered a new math inline, parse the math expression
+
+            corresponding_closing_mathmode = \
+                {r'\(': r'\)', r'\[': r'\]'}.get(tok.arg, tok.arg)
+
+            parsing_state_inner = self.parsing_state._sub_context(
+                in_math_mode=True,
+                math_mode_delimiter=tok.arg
+            )
+
+            self.child_kind = _CHILD_MATH
+            self.child_tok = tok
+            if engine.delegate_to_walker:
+                result = w.get_latex_nodes(
+                    self.pos,
+                    stop_upon_closing_mathmode=corresponding_closing_mathmode,
+                    parsing_state=parsing_state_inner
+                )
+                return self.add_child_result(engine, result)
+            engine.push(_NodesFrame(
+                w, self.pos, parsing_state_inner,
+                stop_upon_closing_brace=None,
+                stop_upon_end_environment=None,
+                stop_upon_closing_mathmode=corresponding_closing_mathmode,
+                read_max_nodes=None,
+                strict_braces=self.strict_braces,
+            ))
+            return _PUSHED
+
+        if tok.tok == 'comment':
+            commentnode = w.make_node(LatexCommentNode,
+                                      parsing_state=self.parsing_state,
+                                      comment=tok.arg,
+                                      comment_post_space=tok.post_space,
+                                      pos=tok.pos, len=tok.len)
+            self.nodelist.append(commentnode)
+            if self.node_added():
+                return True
+            return
+
+        if tok.tok == 'brace_open':
+            # another braced group to read.
+            self.child_kind = _CHILD_GROUP
+            self.child_tok = tok
+            if engine.delegate_to_walker:
+                result = w.get_latex_braced_group(
+                    tok.pos,
+                    brace_type=tok.arg,
+                    parsing_state=self.parsing_state
+                )
+                return self.add_child_result(engine, result)
+            engine.push(_NodesFrame(
+                w, tok.pos + tok.len, self.parsing_state,
+                stop_upon_closing_brace=_closing_brace_for(tok.arg),
+                stop_upon_end_environment=None,
+                stop_upon_closing_mathmode=None,
+                read_max_nodes=None,
+                strict_braces=self.strict_braces,
+            ))
+            return _PUSHED
+
+        if tok.tok == 'begin_environment':
+            # an environment to read.
+            self.child_kind = _CHILD_ENVIRONMENT
+            self.child_tok = tok
+            if engine.delegate_to_walker:
+                result = w.get_latex_environment(
+                    tok.pos,
+                    environmentname=tok.arg,
+                    parsing_state=self.parsing_state
+                )
+                return self.add_child_result(engine, result)
+            engine.push(_EnvironmentFrame(tok, self.parsing_state, self.strict_braces))
+            return _PUSHED
+
+        if tok.tok == 'macro':
+            # read a macro. see if it has arguments.
+            macroname = tok.arg
+            mspec = self.parsing_state.latex_context.get_macro_spec(macroname)
+            if mspec is None:
+                mspec = macrospec.MacroSpec('')
+
+            args_parser = None
+            if not engine.delegate_to_walker:
+                args_parser = _get_standard_args_parser(mspec, 'macro')
+            if args_parser is not None and _has_no_args(args_parser):
+                # fast path for macros without arguments
+                if w.stats is not None:
+                    # (record a call, like the recursive parser does)
+                    w.stats._add_args_time('macro', macroname, w.stats._clock())
+                return self.add_macro_node(engine, tok, _no_args_result(args_parser,
+                                                                       tok.pos + tok.len))
+            if args_parser is not None:
+                self.child_kind = _CHILD_MACRO_ARGS
+                self.child_tok = tok
+                engine.push(_ArgsFrame(args_parser, tok.pos + tok.len, self.parsing_state,
+                                       tok, 'macro', macroname, self.strict_braces))
+                return _PUSHED
+
+            stats = w.stats
+            if stats is not None:
+                t0 = stats._clock()
+            try:
+                with _util.PushPropOverride(w, 'strict_braces', self.strict_braces):
+                    margsresult = \
+                        mspec.parse_args(w=w, pos=tok.pos + tok.len,
+                                         parsing_state=self.parsing_state)
+            except _parse_exceptions as e:
+                e = w._exchandle_parse_subexpression(
+                    e,
+                    tok,
+                    "arguments of macro \"{}\"".format(macroname)
+                )
+                if e is not None: raise e
+                margsresult = (None, tok.pos + tok.len, 0, {})
+            if stats is not None:
+                stats._add_args_time('macro', macroname, t0)
+
+            return self.add_macro_node(engine, tok, margsresult)
+
+        if tok.tok == 'specials':
+            # read the specials. see if it expects/has arguments.
+            sspec = tok.arg
+
+            if sspec.args_parser is not None and not engine.delegate_to_walker:
+                args_parser = _get_standard_args_parser(sspec, 'specials')
+                if args_parser is not None and _has_no_args(args_parser):
+                    if w.stats is not None:
+                        w.stats._add_args_time('specials', sspec.specials_chars,
+                                               w.stats._clock())
+                    return self.add_specials_node(engine, tok,
+                                                  _no_args_result(args_parser, self.pos))
+                if args_parser is not None:
+                    self.child_kind = _CHILD_SPECIALS_ARGS
+                    self.child_tok = tok
+                    engine.push(_ArgsFrame(args_parser, self.pos, self.parsing_state,
+                                           tok, 'specials', sspec.specials_chars,
+                                           self.strict_braces))
+                    return _PUSHED
+
+            stats = w.stats
+            if stats is not None:
+                t0 = stats._clock()
+            try:
+                with _util.PushPropOverride(w, 'strict_braces', self.strict_braces):
+                    res = sspec.parse_args(w=w, pos=self.pos, parsing_state=self.parsing_state)
+            except _parse_exceptions as e:
+                e = w._exchandle_parse_subexpression(
+                    e,
+                    tok,
+                    "arguments of specials \"{}\"".format(sspec.specials_chars)
+                )
+                if e is not None: raise e
+                res = (None, self.pos, 0, {})
+            if stats is not None:
+                stats._add_args_time('specials', sspec.specials_chars, t0)
+
+            return self.add_specials_node(engine, tok, res)
+
+        raise LatexWalkerParseError(
+            s=w.s,
+            pos=self.pos,
+            msg="Unknown token: {!r}".format(tok),
+            get_lineno_colno=w._lineno_colno_getter(self.pos)
+        )
+
+    def add_macro_node(self, engine, tok, margsresult):
+        w = engine.latex_walker
+
+        if len(margsresult) == 4:
+            (nodeargd, mapos, malen, mdic) = margsresult
+        else:
+            (nodeargd, mapos, malen) = margsresult
+            mdic = {}
+
+        self.pos = mapos + malen
+
+        if nodeargd is not None and nodeargd.legacy_nodeoptarg_nodeargs:
+            nodeoptarg = nodeargd.legacy_nodeoptarg_nodeargs[0]
+            nodeargs = nodeargd.legacy_nodeoptarg_nodeargs[1]
+        else:
+            nodeoptarg, nodeargs = None, []
+        node = w.make_node(LatexMacroNode,
+                           parsing_state=self.parsing_state,
+                           macroname=tok.arg,
+                           nodeargd=nodeargd,
+                           macro_post_space=tok.post_space,
+                           # legacy data:
+                           nodeoptarg=nodeoptarg,
+                           nodeargs=nodeargs,
+                           pos=tok.pos,
+                           len=self.pos-tok.pos)
+        self.nodelist.append(node)
+
+        if 'new_parsing_state' in mdic:
+            # modify current parsing state---
+            self.parsing_state = mdic['new_parsing_state']
+
+        if self.node_added():
+            return True
+        return None
+
+    def add_specials_node(self, engine, tok, res):
+        w = engine.latex_walker
+
+        nodeargd = None
+        if res is not None:
+            # specials expects arguments, read them
+            if len(res) == 4:
+                (nodeargd, mapos, malen, spdic) = res
+            else:
+                (nodeargd, mapos, malen) = res
+                spdic = {}
+
+            self.pos = mapos + malen
+
+        else:
+            spdic = {}
+
+        node = w.make_node(LatexSpecialsNode,
+                           parsing_state=self.parsing_state,
+                           specials_chars=tok.arg.specials_chars,
+                           nodeargd=nodeargd,
+                           pos=tok.pos,
+                           len=self.pos-tok.pos)
+        self.nodelist.append(node)
+
+        if 'new_parsing_state' in spdic:
+            # modify current parsing state---
+            self.parsing_state = spdic['new_parsing_state']
+
+        if self.node_added():
+            return True
+        return None
+
+    def child_done(self, engine, result):
+        r_endnow = self.add_child_result(engine, result)
+        if r_endnow:
+            self.end_now = r_endnow
+
+    def add_child_result(self, engine, result):
+        # Process the result of the child frame, or of the walker method call
+        # in delegate_to_walker mode.  Returns True if we should stop reading.
+        w = engine.latex_walker
+        child_kind, tok = self.child_kind, self.child_tok
+        self.child_kind, self.child_tok = None, None
+
+        if child_kind == _CHILD_MACRO_ARGS:
+            return self.add_macro_node(engine, tok, result)
+
+        if child_kind == _CHILD_SPECIALS_ARGS:
+            return self.add_specials_node(engine, tok, result)
+
+        if child_kind == _CHILD_GROUP:
+            if engine.delegate_to_walker:
+                (node, npos, nlen) = result
+            else:
+                (nodelist, npos, nlen) = result
+                node = w.make_node(LatexGroupNode,
+                                   nodelist=nodelist,
+                                   parsing_state=self.parsing_state,
+                                   delimiters=_closing_brace_for(tok.arg),
+                                   pos=tok.pos,
+                                   len=npos + nlen - tok.pos)
+        elif child_kind == _CHILD_MATH:
+            (nodelist, npos, nlen) = result
+            node = w.make_node(
+                LatexMathNode,
+                parsing_state=self.parsing_state,
+                displaytype=('inline' if tok.arg in [r'\(', '$'] else 'display'),
+                nodelist=nodelist,
+                delimiters=(tok.arg, {r'\(': r'\)', r'\[': r'\]'}.get(tok.arg, tok.arg)),
+                pos=tok.pos, len=npos+nlen-tok.pos
+            )
+        else:
+            assert child_kind == _CHILD_ENVIRONMENT
+            (node, npos, nlen) = result
+        self.pos = npos + nlen
+        self.nodelist.append(node)
+        return self.node_added()
+
+    def handle_error(self, engine, e):
+        w = engine.latex_walker
+
+        child_kind, tok = self.child_kind, self.child_tok
+        if child_kind is not None:
+            # the error was raised by a child frame
+            self.child_kind, self.child_tok = None, None
+            if isinstance(e, LatexWalkerParseError):
+                what = None
+                if child_kind == _CHILD_GROUP:
+                    what = 'open brace'
+                elif child_kind == _CHILD_MATH:
+                    what = 'math mode "{}"'.format(tok.arg)
+                elif child_kind == _CHILD_ENVIRONMENT:
+                    what = 'begin environment "{}"'.format(tok.arg)
+                if what is not None:
+                    e._push_open_context(what, tok.pos, w.pos_to_lineno_colno)
+
+        if isinstance(e, LatexWalkerEndOfStream):
+            stop_upon_closing_brace = self.stop_upon_closing_brace
+            stop_upon_end_environment = self.stop_upon_end_environment
+            stop_upon_closing_mathmode = self.stop_upon_closing_mathmode
+            if stop_upon_closing_brace or stop_upon_end_environment \
+               or stop_upon_closing_mathmode:
+                # unexpected eof
+                if stop_upon_closing_brace:
+                    expecting = "'"+stop_upon_closing_brace+"'"
+                elif stop_upon_end_environment:
+                    expecting = r"\end{"+stop_upon_end_environment+"}"
+                elif stop_upon_closing_mathmode:
+                    expecting = "'"+stop_upon_closing_mathmode+"'"
+                e = LatexWalkerParseError(
+                    s=w.s,
+                    pos=self.pos,
+                    msg="Unexpected end of stream, was expecting {}"
+                        .format(expecting),
+                    get_lineno_colno=w._lineno_colno_getter(len(w.s))
+                )
+                if w.tolerant_parsing:
+                    w._report_ignore_parse_error(e)
+                    self.end_now = True
+                    return
+                raise e
+            self.end_now = e
+            return
+
+        if w.tolerant_parsing:
+            w._report_ignore_parse_error(e)
+            return
+        raise e
+
+
+
+class _TopLevelNodesFrame(_NodesFrame):
+    r"""
+    A `_NodesFrame` which returns control to the engine as soon as a node is
+    available in its `nodelist`, see `_LatexNodesParser.iter_nodes()`.
+    """
+    __slots__ = ()
+
+    def step(self, engine):
+        if self.end_now is not None:
+            r_endnow, self.end_now = self.end_now, None
+            self.finish(engine, r_endnow)
+            return
+        while not self.nodelist:
+            r_endnow = self.read(engine)
+            if r_endnow is _PUSHED:
+                return
+            if r_endnow:
+                self.finish(engine, r_endnow)
+                return
+
+
+
+class _ArgsFrame(object):
+    r"""
+    The equivalent of a call to `MacroStandardArgsParser.parse_args()`, itself
+    wrapped in the exception handler which calls
+    `LatexWalker._exchandle_parse_subexpression()`.
+    """
+    __slots__ = ('args_parser', 'steps', 'pos', 'p', 'j', 'argnlist', 'parsing_state',
+                 'tok', 'what_kind', 'what_name', 'strict_braces', 'done',
+                 'child_kind', 'child_tok', 'child_parsing_state', 't0',)
+
+    def __init__(self, args_parser, pos, parsing_state, tok, what_kind, what_name,
+                 strict_braces):
+        self.args_parser = args_parser
+        self.steps = None
+        self.pos = pos
+        self.p = pos
+        self.j = None
+        self.argnlist = []
+        self.parsing_state = parsing_state
+        self.tok = tok
+        self.what_kind = what_kind
+        self.what_name = what_name
+        self.strict_braces = strict_braces
+        self.done = None
+        self.child_kind = None
+        self.child_tok = None
+        self.child_parsing_state = None
+        self.t0 = None
+
+    def step(self, engine):
+        if self.done is not None:
+            self.return_result(engine, self.done)
+            return
+
+        w = engine.latex_walker
+        args_parser = self.args_parser
+        argnlist = self.argnlist
+
+        if self.j is None:
+            if w.stats is not None:
+                self.t0 = w.stats._clock()
+            plan = args_parser._get_plan()
+            if plan.error is not None:
+                raise ValueError(plan.error)
+            self.steps = plan.steps
+            if args_parser._like_pylatexenc1x_ignore_leading_star:
+                # ignore any leading '*' character
+                tok = w.get_token(self.p)
+                if tok.tok == 'char' and tok.arg == '*':
+                    self.p = tok.pos + tok.len
+            self.j = 0
+
+        steps = self.steps
+        while self.j < len(steps):
+            (argt, _, arg_math_mode) = steps[self.j]
+            parsing_state = macrospec_argparsers._inner_parsing_state(self.parsing_state,
+                                                                      arg_math_mode)
+            p = self.p
+
+            if argt == '{':
+                # what get_latex_expression() does, with strict_braces=False
+                while True:
+                    tok = w.get_token(p, environments=False, parsing_state=parsing_state)
+                    if tok.tok != 'comment':
+                        break
+                    p = tok.pos + tok.len
+                if tok.tok == 'brace_open':
+                    self.child_kind = _CHILD_ARG_GROUP
+                    self.child_tok = tok
+                    self.child_parsing_state = parsing_state
+                    engine.push(_NodesFrame(
+                        w, tok.pos + tok.len, parsing_state,
+                        stop_upon_closing_brace=('{', '}'),
+                        stop_upon_end_environment=None,
+                        stop_upon_closing_mathmode=None,
+                        read_max_nodes=None,
+                        strict_braces=False,
+                    ))
+                    return
+                (node, np, nl) = w._get_latex_expression_from_token(
+                    p, tok, parsing_state, strict_braces=False
+                )
+                self.p = np + nl
+                argnlist.append(node)
+
+            elif argt == '[':
+
+                if args_parser.optional_arg_no_space and p < len(w.s) and w.s[p].isspace():
+                    # don't try to read optional arg, we don't allow space
+                    argnlist.append(None)
+                    self.j += 1
+                    continue
+
+                # what get_latex_maybe_optional_arg() does
+                tok = engine.get_token(p, include_brace_chars=[('[', ']')],
+                                       environments=False, parsing_state=parsing_state)
+                if tok.tok == 'brace_open' and tok.arg == '[':
+                    self.child_kind = _CHILD_ARG_GROUP
+                    self.child_tok = tok
+                    self.child_parsing_state = parsing_state
+                    engine.push(_NodesFrame(
+                        w, tok.pos + tok.len, parsing_state,
+                        stop_upon_closing_brace=('[', ']'),
+                        stop_upon_end_environment=None,
+                        stop_upon_closing_mathmode=None,
+                        read_max_nodes=None,
+                        strict_braces=self.strict_braces,
+                    ))
+                    return
+                argnlist.append(None)
+
+            elif argt == '*':
+                # possible star.
+                tok = w.get_token(p)
+                if tok.tok == 'char' and tok.arg.startswith('*'):
+                    # has star
+                    argnlist.append(
+                        w.make_node(LatexCharsNode,
+                                    parsing_state=parsing_state,
+                                    chars='*', pos=tok.pos, len=1)
+                    )
+                    self.p = tok.pos + 1
+                else:
+                    argnlist.append(None)
+
+            else:
+                raise LatexWalkerError(
+                    "Unknown macro argument kind for macro: {!r}".format(argt)
+                )
+
+            self.j += 1
+
+        parsed = macrospec_argparsers.ParsedMacroArgs(
+            argspec=args_parser.argspec,
+            argnlist=argnlist,
+        )
+        self.return_result(engine, (parsed, self.pos, self.p - self.pos))
+
+    def return_result(self, engine, result):
+        if self.t0 is not None:
+            engine.latex_walker.stats._add_args_time(self.what_kind, self.what_name,
+                                                     self.t0)
+        engine.return_result(result)
+
+    def child_done(self, engine, result):
+        w = engine.latex_walker
+        tok = self.child_tok
+        (nodelist, npos, nlen) = result
+        node = w.make_node(LatexGroupNode,
+                           nodelist=nodelist,
+                           parsing_state=self.child_parsing_state,
+                           delimiters=_closing_brace_for(tok.arg),
+                           pos=tok.pos,
+                           len=npos + nlen - tok.pos)
+        self.child_kind, self.child_tok, self.child_parsing_state = None, None, None
+        self.argnlist.append(node)
+        self.p = npos + nlen
+        self.j += 1
+
+    def handle_error(self, engine, e):
+        w = engine.latex_walker
+        self.child_kind, self.child_tok, self.child_parsing_state = None, None, None
+        if self.what_kind == 'macro':
+            what = "arguments of macro \"{}\"".format(self.what_name)
+        elif self.what_kind == 'environment':
+            what = "arguments of environment \"\\begin{{{}}}\"".format(self.what_name)
+        else:
+            what = "arguments of specials \"{}\"".format(self.what_name)
+        e = w._exchandle_parse_subexpression(e, self.tok, what)
+        if e is not None:
+            raise e
+        self.done = (None, self.tok.pos + self.tok.len, 0, {})
+
+
+
+class _EnvironmentFrame(object):
+    r"""
+    The equivalent of a call to `LatexWalker.get_latex_environment()`.
+    """
+    __slots__ = ('tok', 'parsing_state', 'strict_braces', 'env_spec', 'argd',
+                 'child_kind',)
+
+    def __init__(self, tok, parsing_state, strict_braces):
+        self.tok = tok
+        self.parsing_state = parsing_state
+        self.strict_braces = strict_braces
+        self.env_spec = None
+        self.argd = None
+        self.child_kind = None
+
+    def step(self, engine):
+        w = engine.latex_walker
+        tok = self.tok
+        environmentname = tok.arg
+        pos = tok.pos + tok.len
+
+        env_spec = self.parsing_state.latex_context.get_environment_spec(environmentname)
+        if env_spec is None:
+            env_spec = macrospec.EnvironmentSpec('')
+        self.env_spec = env_spec
+
+        args_parser = _get_standard_args_parser(env_spec, 'environment')
+        if args_parser is not None and _has_no_args(args_parser):
+            if w.stats is not None:
+                w.stats._add_args_time('environment', environmentname, w.stats._clock())
+            self.child_kind = _CHILD_ENVIRONMENT_ARGS
+            self.child_done(engine, _no_args_result(args_parser, pos))
+            return
+        if args_parser is not None:
+            self.child_kind = _CHILD_ENVIRONMENT_ARGS
+            engine.push(_ArgsFrame(args_parser, pos, self.parsing_state,
+                                   tok, 'environment', environmentname,
+                                   self.strict_braces))
+            return
+
+        stats = w.stats
+        if stats is not None:
+            t0 = stats._clock()
+        try:
+            with _util.PushPropOverride(w, 'strict_braces', self.strict_braces):
+                argsresult = env_spec.parse_args(w=w, pos=pos,
+                                                 parsing_state=self.parsing_state)
+        except _parse_exceptions as e:
+            e = w._exchandle_parse_subexpression(
+                e,
+                tok,
+                "arguments of environment \"\\begin{{{}}}\"".format(environmentname),
+            )
+            if e is not None: raise e
+            argsresult = (None, pos, 0, {})
+        if stats is not None:
+            stats._add_args_time('environment', environmentname, t0)
+
+        self.child_kind = _CHILD_ENVIRONMENT_ARGS
+        self.child_done(engine, argsresult)
+
+    def child_done(self, engine, result):
+        w = engine.latex_walker
+        tok = self.tok
+
+        if self.child_kind == _CHILD_ENVIRONMENT_ARGS:
+            if len(result) == 4:
+                (argd, apos, alen, adic) = result
+            else:
+                (argd, apos, alen) = result
+                adic = {}
+            self.argd = argd
+
+            parsing_state = self.parsing_state
+            parsing_state_inner = adic.get('inner_parsing_state', parsing_state)
+            if self.env_spec.is_math_mode:
+                parsing_state_inner = parsing_state._sub_context(
+                    in_math_mode=True,
+                    math_mode_delimiter='{'+tok.arg+'}',
+                )
+
+            self.child_kind = _CHILD_ENVIRONMENT_BODY
+            engine.push(_NodesFrame(
+                w, apos + alen, parsing_state_inner,
+                stop_upon_closing_brace=None,
+                stop_upon_end_environment=tok.arg,
+                stop_upon_closing_mathmode=None,
+                read_max_nodes=None,
+                strict_braces=self.strict_braces,
+            ))
+            return
+
+        assert self.child_kind == _CHILD_ENVIRONMENT_BODY
+        self.child_kind = None
+        (nodelist, npos, nlen) = result
+        argd = self.argd
+
+        if argd is not None and argd.legacy_nodeoptarg_nodeargs:
+            legnodeoptarg = argd.legacy_nodeoptarg_nodeargs[0]
+            legnodeargs = argd.legacy_nodeoptarg_nodeargs[1]
+        else:
+            legnodeoptarg, legnodeargs = None, []
+
+        node = w.make_node(LatexEnvironmentNode,
+                           parsing_state=self.parsing_state,
+                           environmentname=tok.arg,
+                           nodelist=nodelist,
+                           nodeargd=argd,
+                           # legacy:
+                           optargs=[legnodeoptarg],
+                           args=legnodeargs,
+                           pos=tok.pos,
+                           len=npos+nlen-tok.pos)
+        engine.return_result( (node, tok.pos, npos+nlen-tok.pos) )
+
+    def handle_error(self, engine, e):
+        # errors in the arguments have already been handled by the
+        # _ArgsFrame; errors in the environment body are simply propagated
+        self.child_kind = None
+        raise e
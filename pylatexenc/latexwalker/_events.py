@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+
+# Internal module. Internal API may move, disappear or otherwise change at any
+# time and without notice.
+
+r"""
+Event-based parsing for :py:meth:`LatexWalker.iter_latex_events()`.
+
+The same tokens are processed as in the iterative parsing engine (see
+`_engine.py`), but instead of collecting nodes into node lists, an event is
+reported for each construct as soon as it is read.  Only the arguments of
+macros, environments and specials are parsed into nodes, by their specs'
+`parse_args()` methods, as usual.
+"""
+
+from __future__ import print_function, unicode_literals
+
+
+from .. import macrospec
+from ._types import LatexWalkerParseError, _EndOfStreamToken
+from . import _engine
+
+
+
+class LatexEvent(object):
+    r"""
+    An event reported by :py:meth:`LatexWalker.iter_latex_events()`.
+
+    .. py:attribute:: event
+
+       A string which identifies the type of event.  It is one of:
+
+         - ``'chars'``: a run of characters with no special LaTeX meaning;
+
+         - ``'comment'``: a LaTeX comment.  The `comment` attribute contains
+           the text of the comment without the leading percent sign, and
+           `post_space` the newline and any spaces that follow it;
+
+         - ``'macro'``: a macro call along with its arguments.  The `name`
+           attribute is the macro name (without the leading backslash),
+           `nodeargd` contains the parsed arguments as in
+           :py:class:`LatexMacroNode`, and `post_space` any spaces after the
+           macro name;
+
+         - ``'specials'``: LaTeX specials along with their arguments.  The
+           `name` attribute contains the specials characters, and `nodeargd`
+           the parsed arguments (or `None`);
+
+         - ``'begin_environment'`` and ``'end_environment'``: the beginning
+           (including its arguments) and the end of an environment.  The
+           `name` attribute is the environment name, and for
+           ``'begin_environment'`` events `nodeargd` contains the parsed
+           arguments;
+
+         - ``'begin_group'`` and ``'end_group'``: the opening and the closing
+           brace of a LaTeX group.  The `delimiters` attribute is the tuple
+           ``('{', '}')``;
+
+         - ``'begin_math'`` and ``'end_math'``: the opening and the closing
+           delimiter of a math mode block.  The `delimiters` attribute is a
+           tuple with both delimiters (e.g., ``('\(', '\)')``) and
+           `displaytype` is ``'inline'`` or ``'display'``.
+
+       Attributes which don't apply to an event are `None`.
+
+    .. py:attribute:: pos
+    .. py:attribute:: len
+
+       The portion ``s[pos:pos+len]`` of the parsed string which the event
+       corresponds to.  For ``'end_*'`` events, this is the closing
+       delimiter (``len`` is zero if the construct is closed by the end of the
+       string in tolerant parsing mode).
+
+    .. py:attribute:: parsing_state
+
+       The parsing state in which the construct was read.  The events between
+       a ``'begin_math'`` and an ``'end_math'`` event, for instance, have a
+       parsing state in math mode.
+
+    .. versionadded:: 2.11
+
+       This class was introduced in `pylatexenc 2.11`.
+    """
+    __slots__ = ('event', 'pos', 'len', 'parsing_state', 'name', 'nodeargd',
+                 'delimiters', 'displaytype', 'comment', 'post_space',)
+
+    def __init__(self, event, pos, len, parsing_state, name=None, nodeargd=None,
+                 delimiters=None, displaytype=None, comment=None, post_space=None):
+        super(LatexEvent, self).__init__()
+        self.event = event
+        self.pos = pos
+        self.len = len
+        self.parsing_state = parsing_state
+        self.name = name
+        self.nodeargd = nodeargd
+        self.delimiters = delimiters
+        self.displaytype = displaytype
+        self.comment = comment
+        self.post_space = post_space
+
+    @property
+    def chars(self):
+        r"""
+        For ``'chars'`` events, the characters themselves.  (The string is
+        only extracted from the parsed string when you access this attribute.)
+        """
+        if self.event != 'chars':
+            return None
+        return self.latex_verbatim()
+
+    def latex_verbatim(self):
+        r"""
+        Return the LaTeX code ``s[pos:pos+len]`` which the event corresponds
+        to.
+        """
+        return self.parsing_state.s[self.pos:self.pos+self.len]
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__,
+            ", ".join( "{}={!r}".format(k, getattr(self, k))
+                       for k in self.__slots__
+                       if k != 'parsing_state' and getattr(self, k) is not None )
+        )
+
+
+
+def _open_context_what(begin_event):
+    # the same descriptions as in the open_contexts of get_latex_nodes() errors
+    if begin_event.event == 'begin_group':
+        return 'open brace'
+    if begin_event.event == 'begin_math':
+        return 'math mode "{}"'.format(begin_event.delimiters[0])
+    return 'begin environment "{}"'.format(begin_event.name)
+
+
+_what_args = {
+    'macro': "arguments of macro \"{}\"",
+    'environment': "arguments of environment \"\\begin{{{}}}\"",
+    'specials': "arguments of specials \"{}\"",
+}
+
+def _parse_args(w, spec, which, name, tok, pos, parsing_state):
+    # Parse the arguments of a macro, environment or specials like the parsing
+    # engine does, and return the 4-tuple (nodeargd, pos, len, dic).  In
+    # non-tolerant parsing mode, a parse error is returned instead.
+    args_parser = _engine._get_standard_args_parser(spec, which)
+    if args_parser is not None and _engine._has_no_args(args_parser):
+        return _engine._no_args_result(args_parser, pos) + ({},)
+
+    stats = w.stats
+    if stats is not None:
+        t0 = stats._clock()
+    try:
+        res = spec.parse_args(w=w, pos=pos, parsing_state=parsing_state)
+    except _engine._parse_exceptions as e:
+        e = w._exchandle_parse_subexpression(e, tok, _what_args[which].format(name))
+        if e is not None:
+            return e
+        res = (None, pos, 0, {})
+    if stats is not None:
+        stats._add_args_time(which, name, t0)
+
+    if res is None:
+        # specials which don't take arguments
+        return (None, pos, 0, {})
+    if len(res) == 3:
+        return res + ({},)
+    return res
+
+
+def _iter_latex_events(w, pos, parsing_state):
+
+    get_token = w._get_token_or_eos_function()
+    chars_run = w.tokenize_chars_runs
+    tolerant_parsing = w.tolerant_parsing
+
+    # The open groups, math mode blocks and environments, innermost last, as
+    # tuples (begin_event, closing, outer_parsing_state), where `closing` is
+    # the closing brace, the closing math mode delimiter or the environment
+    # name.
+    stack = []
+
+    # start of the characters which we have read but not reported yet
+    lastchars_pos = None
+
+    def error(e, extra_contexts=()):
+        # Report the parse error `e` in tolerant parsing mode, or return it
+        # after adding the open constructs to its `open_contexts`
+        if tolerant_parsing:
+            w._report_ignore_parse_error(e)
+            return None
+        for (what, cpos) in extra_contexts:
+            e._push_open_context(what, cpos, w.pos_to_lineno_colno)
+        for (begin_event, _, _) in reversed(stack):
+            e._push_open_context(_open_context_what(begin_event), begin_event.pos,
+                                 w.pos_to_lineno_colno)
+        return e
+
+    while True:
+
+        try:
+            tok = get_token(pos, parsing_state=parsing_state, chars_run=chars_run)
+        except LatexWalkerParseError as e:
+            # get_token() doesn't raise parse errors in tolerant parsing mode
+            raise error(e)
+
+        if tok.__class__ is _EndOfStreamToken:
+            if stack and not tolerant_parsing:
+                (begin_event, closing, _) = stack[-1]
+                if begin_event.event == 'begin_environment':
+                    expecting = r"\end{" + closing + "}"
+                else:
+                    expecting = "'" + closing + "'"
+                e = LatexWalkerParseError(
+                    s=w.s,
+                    pos=pos,
+                    msg="Unexpected end of stream, was expecting {}".format(expecting),
+                    get_lineno_colno=w._lineno_colno_getter(len(w.s))
+                )
+                raise error(e)
+            end = pos + len(tok.final_space)
+            if end > pos and lastchars_pos is None:
+                lastchars_pos = pos
+            if lastchars_pos is not None:
+                yield LatexEvent('chars', lastchars_pos, end - lastchars_pos, parsing_state)
+            # tolerant parsing mode: close everything that is still open
+            while stack:
+                (begin_event, closing, parsing_state) = stack.pop()
+                yield LatexEvent('end' + begin_event.event[5:], end, 0, parsing_state,
+                                 name=begin_event.name, delimiters=begin_event.delimiters,
+                                 displaytype=begin_event.displaytype)
+            return
+
+        pos = tok.pos + tok.len
+
+        if tok.tok == 'char':
+            if lastchars_pos is None and pos > tok.pos - len(tok.pre_space):
+                lastchars_pos = tok.pos - len(tok.pre_space)
+            continue
+
+        # report the characters read so far (or the space before this token)
+        # before anything else
+        if lastchars_pos is not None:
+            yield LatexEvent('chars', lastchars_pos, tok.pos - lastchars_pos, parsing_state)
+            lastchars_pos = None
+        elif tok.pre_space:
+            yield LatexEvent('chars', tok.pos - len(tok.pre_space), len(tok.pre_space),
+                             parsing_state)
+
+        if tok.tok == 'brace_close':
+            if stack and stack[-1][0].event == 'begin_group' and stack[-1][1] == tok.arg:
+                (begin_event, _, parsing_state) = stack.pop()
+                yield LatexEvent('end_group', tok.pos, tok.len, parsing_state,
+                                 delimiters=begin_event.delimiters)
+                continue
+            e = error(LatexWalkerParseError(
+                s=w.s,
+                pos=tok.pos,
+                msg="Unexpected mismatching closing brace: '%s'"%(tok.arg),
+                get_lineno_colno=w._lineno_colno_getter(tok.pos)
+            ))
+            if e is not None: raise e
+            continue
+
+        if tok.tok == 'end_environment':
+            if stack and stack[-1][0].event == 'begin_environment':
+                if stack[-1][1] == tok.arg:
+                    (begin_event, _, parsing_state) = stack.pop()
+                    yield LatexEvent('end_environment', tok.pos, tok.len, parsing_state,
+                                     name=tok.arg)
+                    continue
+                msg = ("Unexpected mismatching closing environment: '{}', "
+                       "was expecting '{}'".format(tok.arg, stack[-1][1]))
+            else:
+                msg = "Unexpected closing environment: '{}'".format(tok.arg)
+            e = error(LatexWalkerParseError(
+                s=w.s,
+                pos=tok.pos,
+                msg=msg,
+                get_lineno_colno=w._lineno_colno_getter(tok.pos)
+            ))
+            if e is not None: raise e
+            continue
+
+        if tok.tok in ('mathmode_inline', 'mathmode_display'):
+            in_math_block = stack and stack[-1][0].event == 'begin_math'
+            if in_math_block and tok.arg == stack[-1][1]:
+                (begin_event, _, parsing_state) = stack.pop()
+                yield LatexEvent('end_math', tok.pos, tok.len, parsing_state,
+                                 delimiters=begin_event.delimiters,
+                                 displaytype=begin_event.displaytype)
+                continue
+            if tok.arg in (r'\)', r'\]'):
+                # a closing delimiter which doesn't close anything
+                if in_math_block:
+                    msg = "Mismatching closing math mode: '{}', expected '{}'".format(
+                        tok.arg, stack[-1][1],
+                    )
+                else:
+                    msg = "Unexpected closing math mode: '{}'".format(tok.arg)
+                e = error(LatexWalkerParseError(
+                    s=w.s,
+                    pos=tok.pos,
+                    msg=msg,
+                    get_lineno_colno=w._lineno_colno_getter(tok.pos)
+                ))
+                if e is not None: raise e
+                continue
+            closing = {r'\(': r'\)', r'\[': r'\]'}.get(tok.arg, tok.arg)
+            begin_event = LatexEvent(
+                'begin_math', tok.pos, tok.len, parsing_state,
+                delimiters=(tok.arg, closing),
+                displaytype=('inline' if tok.arg in (r'\(', '$') else 'display')
+            )
+            stack.append( (begin_event, closing, parsing_state) )
+            parsing_state = parsing_state._sub_context(in_math_mode=True,
+                                                      math_mode_delimiter=tok.arg)
+            yield begin_event
+            continue
+
+        if tok.tok == 'comment':
+            yield LatexEvent('comment', tok.pos, tok.len, parsing_state,
+                             comment=tok.arg, post_space=tok.post_space)
+            continue
+
+        if tok.tok == 'brace_open':
+            begin_event = LatexEvent('begin_group', tok.pos, tok.len, parsing_state,
+                                     delimiters=_engine._closing_brace_for(tok.arg))
+            stack.append( (begin_event, begin_event.delimiters[1], parsing_state) )
+            yield begin_event
+            continue
+
+        if tok.tok == 'begin_environment':
+            environmentname = tok.arg
+            env_spec = parsing_state.latex_context.get_environment_spec(environmentname)
+            if env_spec is None:
+                env_spec = macrospec.EnvironmentSpec('')
+
+            res = _parse_args(w, env_spec, 'environment', environmentname, tok, pos,
+                              parsing_state)
+            if isinstance(res, Exception):
+                raise error(res, [ ('begin environment "{}"'.format(environmentname),
+                                    tok.pos) ])
+            (argd, apos, alen, adic) = res
+            pos = apos + alen
+
+            parsing_state_inner = adic.get('inner_parsing_state', parsing_state)
+            if env_spec.is_math_mode:
+                parsing_state_inner = parsing_state._sub_context(
+                    in_math_mode=True,
+                    math_mode_delimiter='{'+environmentname+'}',
+                )
+
+            begin_event = LatexEvent('begin_environment', tok.pos, pos - tok.pos,
+                                     parsing_state, name=environmentname, nodeargd=argd)
+            stack.append( (begin_event, environmentname, parsing_state) )
+            parsing_state = parsing_state_inner
+            yield begin_event
+            continue
+
+        if tok.tok == 'macro':
+            macroname = tok.arg
+            mspec = parsing_state.latex_context.get_macro_spec(macroname)
+            if mspec is None:
+                mspec = macrospec.MacroSpec('')
+
+            res = _parse_args(w, mspec, 'macro', macroname, tok, pos, parsing_state)
+            if isinstance(res, Exception):
+                raise error(res)
+            (nodeargd, mapos, malen, mdic) = res
+            pos = mapos + malen
+
+            event = LatexEvent('macro', tok.pos, pos - tok.pos, parsing_state,
+                               name=macroname, nodeargd=nodeargd, post_space=tok.post_space)
+            if 'new_parsing_state' in mdic:
+                parsing_state = mdic['new_parsing_state']
+            yield event
+            continue
+
+        if tok.tok == 'specials':
+            sspec = tok.arg
+
+            res = _parse_args(w, sspec, 'specials', sspec.specials_chars, tok, pos,
+                              parsing_state)
+            if isinstance(res, Exception):
+                raise error(res)
+            (nodeargd, spos, slen, sdic) = res
+            pos = spos + slen
+
+            event = LatexEvent('specials', tok.pos, pos - tok.pos, parsing_state,
+                               name=sspec.specials_chars, nodeargd=nodeargd)
+            if 'new_parsing_state' in sdic:
+                parsing_state = sdic['new_parsing_state']
+            yield event
+            continue
+
+        raise LatexWalkerParseError(
+            s=w.s,
+            pos=tok.pos,
+            msg="Unknown token: {!r}".format(tok),
+            get_lineno_colno=w._lineno_colno_getter(tok.pos)
+        )
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+# Internal module. Internal API may move, disappear or otherwise change at any
+# time and without notice.
+
+r"""
+Extraction of selected macros and environments from a document, see
+:py:meth:`LatexWalker.extract_latex_nodes()`.
+
+A regular expression finds the occurrences of the requested macros and
+environments, along with the few other constructs which determine how they
+are parsed: comments, braces, math mode delimiters, ``\begin``/``\end``, the
+verbatim macros, environments and specials, whose contents are skipped, and
+the macros whose arguments are parsed in math mode or in text mode (such as
+``\mbox``), which are parsed along with their arguments when they switch
+modes.  Everything else in between is skipped without tokenizing it.  The
+matched constructs are parsed by the walker as usual, in the parsing state
+(math mode or not) which the scan determined.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import re
+
+from ..macrospec import _argparsers as macrospec_argparsers
+from ._types import LatexWalkerError, LatexWalkerParseError, LatexMacroNode, \
+    LatexEnvironmentNode
+from ._helpers import _push_child_nodes
+from . import _engine
+
+
+_rx_environment = r'\\(begin|end)\s*\{([\w* ._-]+)\}'
+
+_rx_eol = re.compile(r'[\n\r]')
+
+# kinds of the constructs on the scan's stack
+_BRACE = 0
+_MATH = 1
+_ENVIRONMENT = 2
+
+_closing_math = { '$': '$', '$$': '$$', r'\(': r'\)', r'\[': r'\]' }
+
+_closing_math_escaped = (r'\(', r'\)', r'\[', r'\]')
+
+# groups of the scan's regular expression, see _make_scan_rx()
+_G_BEGINEND = 1
+_G_ENVIRONMENT = 2
+_G_MACRO = 3
+_G_ESCAPED = 4
+_G_COMMENT = 5
+_G_MATH = 6
+_G_BRACE = 7
+_G_SPECIALS = 8
+
+
+def _get_scan_names(latex_context):
+    # Names of the macros and specials chars which we need to look at when
+    # scanning: the verbatim macros and specials, whose arguments we should
+    # skip, mapped to their args parser (verbatim environments are checked
+    # when we see them), and the
+    # macros which parse some of their arguments in math mode, or in text
+    # mode, mapped to True or False respectively.
+    verbatim_macros = {}
+    verbatim_specials = {}
+    mode_macros = {}
+    for spec in latex_context.iter_macro_specs():
+        args_parser = getattr(spec, 'args_parser', None)
+        if isinstance(args_parser, macrospec_argparsers.VerbatimArgsParser):
+            verbatim_macros[spec.macroname] = args_parser
+            continue
+        args_math_mode = getattr(args_parser, 'args_math_mode', None)
+        if args_math_mode:
+            modes = set( m for m in args_math_mode if m is not None )
+            if len(modes) == 1:
+                mode_macros[spec.macroname] = modes.pop()
+            elif modes:
+                # arguments in both modes, we'll always have to parse them
+                mode_macros[spec.macroname] = None
+    for spec in latex_context.iter_specials_specs():
+        args_parser = getattr(spec, 'args_parser', None)
+        if isinstance(args_parser, macrospec_argparsers.VerbatimArgsParser):
+            verbatim_specials[spec.specials_chars] = args_parser
+    return (verbatim_macros, verbatim_specials, mode_macros)
+
+
+def _make_scan_rx(macronames, verbatim_macros, verbatim_specials, mode_macros):
+    # longer names first, so that the alternatives match the longest name
+    names = sorted(set(macronames) | set(verbatim_macros) | set(mode_macros),
+                   key=len, reverse=True)
+    parts = [ _rx_environment ]
+    if names:
+        parts.append(r'\\(' + '|'.join(
+            re.escape(name) + ('(?![a-zA-Z])' if name.isalpha() else '')
+            for name in names
+        ) + r')')
+    else:
+        parts.append(r'(?!)()')
+    # the escaped characters which we shouldn't mistake for a brace, a
+    # comment etc., and the math mode delimiters \( \) \[ \]
+    parts.append(r'\\([{}$%\\()\[\]])')
+    # the characters with which the alternatives start
+    start_chars = r'{}\\$%' + ''.join( re.escape(chars[0]) for chars in verbatim_specials )
+    # a group which contains none of these characters, such as '{2}' or
+    # '{sec:intro}', doesn't change the scan's state, so it's matched in one
+    # piece and skipped
+    parts.append(r'(%)|(\$\$?)|(\{[^' + start_chars + r']*\}|[{}])')
+    if verbatim_specials:
+        parts.append('(' + '|'.join(
+            re.escape(chars) for chars in sorted(verbatim_specials, key=len, reverse=True)
+        ) + ')')
+    # The lookahead lets the regex engine skip quickly over the characters
+    # which can't start a match, instead of trying each alternative at each
+    # position (this makes the scan about twice as fast)
+    return re.compile('(?=[' + start_chars + '])(?:' + '|'.join(parts) + ')',
+                      flags=re.UNICODE|re.DOTALL)
+
+
+class _Extractor(object):
+    r"""
+    (INTERNAL.)  Scans `w.s` for the macros `macronames` and the environments
+    `environmentnames`, see :py:meth:`LatexWalker.extract_latex_nodes()`.
+    """
+    def __init__(self, w, macronames, environmentnames):
+        self.w = w
+        self.macronames = frozenset(macronames)
+        self.environmentnames = frozenset(environmentnames)
+        # environment name -> (verbatim args parser or None, is_math_mode)
+        self.environment_info = {}
+        # a single parser for all the constructs we parse, so that the nodes
+        # read for unterminated arguments can be reused (see
+        # _NodesFrame.reuse_eof_frame())
+        self.parser = None
+        if w._use_iterative_parsing():
+            self.parser = _engine._LatexNodesParser(w)
+
+    def _get_environment_info(self, latex_context, environmentname):
+        info = self.environment_info.get(environmentname)
+        if info is None:
+            spec = latex_context.get_environment_spec(environmentname)
+            args_parser = getattr(spec, 'args_parser', None)
+            if not isinstance(args_parser, macrospec_argparsers.VerbatimArgsParser):
+                args_parser = None
+            info = (args_parser, bool(getattr(spec, 'is_math_mode', False)))
+            self.environment_info[environmentname] = info
+        return info
+
+    def _parse_node(self, pos, parsing_state):
+        # parse the construct at `pos` as the walker would
+        if self.parser is not None:
+            (nodelist, npos, nlen) = self.parser.parse_nodes(pos, read_max_nodes=1,
+                                                             parsing_state=parsing_state)
+        else:
+            (nodelist, npos, nlen) = self.w.get_latex_nodes(pos, read_max_nodes=1,
+                                                            parsing_state=parsing_state)
+        return nodelist[0]
+
+    def _find_nodes(self, node):
+        # the outermost nodes of the requested macros and environments in the
+        # node tree `node`, in the order in which they appear
+        found = []
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n is None:
+                continue
+            if (n.isNodeType(LatexMacroNode) and n.macroname in self.macronames) \
+               or (n.isNodeType(LatexEnvironmentNode)
+                   and n.environmentname in self.environmentnames):
+                found.append(n)
+                continue
+            _push_child_nodes(stack, n)
+        found.sort(key=lambda n: n.pos)
+        return found
+
+    def _skip_verbatim(self, args_parser, pos, endpos, parsing_state):
+        # Return the position after the verbatim construct at `pos`, whose name
+        # ends at `endpos`.  If its verbatim argument can't be read, then the
+        # walker (in tolerant parsing mode) parses the rest as usual and so do
+        # we: return `endpos`.
+        w = self.w
+        tok = w.get_token(pos, parsing_state=parsing_state)
+        try:
+            (argd, apos, alen) = args_parser.parse_args(w, tok.pos + tok.len,
+                                                        parsing_state=parsing_state)[:3]
+        except LatexWalkerParseError:
+            return endpos
+        p = apos + alen
+        if tok.tok == 'begin_environment':
+            # the verbatim contents are followed by \end{environment}
+            try:
+                endtok = w.get_token(p, parsing_state=parsing_state)
+            except LatexWalkerError:
+                return endpos
+            if endtok.tok != 'end_environment' or endtok.arg != tok.arg:
+                return endpos
+            p = endtok.pos + endtok.len
+        return max(endpos, p)
+
+    def run(self, pos, parsing_state):
+
+        w = self.w
+        s = w.s
+        n = len(s)
+        latex_context = parsing_state.latex_context
+
+        if hasattr(latex_context, '_get_cached'):
+            verbatim_macros, verbatim_specials, mode_macros = latex_context._get_cached(
+                'extract_scan_names',
+                lambda: _get_scan_names(latex_context)
+            )
+            rx = latex_context._get_cached(
+                ('extract_scan_rx', self.macronames),
+                lambda: _make_scan_rx(self.macronames, verbatim_macros,
+                                      verbatim_specials, mode_macros)
+            )
+        else:
+            verbatim_macros, verbatim_specials, mode_macros = \
+                _get_scan_names(latex_context)
+            rx = _make_scan_rx(self.macronames, verbatim_macros, verbatim_specials,
+                               mode_macros)
+
+        base_parsing_state = parsing_state
+        # the open braces, math mode blocks and environments, as tuples (kind,
+        # closing delimiter or environment name, parsing state inside).  Like
+        # the walker in tolerant parsing mode, we ignore closing delimiters
+        # which don't match the innermost open construct.
+        stack = []
+
+        nodes = []
+
+        while pos < n:
+            m = rx.search(s, pos)
+            if m is None:
+                break
+            pos = m.end()
+            k = m.lastindex
+
+            if k == _G_BRACE:
+                brace = m.group(k)
+                if brace == '{':
+                    stack.append( (_BRACE, '}', parsing_state) )
+                elif brace != '}':
+                    # a whole group without anything of interest in it
+                    pass
+                elif stack and stack[-1][0] == _BRACE:
+                    stack.pop()
+                    parsing_state = stack[-1][2] if stack else base_parsing_state
+
+            elif k == _G_MACRO:
+                macroname = m.group(k)
+                if macroname.isalpha() and pos < n and s[pos].isalpha():
+                    # a longer macro name with non-ascii letters
+                    continue
+                if macroname in self.macronames:
+                    node = self._parse_node(m.start(), parsing_state)
+                    nodes.append(node)
+                    pos = max(pos, node.pos + node.len)
+                elif macroname in verbatim_macros:
+                    pos = self._skip_verbatim(verbatim_macros[macroname], m.start(), pos,
+                                              parsing_state)
+                else:
+                    mode = mode_macros[macroname]
+                    if mode is None or mode != parsing_state.in_math_mode:
+                        # the arguments are parsed in another mode, so parse
+                        # the macro and look for our nodes in its arguments
+                        node = self._parse_node(m.start(), parsing_state)
+                        nodes.extend(self._find_nodes(node))
+                        pos = max(pos, node.pos + node.len)
+
+            elif k == _G_ENVIRONMENT:
+                environmentname = m.group(k)
+                if m.group(_G_BEGINEND) == 'end':
+                    if stack and stack[-1][0] == _ENVIRONMENT \
+                       and stack[-1][1] == environmentname:
+                        stack.pop()
+                        parsing_state = stack[-1][2] if stack else base_parsing_state
+                    continue
+                if environmentname in self.environmentnames:
+                    node = self._parse_node(m.start(), parsing_state)
+                    nodes.append(node)
+                    pos = max(pos, node.pos + node.len)
+                    continue
+                (verbatim_args_parser, is_math_mode) = \
+                    self._get_environment_info(latex_context, environmentname)
+                if verbatim_args_parser is not None:
+                    p = self._skip_verbatim(verbatim_args_parser, m.start(), pos,
+                                            parsing_state)
+                    if p != pos:
+                        pos = p
+                        continue
+                if is_math_mode:
+                    parsing_state = parsing_state._sub_context(
+                        in_math_mode=True,
+                        math_mode_delimiter='{'+environmentname+'}',
+                    )
+                stack.append( (_ENVIRONMENT, environmentname, parsing_state) )
+
+            elif k == _G_COMMENT:
+                # skip the comment
+                m = _rx_eol.search(s, pos)
+                if m is None:
+                    break
+                pos = m.end()
+
+            elif k == _G_MATH or k == _G_ESCAPED:
+                delim = m.group(k)
+                if k == _G_ESCAPED:
+                    delim = '\\' + delim
+                    if delim not in _closing_math_escaped:
+                        continue
+                if delim == '$$' and parsing_state.in_math_mode \
+                   and parsing_state.math_mode_delimiter == '$':
+                    # '$$' in '$'-math mode is read as two '$' signs
+                    delim = '$'
+                    pos -= 1
+                if stack and stack[-1][0] == _MATH and stack[-1][1] == delim:
+                    stack.pop()
+                    parsing_state = stack[-1][2] if stack else base_parsing_state
+                elif delim in _closing_math:
+                    parsing_state = parsing_state._sub_context(
+                        in_math_mode=True,
+                        math_mode_delimiter=delim,
+                    )
+                    stack.append( (_MATH, _closing_math[delim], parsing_state) )
+
+            else: # _G_SPECIALS
+                # verbatim specials
+                pos = self._skip_verbatim(verbatim_specials[m.group(k)], m.start(), pos,
+                                          parsing_state)
+
+        return nodes
@@ -55,6 +55,52 @@ import json
 
 
 
+# fields of the standard node classes which can contain other nodes
+_node_child_fields = {
+    LatexCharsNode: (),
+    LatexCommentNode: (),
+    LatexGroupNode: ('nodelist',),
+    LatexMathNode: ('nodelist',),
+    LatexMacroNode: ('nodeargd',),
+    LatexSpecialsNode: ('nodeargd',),
+    LatexEnvironmentNode: ('nodeargd', 'nodelist',),
+}
+
+def _push_child_nodes(stack, node):
+    # (INTERNAL.) Append the child nodes of `node` (including the nodes of
+    # macro arguments) to the list `stack`.  Used to walk node trees without
+    # recursion.
+    fields = _node_child_fields.get(node.__class__)
+    if fields is None:
+        fields = node._fields
+    for fld in fields:
+        value = getattr(node, fld)
+        if isinstance(value, LatexNode):
+            stack.append(value)
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, macrospec.ParsedMacroArgs) and value.argnlist:
+            stack.extend(value.argnlist)
+
+
+def _relocate_nodes(nodelist, delta, get_parsing_state):
+    # (INTERNAL.) Shift the positions of the given nodes and of all their
+    # descendants (including macro arguments) by `delta`, and replace their
+    # parsing state by `get_parsing_state(node.parsing_state)`.  The nodes are
+    # modified in place.  Doesn't use recursion, so that arbitrarily deep node
+    # trees can be processed.
+    stack = list(nodelist)
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        if delta and node.pos is not None:
+            node.pos += delta
+        node.parsing_state = get_parsing_state(node.parsing_state)
+        _push_child_nodes(stack, node)
+
+
+
 #
 # small utilities for displaying & debugging
 #
@@ -234,7 +280,7 @@ def make_json_encoder(latexwalker, use_line_numbers=True):
                 }
                 #redundant_fields = getattr(n, '_redundant_fields', n._fields)
                 for fld in n._fields:
-                    d[fld] = n.__dict__[fld]
+                    d[fld] = getattr(n, fld)
                 d.update(latexwalker.pos_to_lineno_colno(n.pos, as_dict=True))
                 return d
 
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+# Internal module. Internal API may move, disappear or otherwise change at any
+# time and without notice.
+
+r"""
+Incremental re-parsing of a node tree after an edit of the parsed string, see
+:py:meth:`LatexWalker.get_latex_nodes_after_edit()`.
+
+The nodes of a node list are parsed one after the other, and how the rest of
+the node list is parsed only depends on the position and on the parsing state
+at which the next node starts (and on how the node list ends, e.g., at a
+closing brace; errors are handled within the node list in tolerant parsing
+mode).  After an edit, we can thus re-parse the node list starting a bit
+before the edit, until we reach a node boundary after the edit which
+corresponds to a node boundary in the old node list, with the same parsing
+state.  From there on, the old nodes can be kept, with their positions
+shifted.
+
+When parsing a node, the parser might have looked at the beginning of the
+following node (e.g. to check for an optional argument, which might be
+preceded by whitespace or comments, or to find where a macro name ends).  We
+therefore start re-parsing two "substantive" nodes (i.e., nodes which are not
+whitespace or comments) before the node in which the edit occurs.
+
+If the edit lies within the body of a group, of an environment or of a math
+block, we first try to re-parse only that body.  If we can't resynchronize
+with the old nodes before the end of the body, or if the body now ends at a
+different position, we try again with the enclosing node list, and so on.
+"""
+
+from __future__ import print_function, unicode_literals
+
+
+from ._types import *
+from ._helpers import _relocate_nodes, _push_child_nodes
+from . import _engine
+
+
+# number of "substantive" nodes we re-parse before the edit
+_NUM_SAFETY_NODES = 2
+
+
+def _node_end(node):
+    return node.pos + node.len
+
+
+def _is_substantive(node):
+    if node.isNodeType(LatexCommentNode):
+        return False
+    if node.isNodeType(LatexCharsNode) and not node.chars.strip():
+        return False
+    return True
+
+
+def _is_error_recovery_node(node):
+    # Whether this is a macro, environment or specials node for which parsing
+    # the arguments failed in tolerant parsing mode.  The error might have
+    # been detected arbitrarily far after the node, e.g., when looking for the
+    # end of a verbatim argument.
+    if isinstance(node, (LatexMacroNode, LatexEnvironmentNode)):
+        return node.nodeargd is None
+    if isinstance(node, LatexSpecialsNode) and node.nodeargd is None:
+        sspec = node.parsing_state.latex_context.get_specials_spec(node.specials_chars)
+        return sspec is not None and sspec.args_parser is not None
+    return False
+
+
+def _find_error_recovery_node_before(nodelist, pos):
+    # Return the position of the first error recovery node (see above) which
+    # starts before `pos`, at any depth in the node tree, or `None`.
+    first_pos = None
+    stack = [ node for node in nodelist if node.pos < pos ]
+    while stack:
+        node = stack.pop()
+        if node is None or node.pos >= pos:
+            continue
+        if _is_error_recovery_node(node):
+            if first_pos is None or node.pos < first_pos:
+                first_pos = node.pos
+        _push_child_nodes(stack, node)
+    return first_pos
+
+
+def _same_state_fields(parsing_state, other_parsing_state):
+    fields = parsing_state.get_fields()
+    other_fields = other_parsing_state.get_fields()
+    del fields['s'], other_fields['s']
+    return fields == other_fields
+
+
+def _find_container(nodelist, pos, end):
+    # Find a node in `nodelist` which contains a nonempty node list in which
+    # the region [pos, end) lies entirely.  Returns the node's index in
+    # `nodelist` or `None`.
+    for j, node in enumerate(nodelist):
+        if node.pos > pos:
+            break
+        if _node_end(node) < end:
+            continue
+        if node.isNodeType(LatexGroupNode) or node.isNodeType(LatexEnvironmentNode) \
+           or node.isNodeType(LatexMathNode):
+            body = node.nodelist
+            if body and body[0].pos <= pos and end <= _node_end(body[-1]):
+                return j
+    return None
+
+
+def _container_stop_condition(node):
+    if node.isNodeType(LatexGroupNode):
+        return { 'stop_upon_closing_brace': node.delimiters }
+    if node.isNodeType(LatexMathNode):
+        return { 'stop_upon_closing_mathmode': node.delimiters[1] }
+    return { 'stop_upon_end_environment': node.environmentname }
+
+
+
+class _IncrementalParser(object):
+    r"""
+    Re-parse the node list `nodelist`, which was obtained by parsing a string
+    from which `latex_walker.s` was obtained by replacing `removed_len`
+    characters at position `pos` by `inserted_len` other characters.
+    """
+    def __init__(self, latex_walker, nodelist, pos, removed_len, inserted_len):
+        super(_IncrementalParser, self).__init__()
+        self.latex_walker = latex_walker
+        self.nodelist = nodelist
+        # Nodes which were parsed with errors before the edit might change,
+        # too; we treat the region starting at such a node as edited.
+        error_pos = None
+        if latex_walker.tolerant_parsing:
+            error_pos = _find_error_recovery_node_before(nodelist, pos)
+        if error_pos is not None:
+            removed_len += pos - error_pos
+            inserted_len += pos - error_pos
+            pos = error_pos
+        self.pos = pos
+        self.old_end = pos + removed_len
+        self.new_end = pos + inserted_len
+        self.delta = inserted_len - removed_len
+        self.new_parsing_states = {}
+
+    def get_parsing_state(self, parsing_state):
+        # the parsing state object to use, instead of `parsing_state` (which
+        # refers to the old string), in nodes which we keep
+        newps = self.new_parsing_states.get(id(parsing_state))
+        if newps is None:
+            newps = parsing_state._sub_context(s=self.latex_walker.s)
+            # keep a reference to the old parsing state so that its id() isn't
+            # reused
+            self.new_parsing_states[id(parsing_state)] = (newps, parsing_state)
+            return newps
+        return newps[0]
+
+    def run(self):
+        # find the chain of nodes which contain the edit
+        containers = []
+        nodelist = self.nodelist
+        while True:
+            j = _find_container(nodelist, self.pos, self.old_end)
+            if j is None:
+                break
+            containers.append( (nodelist, j) )
+            nodelist = nodelist[j].nodelist
+
+        # re-parse the innermost possible node list
+        depth = len(containers)
+        while True:
+            if depth:
+                (parent_nodelist, j) = containers[depth-1]
+                container = parent_nodelist[j]
+                nodelist = container.nodelist
+            else:
+                container = None
+                nodelist = self.nodelist
+            result = self.reparse_nodelist(nodelist, container)
+            if result is not None:
+                break
+            depth -= 1
+
+        # now that parsing succeeded, update the old nodes which we keep
+        (i0, new_nodes, i1) = result
+        get_parsing_state = self.get_parsing_state
+        _relocate_nodes(nodelist[:i0], 0, get_parsing_state)
+        _relocate_nodes(nodelist[i1:], self.delta, get_parsing_state)
+        new_nodelist = nodelist[:i0] + new_nodes + nodelist[i1:]
+        for (parent_nodelist, j) in reversed(containers[:depth]):
+            container = parent_nodelist[j]
+            # don't visit the container's (new) body in _relocate_nodes()
+            container.nodelist = []
+            _relocate_nodes([container], 0, get_parsing_state)
+            container.nodelist = new_nodelist
+            container.len += self.delta
+            _relocate_nodes(parent_nodelist[:j], 0, get_parsing_state)
+            _relocate_nodes(parent_nodelist[j+1:], self.delta, get_parsing_state)
+            new_nodelist = list(parent_nodelist)
+        return new_nodelist
+
+    def reparse_nodelist(self, nodelist, container):
+        r"""
+        Re-parse the node list `nodelist`, which is the body of `container`, or
+        the top-level node list if `container` is `None`.  Returns `(i0,
+        new_nodes, i1)` to indicate that the old nodes `nodelist[i0:i1]` are to
+        be replaced by `new_nodes`, or `None` if we need to re-parse the
+        enclosing node list instead.
+        """
+        w = self.latex_walker
+        n = len(nodelist)
+
+        # the node in which the edit starts (or just after which it starts)
+        k = 0
+        while k < n and _node_end(nodelist[k]) < self.pos:
+            k += 1
+
+        i0 = k
+        num_safety_nodes = 0
+        while i0 > 0 and num_safety_nodes < _NUM_SAFETY_NODES:
+            i0 -= 1
+            if _is_substantive(nodelist[i0]):
+                num_safety_nodes += 1
+
+        if container is not None:
+            if num_safety_nodes < _NUM_SAFETY_NODES:
+                # the edit might affect how the container's beginning is parsed
+                return None
+            stop_condition = _container_stop_condition(container)
+        else:
+            stop_condition = {}
+
+        if container is None and i0 == 0:
+            # re-parse from the beginning
+            pos = 0
+            parsing_state = w._make_parsing_state()
+        else:
+            pos = nodelist[i0].pos
+            parsing_state = self.get_parsing_state(nodelist[i0].parsing_state)
+
+        parser = _engine._LatexNodesParser(
+            w,
+            delegate_to_walker=not w._use_iterative_parsing()
+        )
+        new_nodes = []
+        i1 = k
+        try:
+            for (node, npos, nparsing_state) in parser.iter_nodes(pos, parsing_state,
+                                                                 **stop_condition):
+                new_nodes.append(node)
+                if npos < self.new_end:
+                    continue
+                # see if we can resume with the old nodes here
+                oldpos = npos - self.delta
+                if container is not None and oldpos > _node_end(container):
+                    # the body no longer ends where it used to
+                    return None
+                while i1 < n and nodelist[i1].pos < oldpos:
+                    i1 += 1
+                if i1 < n and nodelist[i1].pos == oldpos \
+                   and _same_state_fields(nparsing_state, nodelist[i1].parsing_state):
+                    return (i0, new_nodes, i1)
+        except (LatexWalkerParseError, LatexWalkerEndOfStream):
+            if container is None:
+                raise
+            # let the enclosing node list report the error exactly as a full
+            # parse would
+            return None
+
+        if container is not None:
+            (_, npos, nlen) = parser.result
+            if npos + nlen != _node_end(container) + self.delta:
+                # the body no longer ends where it used to
+                return None
+        return (i0, new_nodes, n)
@@ -0,0 +1,706 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+# Internal module. Internal API may move, disappear or otherwise change at any
+# time and without notice.
+
+from __future__ import print_function, unicode_literals
+
+
+# for Py3
+_basestring = str
+
+## Begin Py2 support code
+import sys
+if sys.version_info.major == 2:
+    # Py2
+    _basestring = basestring
+## End Py2 support code
+
+
+import array
+
+from .. import macrospec
+from ._types import *
+
+
+
+KIND_OTHER = 0
+KIND_CHARS = 1
+KIND_GROUP = 2
+KIND_COMMENT = 3
+KIND_MACRO = 4
+KIND_ENVIRONMENT = 5
+KIND_SPECIALS = 6
+KIND_MATH = 7
+
+_node_kinds = {
+    LatexCharsNode: KIND_CHARS,
+    LatexGroupNode: KIND_GROUP,
+    LatexCommentNode: KIND_COMMENT,
+    LatexMacroNode: KIND_MACRO,
+    LatexEnvironmentNode: KIND_ENVIRONMENT,
+    LatexSpecialsNode: KIND_SPECIALS,
+    LatexMathNode: KIND_MATH,
+}
+
+# (column name, array typecode)
+_columns = (
+    ('kind', 'b'),
+    ('pos', 'l'),
+    ('len', 'l'),
+    ('parent', 'i'),
+    ('first_child', 'i'),
+    ('next_sibling', 'i'),
+    ('arg_index', 'h'),
+    ('name_id', 'i'),
+    ('argspec_id', 'i'),
+    ('state_id', 'i'),
+    ('aux', 'i'),
+)
+
+
+def _new_column(typecode):
+    # array.array() requires a native `str` typecode on Py2
+    return array.array(str(typecode))
+
+
+
+class LatexNodeTable(object):
+    r"""
+    A flat, array-backed representation of a node tree, see
+    :py:meth:`LatexWalker.get_latex_node_table()`.
+
+    Each node of the tree is stored as one row (identified by its index) in the
+    following columns, which are :py:class:`array.array` objects of integers:
+
+    .. py:attribute:: kind
+
+       The type of the node, one of the constants `KIND_CHARS`, `KIND_GROUP`,
+       `KIND_COMMENT`, `KIND_MACRO`, `KIND_ENVIRONMENT`, `KIND_SPECIALS`,
+       `KIND_MATH` (class attributes of `LatexNodeTable`); or `KIND_OTHER` for
+       nodes of any other class, which are stored as Python objects.
+
+    .. py:attribute:: pos
+
+    .. py:attribute:: len
+
+       The position and the length of the node in the parsed string.
+
+    .. py:attribute:: parent
+
+    .. py:attribute:: first_child
+
+    .. py:attribute:: next_sibling
+
+       The index of the parent node, of the first child node and of the next
+       sibling node, or `-1`.  The children of a node are the nodes of its
+       macro arguments (in order) followed by the nodes of its body (its
+       `nodelist`).  Top-level nodes have parent `-1` and are chained with
+       `next_sibling`, too.
+
+    .. py:attribute:: arg_index
+
+       For a node which is a macro argument, the index of the argument in the
+       parent's `nodeargd.argnlist`; or `-1` for nodes which are part of the
+       parent's `nodelist` or which are top-level nodes.
+
+    .. py:attribute:: name_id
+
+       The index in :py:attr:`names` of the macro name, environment name or
+       specials characters of the node; or of the `delimiters` pair of a group
+       or math node; or `-1`.
+
+    .. py:attribute:: argspec_id
+
+       The index in :py:attr:`names` of the `nodeargd.argspec` of macro,
+       environment and specials nodes; or `-1` if the node has no arguments
+       information (`nodeargd` is `None`).
+
+    .. py:attribute:: state_id
+
+       The index in :py:attr:`parsing_states` of the node's parsing state.
+
+    .. py:attribute:: aux
+
+       For comment nodes, the length of the comment; for macro nodes, the
+       length of the macro's post-space.
+
+    The interned Python objects referred to by these columns are stored in
+    the lists:
+
+    .. py:attribute:: names
+
+       Interned strings (macro names, environment names, specials characters,
+       argument specifications) and delimiter pairs, see `name_id` and
+       `argspec_id`.
+
+    .. py:attribute:: parsing_states
+
+       The distinct parsing states of the nodes, see `state_id`.
+
+    The rows are in document order, i.e., in the order in which the nodes
+    start in the parsed string (parents before their children), so the `pos`
+    column is sorted.  The columns can be scanned with simple loops, or with
+    NumPy using :py:meth:`get_numpy_columns()`.
+
+    Node objects are only created on demand, with :py:meth:`get_node()` or
+    :py:meth:`get_nodelist()`.  These return read-only views which are
+    instances of the usual node classes (e.g., a view of a macro node is an
+    instance of :py:class:`LatexMacroNode`), and whose attributes are computed
+    from the table.  (Attributes which can't be recovered from the parsed
+    string and the columns, e.g., custom `ParsedMacroArgs` subclasses such as
+    the arguments of ``\verb``, are stored alongside the table as Python
+    objects.)
+
+    .. versionadded:: 2.11
+
+       This class was introduced in `pylatexenc 2.11`.
+    """
+
+    KIND_OTHER = KIND_OTHER
+    KIND_CHARS = KIND_CHARS
+    KIND_GROUP = KIND_GROUP
+    KIND_COMMENT = KIND_COMMENT
+    KIND_MACRO = KIND_MACRO
+    KIND_ENVIRONMENT = KIND_ENVIRONMENT
+    KIND_SPECIALS = KIND_SPECIALS
+    KIND_MATH = KIND_MATH
+
+    def __init__(self):
+        super(LatexNodeTable, self).__init__()
+
+        for (name, typecode) in _columns:
+            setattr(self, name, _new_column(typecode))
+
+        self.names = []
+        self.parsing_states = []
+
+        self._name_ids = {}
+        self._state_ids = {}
+        # row index -> dictionary of field values which we can't recover from
+        # the columns
+        self._extra = {}
+        self._first_root = -1
+        self._last_root = -1
+
+    def __len__(self):
+        return len(self.kind)
+
+    def append_nodes(self, nodelist):
+        r"""
+        Add the given nodes (and all their descendants) to the table as
+        top-level nodes.  The argument `nodelist` can be any iterable of nodes,
+        e.g., the generator returned by :py:meth:`LatexWalker.iter_latex_nodes()`;
+        the nodes are not retained by the table.
+        """
+        for node in nodelist:
+            self._append_tree(node)
+
+    def get_node(self, index):
+        r"""
+        Return a read-only view of the node at the given row index, which
+        behaves like the original node.  A new view object is created each time.
+        """
+        kind = self.kind[index]
+        if kind == KIND_OTHER:
+            return self._extra[index]['node']
+        return _view_classes[kind](self, index)
+
+    def get_nodelist(self):
+        r"""
+        Return a list of views (see :py:meth:`get_node()`) of the top-level
+        nodes.
+        """
+        return [ self.get_node(j) for j in self.iter_children(-1) ]
+
+    def iter_children(self, index):
+        r"""
+        Yield the row indices of the children of the node at the given row
+        index, including the nodes of the macro arguments (see
+        :py:attr:`arg_index`).  If `index` is `-1`, yields the indices of the
+        top-level nodes.
+        """
+        if index == -1:
+            j = self._first_root
+        else:
+            j = self.first_child[index]
+        next_sibling = self.next_sibling
+        while j != -1:
+            yield j
+            j = next_sibling[j]
+
+    def iter_indices(self, node_class=None, name=None):
+        r"""
+        Yield the row indices of all nodes of the given class (e.g.,
+        :py:class:`LatexMacroNode`) and/or with the given name (macro name,
+        environment name or specials characters), in document order.
+        """
+        if node_class is not None:
+            kind = _node_kinds.get(node_class, KIND_OTHER)
+        if name is not None:
+            name_id = self.get_name_id(name)
+            if name_id == -1:
+                return
+        if node_class is None and name is None:
+            for j in range(len(self.kind)):
+                yield j
+        elif name is None:
+            for (j, k) in enumerate(self.kind):
+                if k == kind:
+                    yield j
+        else:
+            name_ids = self.name_id
+            for (j, k) in enumerate(self.kind):
+                if name_ids[j] == name_id and (node_class is None or k == kind):
+                    yield j
+
+    def get_name(self, index):
+        r"""
+        Return the macro name, environment name or specials characters of the
+        node at the given row index (or the delimiters pair of a group or math
+        node), or `None`.
+        """
+        name_id = self.name_id[index]
+        if name_id == -1:
+            return None
+        return self.names[name_id]
+
+    def get_name_id(self, name):
+        r"""
+        Return the index of `name` in :py:attr:`names`, or `-1` if no node has
+        this name.  Useful to look for nodes with a given name in the
+        :py:attr:`name_id` column.
+        """
+        return self._name_ids.get(name, -1)
+
+    def get_numpy_columns(self):
+        r"""
+        Return a dictionary of NumPy arrays, one for each column (`kind`,
+        `pos`, etc.).  The NumPy arrays share their memory with the table's
+        columns.  (While they exist, no nodes can be appended to the table.)
+
+        This method requires NumPy to be installed.
+        """
+        import numpy # raises ImportError if NumPy is not available
+
+        d = {}
+        for (name, typecode) in _columns:
+            column = getattr(self, name)
+            if len(column):
+                d[name] = numpy.frombuffer(column, dtype=numpy.dtype(str(typecode)))
+            else:
+                d[name] = numpy.zeros(0, dtype=numpy.dtype(str(typecode)))
+        return d
+
+    #
+    # building the table
+    #
+
+    def _intern_name(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self._name_ids[name] = name_id
+        return name_id
+
+    def _intern_parsing_state(self, parsing_state):
+        state_id = self._state_ids.get(id(parsing_state))
+        if state_id is None:
+            # (the parsing state is kept in self.parsing_states, so its id()
+            # can't be reused)
+            state_id = len(self.parsing_states)
+            self.parsing_states.append(parsing_state)
+            self._state_ids[id(parsing_state)] = state_id
+        return state_id
+
+    def _append_tree(self, topnode, parent=-1, arg_index=-1, last_child=None):
+        # Add the node `topnode` and its descendants in document order, without
+        # recursion.  The dictionary `last_child` maps row indices to the index
+        # of their last child row so far.
+        if last_child is None:
+            last_child = {}
+        stack = [ (topnode, parent, arg_index) ]
+        while stack:
+            (node, parent, arg_index) = stack.pop()
+            (j, children) = self._append_row(node, parent, arg_index, last_child)
+            for (child, child_arg_index) in reversed(children):
+                stack.append( (child, j, child_arg_index) )
+
+    def _append_events(self, events):
+        # Add the nodes described by the events of
+        # LatexWalker.iter_latex_events() as top-level nodes.  The rows are
+        # written as the events arrive; apart from the nodes of macro
+        # arguments, no node objects are involved.
+        last_child = {}
+        # row indices of the open groups, environments and math blocks
+        open_rows = []
+        for ev in events:
+            event = ev.event
+            parent = open_rows[-1] if open_rows else -1
+
+            if event[:4] == 'end_':
+                j = open_rows.pop()
+                self.len[j] = ev.pos + ev.len - self.pos[j]
+                last_child.pop(j, None)
+                continue
+
+            extra = {}
+            children = []
+            name_id = -1
+            argspec_id = -1
+            aux = 0
+            s = ev.parsing_state.s
+
+            if event == 'chars':
+                kind = KIND_CHARS
+            elif event == 'comment':
+                kind = KIND_COMMENT
+                aux = len(ev.comment)
+                self._check_comment(s, ev.pos, ev.pos + ev.len, ev.comment, ev.post_space,
+                                    extra)
+            elif event == 'macro':
+                kind = KIND_MACRO
+                name_id = self._intern_name(ev.name)
+                aux = len(ev.post_space)
+                q = ev.pos + 1 + len(ev.name)
+                if s[q:q+aux] != ev.post_space:
+                    extra['macro_post_space'] = ev.post_space
+                argspec_id = self._add_nodeargd(ev.nodeargd, extra, children)
+            elif event == 'specials':
+                kind = KIND_SPECIALS
+                name_id = self._intern_name(ev.name)
+                argspec_id = self._add_nodeargd(ev.nodeargd, extra, children)
+            elif event == 'begin_group':
+                kind = KIND_GROUP
+                name_id = self._intern_name(ev.delimiters)
+            elif event == 'begin_math':
+                kind = KIND_MATH
+                name_id = self._intern_name(ev.delimiters)
+                if ev.displaytype != _math_displaytype(ev.delimiters):
+                    extra['displaytype'] = ev.displaytype
+            elif event == 'begin_environment':
+                kind = KIND_ENVIRONMENT
+                name_id = self._intern_name(ev.name)
+                argspec_id = self._add_nodeargd(ev.nodeargd, extra, children)
+            else:
+                raise ValueError("Unknown event: {!r}".format(ev))
+
+            # (the length of an open construct is set by its 'end_*' event)
+            j = self._add_row(kind, ev.pos, ev.len, ev.parsing_state, parent, -1,
+                              name_id, argspec_id, aux, extra, last_child)
+            for (child, child_arg_index) in children:
+                self._append_tree(child, j, child_arg_index, last_child)
+            if event[:6] == 'begin_':
+                open_rows.append(j)
+
+    def _append_row(self, node, parent, arg_index, last_child):
+        # Returns (row index, [(child node, arg_index), ...])
+        kind = _node_kinds.get(node.__class__, KIND_OTHER)
+        if node.parsing_state is None or node.pos is None or node.len is None:
+            kind = KIND_OTHER
+
+        name_id = -1
+        argspec_id = -1
+        aux = 0
+        extra = {}
+        children = []
+
+        if kind != KIND_OTHER:
+            s = node.parsing_state.s
+            pos, end = node.pos, node.pos + node.len
+
+        if kind == KIND_CHARS:
+            # (no need to check nodes whose chars are lazily taken from `s`)
+            if node._chars is not None and node._chars != s[pos:end]:
+                extra['chars'] = node._chars
+        elif kind == KIND_COMMENT:
+            aux = len(node.comment)
+            self._check_comment(s, pos, end, node.comment, node.comment_post_space, extra)
+        elif kind == KIND_GROUP:
+            name_id = self._intern_name(node.delimiters)
+            children = [ (n, -1) for n in node.nodelist ]
+        elif kind == KIND_MATH:
+            name_id = self._intern_name(node.delimiters)
+            if node.displaytype != _math_displaytype(node.delimiters):
+                extra['displaytype'] = node.displaytype
+            children = [ (n, -1) for n in node.nodelist ]
+        elif kind == KIND_MACRO:
+            name_id = self._intern_name(node.macroname)
+            aux = len(node.macro_post_space)
+            q = pos + 1 + len(node.macroname)
+            if s[q:q+aux] != node.macro_post_space:
+                extra['macro_post_space'] = node.macro_post_space
+            argspec_id = self._add_nodeargd(node.nodeargd, extra, children)
+        elif kind == KIND_ENVIRONMENT:
+            name_id = self._intern_name(node.environmentname)
+            argspec_id = self._add_nodeargd(node.nodeargd, extra, children)
+            children += [ (n, -1) for n in node.nodelist ]
+        elif kind == KIND_SPECIALS:
+            name_id = self._intern_name(node.specials_chars)
+            argspec_id = self._add_nodeargd(node.nodeargd, extra, children)
+        else:
+            extra['node'] = node
+
+        if kind == KIND_OTHER:
+            j = self._add_row(kind, -1, -1, None, parent, arg_index,
+                              name_id, argspec_id, aux, extra, last_child)
+        else:
+            j = self._add_row(kind, node.pos, node.len, node.parsing_state, parent,
+                              arg_index, name_id, argspec_id, aux, extra, last_child)
+
+        return (j, children)
+
+    def _add_row(self, kind, pos, len_, parsing_state, parent, arg_index,
+                 name_id, argspec_id, aux, extra, last_child):
+        # Append a row and link it to its parent (or to the top-level nodes).
+        # Returns the row index.
+        j = len(self.kind)
+
+        self.kind.append(kind)
+        self.pos.append(pos)
+        self.len.append(len_)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.arg_index.append(arg_index)
+        self.name_id.append(name_id)
+        self.argspec_id.append(argspec_id)
+        self.state_id.append(
+            self._intern_parsing_state(parsing_state) if parsing_state is not None else -1
+        )
+        self.aux.append(aux)
+        if extra:
+            self._extra[j] = extra
+
+        if parent == -1:
+            if self._last_root == -1:
+                self._first_root = j
+            else:
+                self.next_sibling[self._last_root] = j
+            self._last_root = j
+        else:
+            prev = last_child.get(parent)
+            if prev is None:
+                self.first_child[parent] = j
+            else:
+                self.next_sibling[prev] = j
+            last_child[parent] = j
+
+        return j
+
+    def _check_comment(self, s, pos, end, comment, comment_post_space, extra):
+        # store the comment's text if it can't be recovered from the string
+        aux = len(comment)
+        if s[pos+1:pos+1+aux] != comment or s[pos+1+aux:end] != comment_post_space:
+            extra['comment'] = comment
+            extra['comment_post_space'] = comment_post_space
+
+    def _add_nodeargd(self, nodeargd, extra, children):
+        # Returns the argspec_id, and appends the argument nodes to `children`.
+        # Arguments which aren't the standard ParsedMacroArgs are stored as is.
+        if nodeargd is None:
+            return -1
+        argnlist = nodeargd.argnlist
+        if type(nodeargd) is macrospec.ParsedMacroArgs \
+           and isinstance(nodeargd.argspec, _basestring) \
+           and isinstance(argnlist, list) and len(argnlist) == len(nodeargd.argspec) \
+           and all( (n is None or isinstance(n, LatexNode)) for n in argnlist ):
+            children.extend([ (n, k) for (k, n) in enumerate(argnlist) if n is not None ])
+            return self._intern_name(nodeargd.argspec)
+        extra['nodeargd'] = nodeargd
+        return -1
+
+    #
+    # recovering node attributes
+    #
+
+    def _get_field(self, index, fld):
+        extra = self._extra.get(index)
+        if extra is not None and fld in extra:
+            return extra[fld]
+        return _field_getters[fld](self, index)
+
+    def _get_s(self, index):
+        return self.parsing_states[self.state_id[index]].s
+
+    def _get_child_views(self, index, args):
+        # views of the child nodes which are macro arguments (args=True) or
+        # which are part of the nodelist (args=False)
+        arg_index = self.arg_index
+        return [ self.get_node(j) for j in self.iter_children(index)
+                 if (arg_index[j] != -1) == args ]
+
+
+
+def _math_displaytype(delimiters):
+    return 'inline' if delimiters[0] in ('$', r'\(') else 'display'
+
+
+def _get_chars(table, index):
+    pos = table.pos[index]
+    return table._get_s(index)[pos:pos+table.len[index]]
+
+def _get_comment(table, index):
+    pos = table.pos[index]
+    return table._get_s(index)[pos+1:pos+1+table.aux[index]]
+
+def _get_comment_post_space(table, index):
+    pos = table.pos[index]
+    return table._get_s(index)[pos+1+table.aux[index]:pos+table.len[index]]
+
+def _get_name(table, index):
+    return table.names[table.name_id[index]]
+
+def _get_macro_post_space(table, index):
+    q = table.pos[index] + 1 + len(table.names[table.name_id[index]])
+    return table._get_s(index)[q:q+table.aux[index]]
+
+def _get_nodelist(table, index):
+    return table._get_child_views(index, False)
+
+def _get_nodeargd(table, index):
+    argspec_id = table.argspec_id[index]
+    if argspec_id == -1:
+        return None
+    argspec = table.names[argspec_id]
+    argnlist = [ None ] * len(argspec)
+    for j in table.iter_children(index):
+        if table.arg_index[j] != -1:
+            argnlist[table.arg_index[j]] = table.get_node(j)
+    return macrospec.ParsedMacroArgs(argnlist=argnlist, argspec=argspec)
+
+def _get_legacy_args(table, index):
+    nodeargd = table._get_field(index, 'nodeargd')
+    if nodeargd is not None and nodeargd.legacy_nodeoptarg_nodeargs:
+        return nodeargd.legacy_nodeoptarg_nodeargs
+    return (None, [])
+
+def _get_displaytype(table, index):
+    return _math_displaytype(table.names[table.name_id[index]])
+
+
+_field_getters = {
+    'chars': _get_chars,
+    'comment': _get_comment,
+    'comment_post_space': _get_comment_post_space,
+    'delimiters': _get_name,
+    'macroname': _get_name,
+    'environmentname': _get_name,
+    'specials_chars': _get_name,
+    'macro_post_space': _get_macro_post_space,
+    'nodelist': _get_nodelist,
+    'nodeargd': _get_nodeargd,
+    'nodeoptarg': lambda table, index: _get_legacy_args(table, index)[0],
+    'nodeargs': lambda table, index: _get_legacy_args(table, index)[1],
+    'optargs': lambda table, index: [ _get_legacy_args(table, index)[0] ],
+    'args': lambda table, index: _get_legacy_args(table, index)[1],
+    'displaytype': _get_displaytype,
+}
+
+
+
+#
+# Node views
+#
+
+
+def _field_property(fld):
+    return property(lambda self: self._table._get_field(self._index, fld))
+
+
+class _LatexNodeTableView(object):
+    # Base class for read-only views of the nodes stored in a LatexNodeTable.
+    # The concrete view classes also derive from the corresponding node class.
+    __slots__ = ()
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    parsing_state = property(
+        lambda self: self._table.parsing_states[self._table.state_id[self._index]]
+    )
+    pos = property(lambda self: self._table.pos[self._index])
+    len = property(lambda self: self._table.len[self._index])
+
+    def __reduce__(self):
+        return (self.__class__, (self._table, self._index))
+
+
+class _LatexCharsNodeView(_LatexNodeTableView, LatexCharsNode):
+    __slots__ = ('_table', '_index',)
+    chars = _field_property('chars')
+
+class _LatexGroupNodeView(_LatexNodeTableView, LatexGroupNode):
+    __slots__ = ('_table', '_index',)
+    nodelist = _field_property('nodelist')
+    delimiters = _field_property('delimiters')
+
+class _LatexCommentNodeView(_LatexNodeTableView, LatexCommentNode):
+    __slots__ = ('_table', '_index',)
+    comment = _field_property('comment')
+    comment_post_space = _field_property('comment_post_space')
+
+class _LatexMacroNodeView(_LatexNodeTableView, LatexMacroNode):
+    __slots__ = ('_table', '_index',)
+    macroname = _field_property('macroname')
+    nodeargd = _field_property('nodeargd')
+    macro_post_space = _field_property('macro_post_space')
+    nodeoptarg = _field_property('nodeoptarg')
+    nodeargs = _field_property('nodeargs')
+
+class _LatexEnvironmentNodeView(_LatexNodeTableView, LatexEnvironmentNode):
+    __slots__ = ('_table', '_index',)
+    environmentname = _field_property('environmentname')
+    nodelist = _field_property('nodelist')
+    nodeargd = _field_property('nodeargd')
+    envname = _field_property('environmentname')
+    optargs = _field_property('optargs')
+    args = _field_property('args')
+
+class _LatexSpecialsNodeView(_LatexNodeTableView, LatexSpecialsNode):
+    __slots__ = ('_table', '_index',)
+    specials_chars = _field_property('specials_chars')
+    nodeargd = _field_property('nodeargd')
+
+class _LatexMathNodeView(_LatexNodeTableView, LatexMathNode):
+    __slots__ = ('_table', '_index',)
+    displaytype = _field_property('displaytype')
+    nodelist = _field_property('nodelist')
+    delimiters = _field_property('delimiters')
+
+
+_view_classes = {
+    KIND_CHARS: _LatexCharsNodeView,
+    KIND_GROUP: _LatexGroupNodeView,
+    KIND_COMMENT: _LatexCommentNodeView,
+    KIND_MACRO: _LatexMacroNodeView,
+    KIND_ENVIRONMENT: _LatexEnvironmentNodeView,
+    KIND_SPECIALS: _LatexSpecialsNodeView,
+    KIND_MATH: _LatexMathNodeView,
+}
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+# Internal module. Internal API may move, disappear or otherwise change at any
+# time and without notice.
+
+r"""
+Parallel parsing of a single large document, see
+:py:meth:`LatexWalker.get_latex_nodes_parallel()`.
+
+A quick scan of the string looks for places where the document can probably
+be cut: blank lines (paragraph breaks) or sectioning commands, outside of any
+braces, environments, math mode blocks, verbatim constructs and comments.
+The pieces between the cuts are parsed in worker processes, each one as if it
+started at the top level of the document.  Like for
+:py:class:`LatexStreamWalker`, a worker only keeps the top-level nodes whose
+parsing did not depend on where the piece ends.
+
+The scan is only a heuristic; the results are checked when they are stitched
+together.  The nodes of the first piece are correct.  For the following
+pieces, we parse the document serially starting after the last correct node,
+until we reach a node boundary, with the same parsing state, at which the
+worker's parse of the piece also had a node boundary (possibly the start of
+the piece).  How the rest of the document is parsed only depends on this
+position and parsing state (see the `_incremental` module), so the worker's
+nodes after that boundary can be used.  If the scan found good cut points,
+only the few nodes around each cut are parsed serially.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import re
+import io
+import functools
+
+from .. import _util
+from ..macrospec import _argparsers as macrospec_argparsers
+from ._types import *
+from ._walker import ParsingCursor
+from ._stream import _StreamBuffer, _StreamBufferWalker
+from ._helpers import _relocate_nodes
+from ._cache import _NodesPickler, _NodesUnpickler
+
+
+
+# Parse errors which occur within this number of characters from the end of a
+# piece make the rest of the piece unusable, since they could be caused by the
+# cut.
+_ERROR_MARGIN = 256
+
+_sectioning_macros = frozenset([
+    'part', 'chapter', 'section', 'subsection', 'subsubsection', 'paragraph',
+])
+
+_rx_scan = re.compile(
+    r'\\(?:(begin|end)[ \t]*\{([^{}\\]*)\}|([a-zA-Z@]+)|.)'
+    r'|(%)|(\$\$?)|([{}])|(\n[ \t]*\n)',
+    flags=re.DOTALL
+)
+
+
+def _get_verbatim_names(latex_context):
+    # names of the environments and macros whose contents we should skip when
+    # scanning for cut points
+    environments = set()
+    macros = set()
+    for spec in latex_context.iter_environment_specs():
+        if isinstance(getattr(spec, 'args_parser', None),
+                      macrospec_argparsers.VerbatimArgsParser):
+            environments.add(spec.environmentname)
+    for spec in latex_context.iter_macro_specs():
+        if isinstance(getattr(spec, 'args_parser', None),
+                      macrospec_argparsers.VerbatimArgsParser):
+            macros.add(spec.macroname)
+    return (environments, macros)
+
+
+def _find_cut_points(s, chunk_size, latex_context):
+    r"""
+    Return a list of positions where the string `s` can probably be cut into
+    pieces of at least `chunk_size` characters.
+    """
+    if hasattr(latex_context, '_get_cached'):
+        verbatim_environments, verbatim_macros = latex_context._get_cached(
+            'parallel_verbatim_names',
+            lambda: _get_verbatim_names(latex_context)
+        )
+    else:
+        verbatim_environments, verbatim_macros = _get_verbatim_names(latex_context)
+
+    cuts = []
+    last_cut = 0
+    depth = 0 # brace depth
+    env_depth = 0
+    math = None # closing math mode delimiter we're waiting for
+
+    pos = 0
+    n = len(s)
+    while pos < n:
+        m = _rx_scan.search(s, pos)
+        if m is None:
+            break
+        pos = m.end()
+        (beginend, envname, macroname, percent, dollars, brace, blankline) = m.groups()
+
+        if blankline is not None:
+            if depth == 0 and env_depth == 0 and math is None \
+               and m.end() - last_cut >= chunk_size:
+                cuts.append(m.end())
+                last_cut = m.end()
+            # keep the second newline for the next blank line
+            pos = m.end() - 1
+        elif percent is not None:
+            # skip the comment, but not the newline
+            pos = s.find('\n', pos)
+            if pos == -1:
+                break
+        elif brace is not None:
+            if brace == '{':
+                depth += 1
+            elif depth > 0:
+                depth -= 1
+        elif dollars is not None:
+            if math is None:
+                math = dollars
+            elif math == dollars:
+                math = None
+        elif beginend is not None:
+            if beginend == 'begin':
+                if envname in verbatim_environments:
+                    p = s.find('\\end{' + envname + '}', pos)
+                    if p == -1:
+                        break
+                    pos = p + len(envname) + 5
+                else:
+                    env_depth += 1
+            elif env_depth > 0:
+                env_depth -= 1
+        elif macroname is not None:
+            if macroname in verbatim_macros:
+                # skip e.g. \verb+...+ up to the closing delimiter
+                if s.startswith('*', pos):
+                    pos += 1
+                if pos < n:
+                    p = s.find(s[pos], pos+1)
+                    if p == -1:
+                        break
+                    pos = p + 1
+            elif macroname in _sectioning_macros:
+                if depth == 0 and env_depth == 0 and math is None \
+                   and m.start() - last_cut >= chunk_size:
+                    cuts.append(m.start())
+                    last_cut = m.start()
+        else:
+            c = m.group()[1:]
+            if c in ('(', '['):
+                math = '\\' + (')' if c == '(' else ']')
+            elif math is not None and '\\' + c == math:
+                math = None
+
+    if cuts and n - cuts[-1] < chunk_size // 2:
+        # don't leave a tiny last piece
+        cuts.pop()
+    return cuts
+
+
+
+# The LatexWalker flags which are given to the walkers in the worker
+# processes.  LatexWalker.get_latex_nodes_parallel() parses serially if any
+# other option is set.
+_forwarded_flags = ('tolerant_parsing', 'strict_braces', 'tokenize_chars_runs',
+                    'iterative_parsing')
+
+
+def _make_parse_piece_function(latex_context, walker_kwargs):
+    return functools.partial(_parse_piece, latex_context, walker_kwargs)
+
+
+def _parse_piece(latex_context, walker_kwargs, piece):
+    # Runs in a worker process.  Returns the pickled tuple `(items, error)`,
+    # where `items` is a list of `(node, end_pos, state_fields)` for the nodes
+    # that were parsed safely and `error` is a parse error which was raised
+    # safely (or `None`).  Positions are absolute.
+    (text, base, base_lineno, base_colno, at_eof) = piece
+
+    w = _StreamBufferWalker(
+        _StreamBuffer(text),
+        base=base, base_lineno=base_lineno, base_colno=base_colno,
+        at_eof=at_eof, margin=_ERROR_MARGIN,
+        latex_context=latex_context, **walker_kwargs
+    )
+    parsing_state = w._make_parsing_state()
+
+    items = []
+    error = None
+    try:
+        for (node, cursor) in w.iter_latex_nodes(parsing_state=parsing_state,
+                                                 with_cursors=True):
+            if not w.is_safe():
+                break
+            fields = cursor.parsing_state.get_fields()
+            del fields['s']
+            items.append( (node, base + cursor.pos, fields) )
+    except LatexWalkerParseError as e:
+        if w.is_safe(e):
+            w.relocate_error(e, w.s)
+            error = e
+
+    _relocate_nodes([ node for (node, end_pos, fields) in items ], base,
+                    lambda ps: ps)
+
+    f = io.BytesIO()
+    _NodesPickler(f, {
+        's': w.s,
+        'latex_context': parsing_state.latex_context,
+        'parsing_state': parsing_state,
+    }).dump( (items, error) )
+    return f.getvalue()
+
+
+def _same_state_fields(fields, other_fields):
+    if fields.keys() != other_fields.keys():
+        return False
+    for k, v in fields.items():
+        if k == 'latex_context':
+            if v is not other_fields[k]:
+                return False
+        elif v != other_fields[k]:
+            return False
+    return True
+
+
+def _parse_parallel(latex_walker, jobs, chunk_size):
+
+    s = latex_walker.s
+    parsing_state = latex_walker._make_parsing_state()
+    latex_context = parsing_state.latex_context
+
+    cuts = _find_cut_points(s, chunk_size, latex_context)
+    if not cuts:
+        return latex_walker.get_latex_nodes()
+
+    bounds = [0] + cuts + [len(s)]
+    pieces = []
+    lineno, colno = 1, 0
+    for j in range(len(bounds) - 1):
+        a, b = bounds[j], bounds[j+1]
+        pieces.append( (s[a:b], a, lineno, colno, b == len(s)) )
+        nl = s.count('\n', a, b)
+        if nl:
+            lineno += nl
+            colno = b - (s.rfind('\n', a, b) + 1)
+        else:
+            colno += b - a
+
+    walker_kwargs = dict( (k, getattr(latex_walker, k)) for k in _forwarded_flags )
+
+    default_fields = parsing_state.get_fields()
+    del default_fields['s']
+
+    nodelist = []
+    # position and parsing state after the last node that we know is correct
+    pos = 0
+    fields = default_fields
+    # when parsing serially: the generator of (node, cursor) pairs
+    serial = None
+
+    for (j, data) in enumerate(_util.batch_map(
+            _make_parse_piece_function, (latex_context, walker_kwargs),
+            pieces, jobs=jobs, chunksize=1
+    )):
+        (items, error) = _NodesUnpickler(io.BytesIO(data), {
+            's': s,
+            'latex_context': latex_context,
+            'parsing_state': parsing_state,
+        }).load()
+
+        # the node boundaries of the piece, where we can pick up the worker's
+        # results, mapped to (index of the next item, parsing state fields)
+        boundaries = { bounds[j]: (0, default_fields) }
+        for (k, (node, end_pos, end_fields)) in enumerate(items):
+            boundaries[end_pos] = (k + 1, end_fields)
+
+        b = boundaries.get(pos)
+        if serial is not None or b is None or not _same_state_fields(b[1], fields):
+            # parse serially until we reach one of the piece's node boundaries
+            if serial is None:
+                serial = latex_walker.iter_latex_nodes(
+                    cursor=ParsingCursor(pos, latex_walker._make_parsing_state(**fields)),
+                    with_cursors=True
+                )
+            last_boundary = max(boundaries)
+            synced = False
+            for (node, cursor) in serial:
+                nodelist.append(node)
+                pos = cursor.pos
+                fields = cursor.parsing_state.get_fields()
+                del fields['s']
+                b = boundaries.get(pos)
+                if b is not None and _same_state_fields(b[1], fields):
+                    synced = True
+                    break
+                if pos >= last_boundary:
+                    break
+            else:
+                # reached the end of the document
+                return (nodelist, 0, len(s))
+            if not synced:
+                # no luck with this piece, continue parsing serially
+                continue
+            serial = None
+
+        for (node, end_pos, end_fields) in items[b[0]:]:
+            nodelist.append(node)
+            pos, fields = end_pos, end_fields
+        if error is not None:
+            raise error
+
+    if serial is not None or pos < len(s):
+        if serial is None:
+            serial = latex_walker.iter_latex_nodes(
+                cursor=ParsingCursor(pos, latex_walker._make_parsing_state(**fields)),
+                with_cursors=True
+            )
+        for (node, cursor) in serial:
+            nodelist.append(node)
+
+    # At the top level, get_latex_nodes() only stops at the end of the string,
+    # including any trailing ignored content (e.g. a stray closing brace in
+    # tolerant parsing mode) which isn't part of any node
+    return (nodelist, 0, len(s))
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 Philippe Faist
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+
+# Internal module. Internal API may move, disappear or otherwise change at any
+# time and without notice.
+
+from __future__ import print_function, unicode_literals
+
+
+# for Py3
+_unicode = str
+
+## Begin Py2 support code
+import sys
+if sys.version_info.major == 2:
+    # Py2
+    _unicode = unicode
+## End Py2 support code
+
+
+from ._types import *
+from ._walker import LatexWalker
+from ._helpers import _relocate_nodes
+
+
+
+class LatexStreamWalker(object):
+    r"""
+    Parse LaTeX code that is read from a file object, in constant memory.
+
+    The stream is read in chunks of `chunk_size` characters.  Only the part of
+    the stream that was not yet parsed into complete top-level nodes is kept
+    in memory: in the worst case, this is the top-level construct (e.g., an
+    environment) that is currently being parsed, plus a chunk.  Large
+    concatenated corpora can thus be processed without ever holding them
+    entirely in memory.
+
+    Arguments:
+
+      - `stream`: a file object opened in text mode (e.g. `sys.stdin`), from
+        which we read by calling ``stream.read(size)``.
+
+      - `latex_context`, and any additional keyword arguments: passed on to
+        the :py:class:`LatexWalker` instances which parse the stream contents.
+
+      - `chunk_size`: the number of characters to read from the stream at a
+        time.
+
+    The nodes produced by :py:meth:`iter_latex_nodes()` are the same as those
+    which :py:meth:`LatexWalker.get_latex_nodes()` would produce for the entire
+    stream contents.  Their positions (`pos` attributes) are absolute
+    positions in the stream, and error messages report absolute line and
+    column numbers.  The `parsing_state.s` attribute of the nodes is not the
+    entire stream contents, but an object which holds the piece of the stream
+    the node was parsed from and which can be sliced using absolute positions.
+    Therefore, ``node.latex_verbatim()`` works as usual.
+
+    A top-level node is reported once it is complete, i.e., once its parsing
+    did not need to look at the end of the data read so far.  If a parse error
+    occurs close to the end of the data read so far, we assume that it might
+    be due to the stream having been cut at that point, and we read more data
+    before deciding.
+
+    If a `diagnostics` list is given (see :py:class:`LatexWalker`), the records
+    of ignored parse errors are appended to it once the node in which they
+    occurred is reported, with absolute positions.
+
+    .. versionadded:: 2.11
+
+       This class was introduced in `pylatexenc 2.11`.
+    """
+    def __init__(self, stream, latex_context=None, chunk_size=65536, **kwargs):
+        super(LatexStreamWalker, self).__init__()
+        self.stream = stream
+        self.latex_context = latex_context
+        self.chunk_size = chunk_size
+        self.diagnostics = kwargs.pop('diagnostics', None)
+        self.walker_kwargs = kwargs
+
+    def iter_latex_nodes(self):
+        r"""
+        Read and parse the stream contents, yielding each top-level node as soon
+        as it is complete.
+
+        In case of a parse error in non-tolerant parsing mode, the
+        :py:exc:`LatexWalkerParseError` is raised by the generator.
+        """
+        chunk_size = self.chunk_size
+
+        buf = ''
+        base = 0 # absolute position of buf[0] in the stream
+        base_lineno, base_colno = 1, 0 # line/column number of buf[0]
+        eof = False
+        read_size = chunk_size
+        state_fields = {}
+
+        while True:
+
+            if self.diagnostics is not None:
+                buffer_diagnostics = []
+                walker_kwargs = dict(self.walker_kwargs, diagnostics=buffer_diagnostics)
+            else:
+                buffer_diagnostics = None
+                walker_kwargs = self.walker_kwargs
+
+            if not eof:
+                data = self._read_at_least(read_size)
+                if len(data) < read_size:
+                    eof = True
+                buf += data
+
+            w = _StreamBufferWalker(
+                _StreamBuffer(buf),
+                base=base, base_lineno=base_lineno, base_colno=base_colno,
+                at_eof=eof, margin=chunk_size,
+                latex_context=self.latex_context, **walker_kwargs
+            )
+            text = _StreamText(buf, base)
+            new_parsing_states = {}
+
+            def get_parsing_state(ps):
+                newps = new_parsing_states.get(id(ps))
+                if newps is None:
+                    newps = ps._sub_context(s=text)
+                    new_parsing_states[id(ps)] = (newps, ps)
+                    return newps
+                return newps[0]
+
+            consumed = 0
+            done = eof
+            try:
+                for (node, cursor) in w.iter_latex_nodes(
+                        parsing_state=w._make_parsing_state(**state_fields),
+                        with_cursors=True
+                ):
+                    if not w.is_safe():
+                        done = False
+                        break
+                    _relocate_nodes([node], base, get_parsing_state)
+                    if buffer_diagnostics:
+                        self._flush_diagnostics(buffer_diagnostics, base)
+                    yield node
+                    consumed = cursor.pos
+                    state_fields = cursor.parsing_state.get_fields()
+                    del state_fields['s']
+            except LatexWalkerParseError as e:
+                if not w.is_safe(e):
+                    done = False
+                else:
+                    w.relocate_error(e, text)
+                    raise
+
+            if done:
+                if buffer_diagnostics:
+                    self._flush_diagnostics(buffer_diagnostics, base)
+                return
+
+            if consumed:
+                consumed_text = buf[:consumed]
+                nl = consumed_text.count('\n')
+                if nl:
+                    base_lineno += nl
+                    base_colno = consumed - (consumed_text.rfind('\n') + 1)
+                else:
+                    base_colno += consumed
+                buf = buf[consumed:]
+                base += consumed
+                read_size = chunk_size
+            else:
+                # the top-level construct we're reading is larger than what we
+                # have read; read as much again (so that the total time spent
+                # re-parsing it remains proportional to its length)
+                read_size = max(chunk_size, len(buf))
+
+    def _flush_diagnostics(self, buffer_diagnostics, base):
+        for diagnostic in buffer_diagnostics:
+            if diagnostic.pos is not None:
+                diagnostic.pos += base
+            self.diagnostics.append(diagnostic)
+        del buffer_diagnostics[:]
+
+    def _read_at_least(self, size):
+        # stream.read(size) may return fewer characters, e.g. for pipes
+        data = self.stream.read(size)
+        if not data or len(data) >= size:
+            return data
+        pieces = [ data ]
+        n = len(data)
+        while n < size:
+            data = self.stream.read(size - n)
+            if not data:
+                break
+            pieces.append(data)
+            n += len(data)
+        return ''.join(pieces)
+
+
+
+class _StreamText(object):
+    r"""
+    Holds the piece `text` of the stream contents which starts at the absolute
+    position `offset`, and which can be sliced using absolute positions.  This
+    object is used as `parsing_state.s` for nodes produced by
+    `LatexStreamWalker`.
+    """
+    def __init__(self, text, offset):
+        super(_StreamText, self).__init__()
+        self.text = text
+        self.offset = offset
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop = key.start, key.stop
+            return self.text[
+                slice(None if start is None else max(start - self.offset, 0),
+                      None if stop is None else max(stop - self.offset, 0),
+                      key.step)
+            ]
+        return self.text[key - self.offset]
+
+    def __len__(self):
+        return self.offset + len(self.text)
+
+    def __repr__(self):
+        return '<{} offset={} len={}>'.format(self.__class__.__name__, self.offset,
+                                              len(self.text))
+
+
+class _StreamBuffer(_unicode):
+    r"""
+    The string parsed by a `_StreamBufferWalker`.  Remembers whether a
+    substring search reached the end of the buffer without success, as custom
+    argument parsers (e.g. for verbatim environments) do when the construct is
+    not terminated in the data read so far.
+    """
+    reached_end = False
+
+    def find(self, sub, *args):
+        r = _unicode.find(self, sub, *args)
+        if r == -1 and (len(args) < 2 or args[1] is None or args[1] >= len(self)):
+            self.reached_end = True
+        return r
+
+    def index(self, sub, *args):
+        if self.find(sub, *args) == -1:
+            raise ValueError("substring not found")
+        return _unicode.index(self, sub, *args)
+
+
+class _StreamBufferWalker(LatexWalker):
+    r"""
+    A `LatexWalker` on a piece of the stream, which keeps track of whether any
+    of the parsing so far depended on where the piece ends.
+    """
+    def __init__(self, s, base, base_lineno, base_colno, at_eof, margin, **kwargs):
+        super(_StreamBufferWalker, self).__init__(s, **kwargs)
+        self.stream_base = base
+        self.stream_base_lineno = base_lineno
+        self.stream_base_colno = base_colno
+        self.stream_at_eof = at_eof
+        self.stream_margin = margin
+        self.stream_reached_end = False
+        self.stream_in_get_token = False
+
+    def get_token(self, pos, *args, **kwargs):
+        self.stream_in_get_token = True
+        try:
+            tok = super(_StreamBufferWalker, self).get_token(pos, *args, **kwargs)
+        except (LatexWalkerEndOfStream, LatexWalkerParseError):
+            # a token which can't be read (e.g. "\begin{environm") might be
+            # cut by the end of the buffer
+            self.stream_reached_end = True
+            raise
+        finally:
+            self.stream_in_get_token = False
+        if tok.pos + tok.len >= len(self.s):
+            # e.g. the macro name or the run of characters might continue
+            self.stream_reached_end = True
+        return tok
+
+    def _report_ignore_parse_error(self, exc):
+        if self.stream_in_get_token or not self._is_safe_error(exc):
+            self.stream_reached_end = True
+        super(_StreamBufferWalker, self)._report_ignore_parse_error(exc)
+
+    def _is_safe_error(self, exc):
+        # an error close to the end of the data might be due to the stream
+        # having been cut there
+        return exc.pos is None or exc.pos < len(self.s) - self.stream_margin
+
+    def is_safe(self, exc=None):
+        r"""
+        Whether the nodes parsed so far (or the error `exc` that was raised)
+        would be the same if more data were available.
+        """
+        if self.stream_at_eof:
+            return True
+        if self.stream_reached_end or self.s.reached_end:
+            return False
+        if exc is not None and not self._is_safe_error(exc):
+            return False
+        return True
+
+    def relocate_error(self, exc, text):
+        r"""
+        Make the positions in the parse error `exc` absolute.
+        """
+        base = self.stream_base
+        exc.s = text
+        if exc.pos is not None:
+            exc.pos += base
+        exc.open_contexts = [
+            (what, (pos + base if pos is not None else None), lineno, colno)
+            for (what, pos, lineno, colno) in exc.open_contexts
+        ]
+
+    def pos_to_lineno_colno(self, pos, as_dict=False):
+        # report absolute line and column numbers
+        lineno, colno = super(_StreamBufferWalker, self).pos_to_lineno_colno(pos)
+        if lineno == 1:
+            colno += self.stream_base_colno
+        lineno += self.stream_base_lineno - 1
+        if as_dict:
+            return { 'lineno': lineno, 'colno': colno }
+        return (lineno, colno)
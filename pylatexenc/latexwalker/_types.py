@@ -82,17 +82,107 @@ class LatexWalkerParseError(LatexWalkerError):
 
        The column number where the error occurred in the line `lineno`, starting
        at 1.
+
+    .. py:attribute:: open_contexts
+
+       A list of `(what, pos, lineno, colno)` tuples describing the LaTeX
+       blocks which were open when the error occurred, innermost first.
+
+    Instead of `lineno` and `colno`, you may specify `get_lineno_colno`, a
+    callable which takes no arguments and returns the tuple `(lineno, colno)`.
+    It is only called when the line or column number is needed.
+
+    .. versionchanged:: 2.11
+
+       The `get_lineno_colno` argument was introduced in `pylatexenc 2.11`.
+       The parser no longer computes line and column numbers unless they are
+       accessed or the error message is displayed.
     """
-    def __init__(self, msg, s=None, pos=None, lineno=None, colno=None):
+    def __init__(self, msg, s=None, pos=None, lineno=None, colno=None,
+                 get_lineno_colno=None):
         self.input_source = None # attribute can be set to add to error msg display
         self.msg = msg
         self.s = s
         self.pos = pos
-        self.lineno = lineno
-        self.colno = colno
-        self.open_contexts = []
-
-        super(LatexWalkerParseError, self).__init__(self._dispstr())
+        self._lineno = lineno
+        self._colno = colno
+        self._get_lineno_colno = get_lineno_colno
+        self._open_contexts = []
+        # open contexts whose line and column numbers haven't been computed
+        # yet, see _push_open_context()
+        self._pending_open_contexts = []
+        # see the `args` property below
+        self._args = None
+
+        super(LatexWalkerParseError, self).__init__()
+
+    @property
+    def args(self):
+        # Same `args` as the ones in pylatexenc < 2.11, where the message
+        # with its position was passed to the base class constructor.  It is
+        # only formatted when it is accessed, because it needs the line and
+        # column numbers.
+        if self._args is None:
+            return (self.msg + " " + self._fmt_pos(self.pos, self.lineno, self.colno),)
+        return self._args
+
+    @args.setter
+    def args(self, args):
+        self._args = tuple(args)
+
+    def _resolve_lineno_colno(self):
+        get_lineno_colno = self._get_lineno_colno
+        if get_lineno_colno is not None:
+            self._get_lineno_colno = None
+            self._lineno, self._colno = get_lineno_colno()
+
+    @property
+    def lineno(self):
+        self._resolve_lineno_colno()
+        return self._lineno
+
+    @lineno.setter
+    def lineno(self, lineno):
+        self._resolve_lineno_colno()
+        self._lineno = lineno
+
+    @property
+    def colno(self):
+        self._resolve_lineno_colno()
+        return self._colno
+
+    @colno.setter
+    def colno(self, colno):
+        self._resolve_lineno_colno()
+        self._colno = colno
+
+    def _push_open_context(self, what, pos, pos_to_lineno_colno):
+        # (INTERNAL.) Append `(what, pos, lineno, colno)` to the open contexts,
+        # with `(lineno, colno) = pos_to_lineno_colno(pos)` computed only if
+        # the open contexts are inspected.
+        self._pending_open_contexts.append( (what, pos, pos_to_lineno_colno) )
+
+    @property
+    def open_contexts(self):
+        pending = self._pending_open_contexts
+        if pending:
+            self._pending_open_contexts = []
+            for (what, pos, pos_to_lineno_colno) in pending:
+                self._open_contexts.append(
+                    (what, pos) + tuple(pos_to_lineno_colno(pos))
+                )
+        return self._open_contexts
+
+    @open_contexts.setter
+    def open_contexts(self, open_contexts):
+        self._pending_open_contexts = []
+        self._open_contexts = open_contexts
+
+    def __reduce__(self):
+        # compute everything that refers to the parser before pickling
+        self._resolve_lineno_colno()
+        self.open_contexts
+        return (self.__class__, (self.msg,), self.__dict__)
 
     def _dispstr(self):
         msg = self.msg
@@ -118,7 +208,72 @@ class LatexWalkerParseError(LatexWalkerError):
     def __str__(self):
         return self._dispstr()
 
+    def __repr__(self):
+        args = self.args
+        if len(args) == 1:
+            return "{}({!r})".format(self.__class__.__name__, args[0])
+        return "{}{!r}".format(self.__class__.__name__, args)
+
+
+class LatexWalkerParseDiagnostic(object):
+    r"""
+    A record of a parse error which was ignored in tolerant parsing mode.
+
+    Instances of this class are appended to the `diagnostics` list given to
+    :py:class:`LatexWalker`, instead of the error being logged.  They hold the
+    following attributes:
+
+    .. py:attribute:: msg
+
+       The error message
+
+    .. py:attribute:: pos
+
+       The index in the string where the error occurred, starting at zero.
+
+    .. py:attribute:: lineno
+
+       The line number where the error occurred, starting at 1.
+
+    .. py:attribute:: colno
+
+       The column number where the error occurred in the line `lineno`,
+       starting at 1.
+
+    .. versionadded:: 2.11
+
+       This class was introduced in `pylatexenc 2.11`.
+    """
+    __slots__ = ('msg', 'pos', 'lineno', 'colno')
+
+    def __init__(self, msg, pos=None, lineno=None, colno=None):
+        super(LatexWalkerParseDiagnostic, self).__init__()
+        self.msg = msg
+        self.pos = pos
+        self.lineno = lineno
+        self.colno = colno
+
+    @classmethod
+    def from_parse_error(cls, exc):
+        r"""
+        Create a diagnostic record for the :py:exc:`LatexWalkerParseError`
+        `exc`.
+
+        The line and column numbers are determined here, so that the record
+        doesn't keep a reference to the parser or to the string being parsed.
+        """
+        return cls(msg=exc.msg, pos=exc.pos, lineno=exc.lineno, colno=exc.colno)
+
+    def __getstate__(self):
+        return (self.msg, self.pos, self.lineno, self.colno)
+
+    def __setstate__(self, state):
+        (self.msg, self.pos, self.lineno, self.colno) = state
 
+    def __repr__(self):
+        return "{}(msg={!r}, pos={!r}, lineno={!r}, colno={!r})".format(
+            self.__class__.__name__, self.msg, self.pos, self.lineno, self.colno
+        )
 
 
 class LatexWalkerEndOfStream(LatexWalkerError):
@@ -131,6 +286,19 @@ class LatexWalkerEndOfStream(LatexWalkerError):
 
 
 
+class _EndOfStreamToken(object):
+    # (INTERNAL.) Returned by the tokenizer at the end of the string, where
+    # LatexWalker.get_token() raises LatexWalkerEndOfStream.  Parse loops
+    # check for this object instead of handling an exception.
+    __slots__ = ('final_space',)
+
+    tok = None
+
+    def __init__(self, final_space=''):
+        self.final_space = final_space
+
+
+
 # ------------------------------------------------------------------------------
 
 
@@ -315,25 +483,58 @@ class LatexNode(object):
        
        The attributes `parsing_state`, `pos` and `len` were added in
        `pylatexenc 2.0`.
+
+    .. versionchanged:: 2.11
+
+       Node classes use `__slots__` for their fields and store their list of
+       fields in the class attributes `_fields` and `_redundant_fields`, to
+       reduce the memory footprint of large node trees.  You can still set
+       your own additional attributes on node instances (they are then stored
+       in an instance `__dict__`, which is only created when needed), and
+       nodes can be weakly referenced.
     """
-    def __init__(self, _fields, _redundant_fields=None,
+
+    __slots__ = ('parsing_state', 'pos', 'len', '__dict__', '__weakref__',)
+
+    # Important: subclasses must specify the tuple of fields they set in the
+    # class attribute `_fields` (including 'pos' and 'len').  These should only
+    # be the base (non-redundant) fields; the class attribute
+    # `_redundant_fields` should list all fields including any "redundant"
+    # ones.
+    _fields = ('pos', 'len',)
+    _redundant_fields = _fields
+
+    def __init__(self, _fields=None, _redundant_fields=None,
                  parsing_state=None, pos=None, len=None, **kwargs):
 
-        # Important: subclasses must specify a list of fields they set in the
-        # `_fields` argument.  They should only specify base (non-redundant)
-        # fields; if they have "redundant" fields, specify the additional fields
-        # in _redundant_fields=...
         super(LatexNode, self).__init__(**kwargs)
 
         self.parsing_state = parsing_state
         self.pos = pos
         self.len = len
 
-        self._fields = tuple(['pos', 'len'] + list(_fields))
-        if _redundant_fields is not None:
-            self._redundant_fields = tuple(list(self._fields) + list(_redundant_fields))
-        else:
-            self._redundant_fields = self._fields
+        if _fields is not None:
+            # Legacy subclasses which specify their fields in the constructor
+            # (such subclasses have an instance `__dict__`, unless they define
+            # `__slots__`)
+            self._fields = tuple(['pos', 'len'] + list(_fields))
+            if _redundant_fields is not None:
+                self._redundant_fields = tuple(list(self._fields) + list(_redundant_fields))
+            else:
+                self._redundant_fields = self._fields
+
+    def __getstate__(self):
+        # needed for pickling objects with __slots__ with older pickle protocols
+        state = dict(getattr(self, '__dict__', {}))
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in ('__dict__', '__weakref__') and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def nodeType(self):
         """
@@ -399,13 +600,32 @@ class LatexCharsNode(LatexNode):
     .. py:attribute:: chars
 
        The string of characters represented by this node.
+
+    .. versionchanged:: 2.11
+
+       If `chars` is `None` (as for nodes created by the parser), the
+       characters are the chunk of the parsed string that the node represents,
+       ``parsing_state.s[pos:pos+len]``.  The string is then only extracted
+       when the `chars` attribute is accessed.
     """
-    def __init__(self, chars, **kwargs):
-        super(LatexCharsNode, self).__init__(
-            _fields = ('chars',),
-            **kwargs
-        )
-        self.chars = chars
+    __slots__ = ('_chars',)
+
+    _fields = ('pos', 'len', 'chars',)
+    _redundant_fields = _fields
+
+    def __init__(self, chars=None, **kwargs):
+        super(LatexCharsNode, self).__init__(**kwargs)
+        self._chars = chars
+
+    @property
+    def chars(self):
+        if self._chars is None and self.parsing_state is not None:
+            return self.parsing_state.s[self.pos : self.pos+self.len]
+        return self._chars
+
+    @chars.setter
+    def chars(self, chars):
+        self._chars = chars
 
     def nodeType(self):
         return LatexCharsNode
@@ -434,12 +654,14 @@ class LatexGroupNode(LatexNode):
 
           The `delimiters` field was added in `pylatexenc 2.0`.
     """
+    __slots__ = ('nodelist', 'delimiters',)
+
+    _fields = ('pos', 'len', 'nodelist', 'delimiters',)
+    _redundant_fields = _fields
+
     def __init__(self, nodelist, **kwargs):
         delimiters = kwargs.pop('delimiters', ('{', '}'))
-        super(LatexGroupNode, self).__init__(
-            _fields=('nodelist','delimiters',),
-            **kwargs
-        )
+        super(LatexGroupNode, self).__init__(**kwargs)
         self.nodelist = nodelist
         self.delimiters = delimiters
 
@@ -461,13 +683,15 @@ class LatexCommentNode(LatexNode):
        (e.g., indentation spaces of the next line)
 
     """
+    __slots__ = ('comment', 'comment_post_space',)
+
+    _fields = ('pos', 'len', 'comment', 'comment_post_space',)
+    _redundant_fields = _fields
+
     def __init__(self, comment, **kwargs):
         comment_post_space = kwargs.pop('comment_post_space', '')
 
-        super(LatexCommentNode, self).__init__(
-            _fields = ('comment', 'comment_post_space', ),
-            **kwargs
-        )
+        super(LatexCommentNode, self).__init__(**kwargs)
 
         self.comment = comment
         self.comment_post_space = comment_post_space
@@ -531,6 +755,12 @@ class LatexMacroNode(LatexNode):
        A list of arguments to the macro. Each item in the list is a
        :py:class:`LatexNode`.
     """
+    __slots__ = ('macroname', 'nodeargd', 'macro_post_space',
+                 'nodeoptarg', 'nodeargs',)
+
+    _fields = ('pos', 'len', 'macroname', 'nodeargd', 'macro_post_space',)
+    _redundant_fields = _fields + ('nodeoptarg', 'nodeargs',)
+
     def __init__(self, macroname, **kwargs):
         nodeargd=kwargs.pop('nodeargd', macrospec_parsedargs.ParsedMacroArgs())
         macro_post_space=kwargs.pop('macro_post_space', '')
@@ -538,10 +768,7 @@ class LatexMacroNode(LatexNode):
         nodeoptarg=kwargs.pop('nodeoptarg', None)
         nodeargs=kwargs.pop('nodeargs', [])
 
-        super(LatexMacroNode, self).__init__(
-            _fields = ('macroname','nodeargd','macro_post_space'),
-            _redundant_fields = ('nodeoptarg','nodeargs'),
-            **kwargs)
+        super(LatexMacroNode, self).__init__(**kwargs)
 
         self.macroname = macroname
         self.nodeargd = nodeargd
@@ -609,16 +836,19 @@ class LatexEnvironmentNode(LatexNode):
           arguments for standard latex macros, for backwards compatibility.
     """
     
+    __slots__ = ('environmentname', 'nodelist', 'nodeargd',
+                 'envname', 'optargs', 'args',)
+
+    _fields = ('pos', 'len', 'environmentname', 'nodelist', 'nodeargd',)
+    _redundant_fields = _fields + ('envname', 'optargs', 'args',)
+
     def __init__(self, environmentname, nodelist, **kwargs):
         nodeargd = kwargs.pop('nodeargd', macrospec_parsedargs.ParsedMacroArgs())
         # legacy:
         optargs = kwargs.pop('optargs', [])
         args = kwargs.pop('args', [])
 
-        super(LatexEnvironmentNode, self).__init__(
-            _fields = ('environmentname','nodelist','nodeargd',),
-            _redundant_fields = ('envname', 'optargs','args',),
-            **kwargs)
+        super(LatexEnvironmentNode, self).__init__(**kwargs)
 
         self.environmentname = environmentname
         self.nodelist = nodelist
@@ -661,12 +891,15 @@ class LatexSpecialsNode(LatexNode):
 
        Latex specials were introduced in `pylatexenc 2.0`.
     """
+    __slots__ = ('specials_chars', 'nodeargd',)
+
+    _fields = ('pos', 'len', 'specials_chars', 'nodeargd',)
+    _redundant_fields = _fields
+
     def __init__(self, specials_chars, **kwargs):
         nodeargd=kwargs.pop('nodeargd', None)
 
-        super(LatexSpecialsNode, self).__init__(
-            _fields = ('specials_chars','nodeargd'),
-            **kwargs)
+        super(LatexSpecialsNode, self).__init__(**kwargs)
 
         self.specials_chars = specials_chars
         self.nodeargd = nodeargd
@@ -701,13 +934,15 @@ class LatexMathNode(LatexNode):
        The contents of the environment, given as a list of
        :py:class:`LatexNode`'s.
     """
+    __slots__ = ('displaytype', 'nodelist', 'delimiters',)
+
+    _fields = ('pos', 'len', 'displaytype', 'nodelist', 'delimiters',)
+    _redundant_fields = _fields
+
     def __init__(self, displaytype, nodelist=[], **kwargs):
         delimiters = kwargs.pop('delimiters', (None, None))
 
-        super(LatexMathNode, self).__init__(
-            _fields = ('displaytype','nodelist','delimiters'),
-            **kwargs
-        )
+        super(LatexMathNode, self).__init__(**kwargs)
 
         self.displaytype = displaytype
         self.nodelist = nodelist
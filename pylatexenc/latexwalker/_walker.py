@@ -30,11 +30,18 @@
 from __future__ import print_function, unicode_literals
 
 import re
+import functools
 
 from .. import _util
 from .. import macrospec
 from ._types import *
+from ._types import _EndOfStreamToken
 from ._get_defaultspecs import get_default_latex_context_db
+from ..macrospec._latexcontextdb import _get_shared_latex_context_db
+from . import _engine
+from . import _incremental
+from . import _events
+from ._nodetable import LatexNodeTable
 
 
 import logging
@@ -42,10 +49,43 @@ logger = logging.getLogger(__name__)
 
 
 
-def _maketuple(*args):
-    # for use with Python 2, where we don't have *args expansion in tuples and
-    # lists
-    return tuple(args)
+
+# precompiled regular expressions used by the tokenizer.  They are always used
+# with `rx.match(s, pos)` or `rx.search(s, pos)` to avoid copying any part of
+# the string.
+_rx_space = re.compile(r'\s*', flags=re.UNICODE)
+_rx_ascii_letters = re.compile(r'[a-zA-Z]+')
+_rx_environment_name = re.compile(r'\s*\{([\w* ._-]+)\}', flags=re.UNICODE)
+_rx_comment_end = re.compile(r'(\n|\r|\n\r)(?P<extraspace>\s*)', flags=re.UNICODE)
+
+# characters which can never be part of a run of ordinary characters, whatever
+# the latex context
+_chars_run_stop_chars = '\\%{}$'
+
+def _make_chars_run_rx(latex_context, brace_chars):
+    r"""
+    Compile the regular expression that matches a run of ordinary characters,
+    i.e., characters that would each be returned as a single 'char' token by
+    :py:meth:`LatexWalker.get_token()`.  The run may start with whitespace but
+    does not end with whitespace, so that any trailing whitespace is still
+    reported as the `pre_space` of the token that follows.
+
+    Returns `None` if the given latex context detects specials in a way we
+    don't know about (i.e., it overrides `test_for_specials()`).
+    """
+    if type(latex_context).test_for_specials != macrospec.LatexContextDb.test_for_specials:
+        return None
+
+    stop_chars = set(_chars_run_stop_chars)
+    for (openbracechar, closebracechar) in brace_chars:
+        stop_chars.add(openbracechar)
+        stop_chars.add(closebracechar)
+    for spec in latex_context.iter_specials_specs():
+        if spec.specials_chars:
+            stop_chars.add(spec.specials_chars[0])
+
+    c = ''.join([ re.escape(x) for x in sorted(stop_chars) ])
+    return re.compile(r'\s*[^{c}\s](?:[^{c}]*[^{c}\s])?'.format(c=c), flags=re.UNICODE)
 
 
 
@@ -54,6 +94,11 @@ def _maketuple(*args):
 
 
 
+# maximum number of different sub-contexts that are cached by
+# ParsingState._sub_context() for a given parsing state
+_MAX_CACHED_SUB_CONTEXTS = 64
+
+
 class ParsingState(object):
     r"""
     Stores some information about the current parsing state, such as whether we
@@ -116,6 +161,14 @@ class ParsingState(object):
 
        All arguments must now be specified as keyword arguments as of version
        2.7.
+
+    .. versionchanged:: 2.11
+
+       The parser reuses the same parsing state objects for the nodes which
+       are parsed in the same context, so the `parsing_state` of a node may
+       be shared with many other nodes.  Don't modify the attributes of a
+       node's parsing state; create a new one with :py:meth:`sub_context()`
+       instead.
     """
     def __init__(self, **kwargs):
         super(ParsingState, self).__init__()
@@ -124,6 +177,8 @@ class ParsingState(object):
         self.in_math_mode = False
         self.math_mode_delimiter = None
         self._fields = ('s', 'latex_context', 'in_math_mode', 'math_mode_delimiter', )
+        # cache for _sub_context()
+        self._sub_contexts = {}
 
         do_sanitize = kwargs.pop('_do_sanitize', True)
 
@@ -138,7 +193,7 @@ class ParsingState(object):
         This makes it easy to create a sub-context in a given parser.  For
         instance, if we enter math mode, we might write::
 
-           parsing_state_inner = parsing_state.sub_context(in_math_mode=True)
+           parsing_state_inner = parsing_state._sub_context(in_math_mode=True)
 
         If no arguments are provided, this returns a copy of the present parsing
         context object.
@@ -149,6 +204,32 @@ class ParsingState(object):
 
         return p
 
+    def _sub_context(self, **kwargs):
+        # (INTERNAL.)  Same as sub_context(), but the sub-contexts are cached:
+        # calling _sub_context() again on the same parsing state with the same
+        # arguments returns the same ParsingState instance (unless some
+        # argument values are not hashable).  This is used by the parser, which
+        # never modifies a parsing state.  A subclass' own sub_context() is
+        # always called.
+        if _engine._func(type(self).sub_context) is not _engine._func(ParsingState.sub_context):
+            return self.sub_context(**kwargs)
+
+        try:
+            key = tuple(sorted( (k, v.__class__, v) for (k, v) in kwargs.items() ))
+            p = self._sub_contexts.get(key)
+        except TypeError:
+            # some values are not hashable, don't use the cache
+            key, p = None, None
+        if p is not None:
+            return p
+
+        p = self.sub_context(**kwargs)
+
+        if key is not None and len(self._sub_contexts) < _MAX_CACHED_SUB_CONTEXTS:
+            self._sub_contexts[key] = p
+
+        return p
+
     def get_fields(self):
         r"""
         Returns the fields and values associated with this `ParsingState` as a
@@ -156,6 +237,15 @@ class ParsingState(object):
         """
         return dict([(f, getattr(self, f)) for f in self._fields])
 
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_sub_contexts', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._sub_contexts = {}
+
 
     def _set_fields(self, kwargs, do_sanitize=True):
 
@@ -189,9 +279,117 @@ class ParsingState(object):
 
 
 
+def _get_token_or_eos(latex_walker, pos, *args, **kwargs):
+    # call get_token() of a LatexWalker subclass which overrides it
+    try:
+        return latex_walker.get_token(pos, *args, **kwargs)
+    except LatexWalkerEndOfStream as e:
+        return _EndOfStreamToken(final_space=e.final_space)
+
+
+# number of positions for which LatexWalker.get_token() remembers the token that
+# was read
+_TOKEN_CACHE_SIZE = 64
+
+_token_cache_marker_key = ('latexwalker_token_cache_marker',)
+
+def _reuse_cached_token(cached, brace_chars, environments, chars_run, parsing_state,
+                        s):
+    # Return the cached token if get_token() would return the same token with
+    # the given arguments (for the same position and latex context), or `None`
+    # if we need to tokenize the string again.
+    (tok, cached_brace_chars, cached_environments, cached_chars_run,
+     cached_parsing_state) = cached[:5]
+
+    if cached_parsing_state is not parsing_state:
+        # tokens only depend on the parsing state's latex context and math
+        # mode, except that the latex context might inspect the parsing state
+        # when looking for specials
+        if cached_parsing_state.latex_context is not parsing_state.latex_context \
+           or cached_parsing_state.in_math_mode != parsing_state.in_math_mode \
+           or cached_parsing_state.math_mode_delimiter \
+              != parsing_state.math_mode_delimiter:
+            return None
+        if tok.tok in ('char', 'specials') \
+           and _engine._func(type(parsing_state.latex_context).test_for_specials) \
+               is not _engine._func(macrospec.LatexContextDb.test_for_specials):
+            return None
+
+    if cached_chars_run != chars_run and tok.tok == 'char':
+        # a run of chars vs. a single char
+        return None
+
+    if cached_environments != environments:
+        if tok.tok in ('begin_environment', 'end_environment') \
+           or (tok.tok == 'macro' and tok.arg in ('begin', 'end')):
+            return None
+
+    if cached_brace_chars != brace_chars:
+        if chars_run and tok.tok == 'char':
+            # the run might end at a different place
+            return None
+        # the brace chars only matter if the token starts with one of the
+        # chars which are braces for one call but not for the other
+        differing_chars = set()
+        for brace_pair in cached_brace_chars + brace_chars:
+            if (brace_pair in cached_brace_chars) != (brace_pair in brace_chars):
+                differing_chars.update(brace_pair)
+        if s[tok.pos:tok.pos+1] in differing_chars:
+            return None
+
+    return tok
+
+
+class ParsingCursor(object):
+    r"""
+    A position in the parsed string along with the parsing state that applies
+    at that position.  This is all that is needed to resume parsing at that
+    point.  Cursors are provided by :py:meth:`LatexWalker.iter_latex_nodes()`.
+
+    .. py:attribute:: pos
+
+       The position in the parsed string.
+
+    .. py:attribute:: parsing_state
+
+       The :py:class:`ParsingState` in which parsing continues at `pos`.
+
+    .. versionadded:: 2.11
+
+       This class was introduced in `pylatexenc 2.11`.
+    """
+    def __init__(self, pos, parsing_state):
+        super(ParsingCursor, self).__init__()
+        self.pos = pos
+        self.parsing_state = parsing_state
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ParsingCursor)
+            and self.pos == other.pos
+            and self.parsing_state is other.parsing_state
+        )
+
+    def __ne__(self, other): return not self.__eq__(other)
+
+    def __repr__(self):
+        return "{}(pos={!r}, parsing_state={!r})".format(
+            self.__class__.__name__, self.pos, self.parsing_state
+        )
+
+
 # ------------------------------------------------------------------------------
 
 
+# methods of LatexWalker whose work is done by the iterative parsing engine
+# instead of being called recursively
+_iterative_parsing_replaced_methods = (
+    'get_latex_expression',
+    'get_latex_maybe_optional_arg',
+    'get_latex_braced_group',
+    'get_latex_environment',
+)
+
 
 class LatexWalker(object):
     r"""
@@ -205,16 +403,36 @@ class LatexWalker(object):
         object that provides macro and environment specifications with
         instructions on how to parse arguments, etc.  If you don't specify this
         argument, or if you specify `None`, then the default database is used.
-        The default database is obtained with
-        :py:func:`get_default_latex_context_db()`.
+        The default database is the one returned by
+        :py:func:`get_default_latex_context_db()`; it is created only once and
+        the same frozen (read-only) instance is shared by all `LatexWalker`
+        instances.  If you need to modify the latex context, get your own copy
+        by calling :py:func:`get_default_latex_context_db()` and specify it
+        here explicitly, or use the `shared_default_context=False` flag.
 
         .. versionadded:: 2.0
 
            This `latex_context` argument was introduced in version 2.0.
 
+        .. versionchanged:: 2.11
+
+           The default latex context is now a shared, frozen instance.
+
     Additional keyword arguments are flags which influence the parsing.
     Accepted flags are:
 
+      - `shared_default_context=True|False` If set to `False`, and if no
+        `latex_context` is specified, then the walker uses its own modifiable
+        copy of the default latex context (as returned by
+        :py:func:`get_default_latex_context_db()`) instead of the shared frozen
+        instance, like in earlier versions of `pylatexenc`.  Its definitions
+        can then be changed, e.g., via
+        ``latex_walker.default_parsing_state.latex_context.add_context_category(...)``.
+
+        .. versionadded:: 2.11
+
+           The `shared_default_context` flag was introduced in `pylatexenc 2.11`.
+
       - `tolerant_parsing=True|False` If set to `True`, then the parser
         generally ignores syntax errors rather than raising an exception.
 
@@ -223,6 +441,64 @@ class LatexWalker(object):
         generally won't need to specify this flag, use `tolerant_parsing`
         instead.
 
+      - `tokenize_chars_runs=True|False` If set to `True` (the default), then
+        :py:meth:`get_latex_nodes()` reads entire runs of ordinary characters
+        at once using a precompiled regular expression (see the `chars_run`
+        argument of :py:meth:`get_token()`), instead of reading them one token
+        per character.  The resulting nodes are the same in both cases; this
+        flag is mostly useful to compare both code paths.
+
+        .. versionadded:: 2.11
+
+           The `tokenize_chars_runs` flag was introduced in `pylatexenc 2.11`.
+
+      - `iterative_parsing=True|False` If set to `True` (the default), then
+        :py:meth:`get_latex_nodes()` parses nested groups, environments, math
+        mode blocks and macro arguments using an explicit stack instead of
+        recursive function calls.  There is then no limit on how deeply the
+        LaTeX code can be nested.  The resulting nodes are the same in both
+        cases.  (If a subclass overrides any of the methods
+        :py:meth:`get_latex_expression()`,
+        :py:meth:`get_latex_maybe_optional_arg()`,
+        :py:meth:`get_latex_braced_group()` or
+        :py:meth:`get_latex_environment()`, then the recursive implementation
+        is used so that the overridden methods are called as before.)
+
+        .. versionadded:: 2.11
+
+           The `iterative_parsing` flag was introduced in `pylatexenc 2.11`.
+
+      - `diagnostics=None|list` If set to a list (or to any object with an
+        `append()` method), then the parse errors which are ignored in
+        tolerant parsing mode are appended to it as
+        :py:class:`LatexWalkerParseDiagnostic` records instead of being
+        logged.  Their line and column numbers are only computed if you
+        access them.
+
+        .. versionadded:: 2.11
+
+           The `diagnostics` flag was introduced in `pylatexenc 2.11`.
+
+      - `parse_cache=None|LatexParseCache` If set to a
+        :py:class:`LatexParseCache` instance, then the results of
+        :py:meth:`get_latex_nodes()` for the full string are stored in and
+        retrieved from this cache.
+
+        .. versionadded:: 2.11
+
+           The `parse_cache` flag was introduced in `pylatexenc 2.11`.
+
+      - `stats=None|PerformanceStats` If set to a
+        :py:class:`~pylatexenc.latexwalker.PerformanceStats` instance, then
+        the tokens read, the nodes created, the time spent parsing the
+        arguments of each macro, environment and specials, and the number of
+        parse errors recovered from in tolerant parsing mode are recorded in
+        this object.
+
+        .. versionadded:: 2.11
+
+           The `stats` flag was introduced in `pylatexenc 2.11`.
+
     The methods provided in this class perform various parsing of the given
     string `s`.  These methods typically accept a `pos` parameter, which must be
     an integer, which defines the position in the string `s` to start parsing.
@@ -283,6 +559,11 @@ class LatexWalker(object):
         # will be determined lazily automatically by pos_to_lineno_colno(...)
         self._line_no_calc = None
 
+        # tokens recently read by get_token(), by position
+        self._token_cache = {}
+
+        shared_default_context = kwargs.pop('shared_default_context', True)
+
         self.debug_nodes = False
 
         if latex_context is None:
@@ -296,7 +577,7 @@ class LatexWalker(object):
 
                 macro_dict = kwargs.pop('macro_dict', None)
 
-                default_latex_context = get_default_latex_context_db()
+                default_latex_context = _get_shared_latex_context_db(get_default_latex_context_db)
 
                 latex_context = default_latex_context.filter_context(
                     keep_which=['environments'], # no specials
@@ -307,10 +588,13 @@ class LatexWalker(object):
                     default_latex_context.iter_environment_specs()
                 )
 
-            else:
-                # default -- use default
+            elif not shared_default_context:
                 latex_context = get_default_latex_context_db()
 
+            else:
+                # default -- use the shared default latex context
+                latex_context = _get_shared_latex_context_db(get_default_latex_context_db)
+
         else:
             # make sure the user didn't also provide a macro_dict= argument
             if 'macro_dict' in kwargs:
@@ -333,6 +617,17 @@ class LatexWalker(object):
         #
         self.tolerant_parsing = kwargs.pop('tolerant_parsing', True)
         self.strict_braces = kwargs.pop('strict_braces', False)
+        self.tokenize_chars_runs = kwargs.pop('tokenize_chars_runs', True)
+        self.iterative_parsing = kwargs.pop('iterative_parsing', True)
+        self.diagnostics = kwargs.pop('diagnostics', None)
+        self.parse_cache = kwargs.pop('parse_cache', None)
+        self.stats = kwargs.pop('stats', None)
+
+        if self.stats is not None:
+            # count tokens and nodes by wrapping the methods for this instance
+            # only, so that there is no overhead at all without stats
+            self._get_token = self.stats._wrap_get_token(self._get_token)
+            self.make_node = self.stats._wrap_make_node(self.make_node)
 
         if 'keep_inline_math' in kwargs:
             _util.pylatexenc_deprecated_2(
@@ -366,6 +661,16 @@ class LatexWalker(object):
         """
         return self.default_parsing_state.sub_context(**kwargs)
 
+    def _make_parsing_state(self, **kwargs):
+        # (INTERNAL.)  Same as make_parsing_state(), but returns the shared
+        # parsing states cached by ParsingState._sub_context().  This is used
+        # by the parser, which never modifies a parsing state.  A subclass' own
+        # make_parsing_state() is always called.
+        if _engine._func(type(self).make_parsing_state) \
+           is not _engine._func(LatexWalker.make_parsing_state):
+            return self.make_parsing_state(**kwargs)
+        return self.default_parsing_state._sub_context(**kwargs)
+
     def parse_flags(self):
         """
         The parse flags currently set on this object.  Returns a dictionary with
@@ -384,10 +689,16 @@ class LatexWalker(object):
         }
 
     def _report_ignore_parse_error(self, exc):
+        if self.stats is not None:
+            self.stats.recovered_errors += 1
+        if self.diagnostics is not None:
+            self.diagnostics.append(LatexWalkerParseDiagnostic.from_parse_error(exc))
+            return
         logger.info("Ignoring parse error (tolerant parsing mode): %s", exc)
         
     def get_token(self, pos, include_brace_chars=None, environments=True,
-                  keep_inline_math=None, parsing_state=None, **kwargs):
+                  keep_inline_math=None, parsing_state=None, chars_run=False,
+                  **kwargs):
         r"""
         Parses the latex content given to the constructor (and stored in `self.s`),
         starting at position `pos`, to parse a single "token", as defined by
@@ -421,6 +732,16 @@ class LatexWalker(object):
         default parsing state returned by :py:meth:`make_parsing_state()` is
         used.
 
+        If `chars_run=True`, then a whole run of consecutive characters which
+        would each be returned as a separate 'char' token is returned as a
+        single 'char' token, whose `arg` contains all the characters in the run
+        (including any leading whitespace, in which case `pre_space` is empty,
+        and including any paragraph breaks).  The run never ends with
+        whitespace; trailing whitespace is reported as the `pre_space` of the
+        next token.  The regular expression used to detect such runs is
+        compiled once for each latex context, set of brace characters and
+        math/text mode.
+
         .. deprecated:: 2.0
 
            The flag `keep_inline_math` is only accepted for compatibiltiy with
@@ -437,22 +758,88 @@ class LatexWalker(object):
         .. versionadded:: 2.0
 
            The `parsing_state` argument was introduced in version 2.0.
+
+        .. versionadded:: 2.11
+
+           The `chars_run` argument was introduced in `pylatexenc 2.11`.
+
+        .. versionchanged:: 2.11
+
+           The walker keeps the most recently read tokens in a small cache, so
+           that looking ahead at the same position (e.g., to check for an
+           optional argument, and then to read whatever follows the macro)
+           does not tokenize the string again.  The returned
+           :py:class:`LatexToken` objects may thus be shared between calls and
+           should not be modified.
         """
 
+        if 'brackets_are_chars' in kwargs:
+            if not kwargs.pop('brackets_are_chars'):
+                include_brace_chars = list(include_brace_chars or []) + [('[', ']')]
+
+        tok = self._get_token(pos, include_brace_chars, environments, parsing_state,
+                              chars_run)
+        if tok.__class__ is _EndOfStreamToken:
+            raise LatexWalkerEndOfStream(final_space=tok.final_space)
+        return tok
+
+    def _get_token(self, pos, include_brace_chars=None, environments=True,
+                   parsing_state=None, chars_run=False):
+        # (INTERNAL.) Same as get_token(), except that at the end of the string,
+        # an _EndOfStreamToken is returned instead of raising
+        # LatexWalkerEndOfStream.
+
         if parsing_state is None:
-            parsing_state = self.make_parsing_state() # get default parsing state
+            parsing_state = self._make_parsing_state() # get default parsing state
 
         brace_chars = [('{', '}')]
 
         if include_brace_chars:
             brace_chars += include_brace_chars
 
-        if 'brackets_are_chars' in kwargs:
-            if not kwargs.pop('brackets_are_chars'):
-                brace_chars += [('[', ']')]
+        latex_context = parsing_state.latex_context
+        if hasattr(latex_context, '_get_cached'):
+            # object which changes whenever the latex context is modified
+            context_marker = latex_context._get_cached(_token_cache_marker_key, object)
+        else:
+            context_marker = None
+
+        token_cache = self._token_cache
+        if context_marker is not None:
+            cached = token_cache.get(pos)
+            if cached is not None and cached[5] is context_marker \
+               and cached[6] == self.tolerant_parsing and cached[7] is self.s:
+                tok = _reuse_cached_token(cached, brace_chars, environments, chars_run,
+                                          parsing_state, self.s)
+                if tok is not None:
+                    return tok
+
+        tok = self._read_token(pos, brace_chars, environments, parsing_state, chars_run)
+
+        if context_marker is not None and tok.__class__ is not _EndOfStreamToken \
+           and not (tok.tok == 'char' and tok.arg in ('\\begin', '\\end')):
+            # (don't cache the placeholder tokens for a malformed \begin or \end
+            # in tolerant parsing mode, which depend on `environments` and
+            # whose parse error should be reported each time)
+            if len(token_cache) >= _TOKEN_CACHE_SIZE:
+                token_cache.clear()
+            token_cache[pos] = (tok, brace_chars, environments, chars_run, parsing_state,
+                                context_marker, self.tolerant_parsing, self.s)
+        return tok
+
+    def _read_token(self, pos, brace_chars, environments, parsing_state, chars_run):
+        # (INTERNAL.) Tokenize the string at `pos`, see get_token().
 
         s = self.s # shorthand
 
+        if chars_run:
+            rx = self._get_chars_run_rx(parsing_state, brace_chars)
+            if rx is not None:
+                m = rx.match(s, pos)
+                if m is not None:
+                    return LatexToken(tok='char', arg=m.group(), pos=pos,
+                                      len=m.end()-pos, pre_space='')
+
         space = '' # space that we gobble up before token
 
         #
@@ -476,7 +863,7 @@ class LatexWalker(object):
                 s=s,
                 pos=pos,
                 msg=msg,
-                **self.pos_to_lineno_colno(pos, as_dict=True)
+                get_lineno_colno=self._lineno_colno_getter(pos)
             )
             if self.tolerant_parsing:
                 self._report_ignore_parse_error(e)
@@ -489,29 +876,38 @@ class LatexWalker(object):
                 )
             return e, None
 
-        while pos < len(s) and s[pos].isspace():
-            space += s[pos]
-            pos += 1
-            if space.endswith('\n\n'):  # two \n's indicate new paragraph.
-                return LatexToken(tok='char', arg='\n\n', pos=pos-2, len=2,
-                                  pre_space=space[:-2])
+        # skip whitespace, stopping at the first paragraph break
+        space_end = _rx_space.match(s, pos).end()
+        if space_end > pos:
+            k = s.find('\n\n', pos, space_end)
+            if k != -1:  # two \n's indicate new paragraph.
+                return LatexToken(tok='char', arg='\n\n', pos=k, len=2,
+                                  pre_space=s[pos:k])
+            space = s[pos:space_end]
+            pos = space_end
 
         if pos >= len(s):
-            raise LatexWalkerEndOfStream(final_space=space)
+            return _EndOfStreamToken(final_space=space)
+
+        c = s[pos]
 
-        if s[pos] == '\\':
+        if c == '\\':
             # escape sequence
             if pos+1 >= len(s):
-                raise LatexWalkerEndOfStream()
-            macro = s[pos+1] # next char is necessarily part of macro
-            # following chars part of macro only if all are alphabetical
+                return _EndOfStreamToken()
+            # next char is necessarily part of macro; following chars part of
+            # macro only if all are alphabetical
             isalphamacro = False
             i = 2
             if s[pos+1].isalpha():
                 isalphamacro = True
+                m = _rx_ascii_letters.match(s, pos+2)
+                if m is not None:
+                    i = m.end() - pos
+                # in case of non-ascii letters
                 while pos+i<len(s) and s[pos+i].isalpha():
-                    macro += s[pos+i]
                     i += 1
+            macro = s[pos+1:pos+i]
 
             # special treatment for \( ... \) and \[ ... \] -- "macros" for
             # inline/display math modes
@@ -525,7 +921,7 @@ class LatexWalker(object):
             # see if we have a begin/end environment
             if environments and macro in ['begin', 'end']:
                 # \begin{environment} or \end{environment}
-                envmatch = re.match(r'^\s*\{([\w* ._-]+)\}', s[pos+i:])
+                envmatch = _rx_environment_name.match(s, pos+i)
                 if envmatch is None:
                     e, t = _token_parse_error(
                         msg=r"Bad \{} macro: expected {{environmentname}}".format(macro),
@@ -540,7 +936,7 @@ class LatexWalker(object):
                     tok=('begin_environment' if macro == 'begin' else 'end_environment'),
                     arg=envmatch.group(1),
                     pos=pos,
-                    len=i+envmatch.end(), # !!: envmatch.end() counts from pos+i
+                    len=envmatch.end()-pos,
                     pre_space=space
                     )
 
@@ -548,23 +944,21 @@ class LatexWalker(object):
             post_space = ''
             if isalphamacro:
                 # important, LaTeX does not consume space after non-alpha macros, like \&
-                while pos+i<len(s) and s[pos+i].isspace():
-                    post_space += s[pos+i]
-                    i += 1
-                    if post_space.endswith('\n\n'):
-                        # if two \n's are encountered this signals a new
-                        # paragraph, so do not include them as part of the
-                        # macro's post_space.
-                        post_space = post_space[:-2]
-                        i -= 2
-                        break
+                post_space_end = _rx_space.match(s, pos+i).end()
+                # if two \n's are encountered this signals a new paragraph, so
+                # do not include them as part of the macro's post_space.
+                k = s.find('\n\n', pos+i, post_space_end)
+                if k != -1:
+                    post_space_end = k
+                post_space = s[pos+i:post_space_end]
+                i = post_space_end - pos
 
             return LatexToken(tok='macro', arg=macro, pos=pos, len=i,
                               pre_space=space, post_space=post_space)
 
-        if s[pos] == '%':
+        if c == '%':
             # latex comment
-            m = re.compile(r'(\n|\r|\n\r)(?P<extraspace>\s*)').search(s, pos)
+            m = _rx_comment_end.search(s, pos)
             mlen = None
             if m is not None:
                 if m.group('extraspace').startswith( ('\n', '\r', '\n\r',) ):
@@ -584,14 +978,13 @@ class LatexWalker(object):
             return LatexToken(tok='comment', arg=s[pos+1:pos+arglen], pos=pos, len=mlen,
                               pre_space=space, post_space=mspace)
 
-        # see https://stackoverflow.com/a/19343/1694896
-        openbracechars, closebracechars = zip(*brace_chars)
-
-        if s[pos] in openbracechars:
-            return LatexToken(tok='brace_open', arg=s[pos], pos=pos, len=1, pre_space=space)
+        for (openbracechar, closebracechar) in brace_chars:
+            if c == openbracechar:
+                return LatexToken(tok='brace_open', arg=c, pos=pos, len=1, pre_space=space)
 
-        if s[pos] in closebracechars:
-            return LatexToken(tok='brace_close', arg=s[pos], pos=pos, len=1, pre_space=space)
+        for (openbracechar, closebracechar) in brace_chars:
+            if c == closebracechar:
+                return LatexToken(tok='brace_close', arg=c, pos=pos, len=1, pre_space=space)
 
         # check for math-mode dollar signs.  Using python syntax
         # "string.startswith(pattern, pos)"
@@ -616,6 +1009,15 @@ class LatexWalker(object):
         return LatexToken(tok='char', arg=s[pos], pos=pos, len=1, pre_space=space)
 
 
+    def _get_chars_run_rx(self, parsing_state, brace_chars):
+        latex_context = parsing_state.latex_context
+        if not hasattr(latex_context, '_get_cached'):
+            return None
+        return latex_context._get_cached(
+            ('latexwalker_chars_run_rx', tuple(brace_chars), parsing_state.in_math_mode),
+            lambda: _make_chars_run_rx(latex_context, brace_chars)
+        )
+
     def make_node(self, node_class, **kwargs):
         r"""
         Create and return a node of type `node_class` which holds a representation
@@ -672,6 +1074,19 @@ class LatexWalker(object):
 
         return self._line_no_calc.pos_to_lineno_colno(pos, as_dict=as_dict)
 
+    def _get_token_or_eos_function(self):
+        # (INTERNAL.) Return a function which the parsing engine calls instead
+        # of get_token(), and which returns an _EndOfStreamToken instead of
+        # raising LatexWalkerEndOfStream.
+        if _engine._func(type(self).get_token) is _engine._func(LatexWalker.get_token):
+            return self._get_token
+        return functools.partial(_get_token_or_eos, self)
+
+    def _lineno_colno_getter(self, pos):
+        # (INTERNAL.) A callable which returns pos_to_lineno_colno(pos), for
+        # computing the line and column numbers of parse errors lazily
+        return functools.partial(self.pos_to_lineno_colno, pos)
+
 
     def get_latex_expression(self, pos, strict_braces=None, parsing_state=None):
         r"""
@@ -695,85 +1110,93 @@ class LatexWalker(object):
         """
 
         if parsing_state is None:
-            parsing_state = self.make_parsing_state() # get default parsing state
+            parsing_state = self._make_parsing_state() # get default parsing state
 
         with _util.PushPropOverride(self, 'strict_braces', strict_braces):
 
             tok = self.get_token(pos, environments=False, parsing_state=parsing_state)
 
-            if tok.tok == 'macro':
-                if tok.arg == 'end':
-                    if not self.tolerant_parsing:
-                        # error, we were expecting a single token
-                        raise LatexWalkerParseError(
-                            r"Expected expression, got \end",
-                            self.s, pos,
-                            **self.pos_to_lineno_colno(pos, as_dict=True))
-                    else:
-                        return self._mknodeposlen(LatexCharsNode,
-                                                  parsing_state=parsing_state,
-                                                  chars='',
-                                                  pos=tok.pos,
-                                                  len=0)
-                return self._mknodeposlen(LatexMacroNode,
-                                          parsing_state=parsing_state,
-                                          macroname=tok.arg,
-                                          nodeargd=None,
-                                          macro_post_space=tok.post_space,
-                                          nodeoptarg=None, nodeargs=None,
-                                          pos=tok.pos, len=tok.len)
-            if tok.tok == 'specials':
-                return self._mknodeposlen(LatexSpecialsNode,
-                                          parsing_state=parsing_state,
-                                          specials_chars=tok.arg.specials_chars,
-                                          nodeargd=None,
-                                          pos=tok.pos, len=tok.len)
             if tok.tok == 'comment':
                 return self.get_latex_expression(tok.pos+tok.len, parsing_state=parsing_state)
             if tok.tok == 'brace_open':
                 return self.get_latex_braced_group(tok.pos, parsing_state=parsing_state)
-            if tok.tok == 'brace_close':
-                # don't worry, stray closing braces are still reported (in
-                # get_latex_nodes()) if tolerant_parsing=False even if
-                # strict_braces=False.  That's because we leave the brace in the
-                # input and it will be picked up when we read the next token.
-                if self.strict_braces and not self.tolerant_parsing:
+
+            return self._get_latex_expression_from_token(pos, tok, parsing_state,
+                                                         strict_braces=self.strict_braces)
+
+    def _get_latex_expression_from_token(self, pos, tok, parsing_state, strict_braces):
+        # (INTERNAL.) Make the node for a latex expression whose token `tok`
+        # (read at position `pos`) is neither a comment nor an opening brace.
+
+        if tok.tok == 'macro':
+            if tok.arg == 'end':
+                if not self.tolerant_parsing:
+                    # error, we were expecting a single token
                     raise LatexWalkerParseError(
-                        "Expected expression, got closing brace '{}'".format(tok.arg),
+                        r"Expected expression, got \end",
                         self.s, pos,
-                        **self.pos_to_lineno_colno(pos, as_dict=True)
-                    )
-                return self._mknodeposlen(LatexCharsNode,
+                        get_lineno_colno=self._lineno_colno_getter(pos))
+                else:
+                    return self._mknodeposlen(LatexCharsNode,
+                                              parsing_state=parsing_state,
+                                              chars='',
+                                              pos=tok.pos,
+                                              len=0)
+            return self._mknodeposlen(LatexMacroNode,
+                                      parsing_state=parsing_state,
+                                      macroname=tok.arg,
+                                      nodeargd=None,
+                                      macro_post_space=tok.post_space,
+                                      nodeoptarg=None, nodeargs=None,
+                                      pos=tok.pos, len=tok.len)
+        if tok.tok == 'specials':
+            return self._mknodeposlen(LatexSpecialsNode,
+                                      parsing_state=parsing_state,
+                                      specials_chars=tok.arg.specials_chars,
+                                      nodeargd=None,
+                                      pos=tok.pos, len=tok.len)
+        if tok.tok == 'brace_close':
+            # don't worry, stray closing braces are still reported (in
+            # get_latex_nodes()) if tolerant_parsing=False even if
+            # strict_braces=False.  That's because we leave the brace in the
+            # input and it will be picked up when we read the next token.
+            if strict_braces and not self.tolerant_parsing:
+                raise LatexWalkerParseError(
+                    "Expected expression, got closing brace '{}'".format(tok.arg),
+                    self.s, pos,
+                    get_lineno_colno=self._lineno_colno_getter(pos)
+                )
+            return self._mknodeposlen(LatexCharsNode,
+                                      parsing_state=parsing_state,
+                                      chars='',
+                                      pos=tok.pos, len=0)
+        if tok.tok == 'char':
+            return self._mknodeposlen(LatexCharsNode,
+                                      parsing_state=parsing_state,
+                                      chars=tok.arg,
+                                      pos=tok.pos,
+                                      len=tok.len)
+        if tok.tok in ('mathmode_inline', 'mathmode_display'):
+            # don't report a math mode token, treat as char or macro
+            if tok.arg.startswith('\\'):
+                return self._mknodeposlen(LatexMacroNode,
                                           parsing_state=parsing_state,
-                                          chars='',
-                                          pos=tok.pos, len=0)
-            if tok.tok == 'char':
+                                          macroname=tok.arg,
+                                          nodeoptarg=None,
+                                          nodeargs=None,
+                                          macro_post_space=tok.post_space,
+                                          pos=tok.pos,
+                                          len=tok.len)
+            else:
                 return self._mknodeposlen(LatexCharsNode,
                                           parsing_state=parsing_state,
                                           chars=tok.arg,
                                           pos=tok.pos,
                                           len=tok.len)
-            if tok.tok in ('mathmode_inline', 'mathmode_display'):
-                # don't report a math mode token, treat as char or macro
-                if tok.arg.startswith('\\'):
-                    return self._mknodeposlen(LatexMacroNode,
-                                              parsing_state=parsing_state,
-                                              macroname=tok.arg,
-                                              nodeoptarg=None,
-                                              nodeargs=None,
-                                              macro_post_space=tok.post_space,
-                                              pos=tok.pos,
-                                              len=tok.len)
-                else:
-                    return self._mknodeposlen(LatexCharsNode,
-                                              parsing_state=parsing_state,
-                                              chars=tok.arg,
-                                              pos=tok.pos,
-                                              len=tok.len)
 
-            raise LatexWalkerParseError(
-                "Unknown token type: {}".format(tok.tok), self.s, pos,
-                **self.pos_to_lineno_colno(pos, as_dict=True))
+        raise LatexWalkerParseError(
+            "Unknown token type: {}".format(tok.tok), self.s, pos,
+            get_lineno_colno=self._lineno_colno_getter(pos))
 
 
     def get_latex_maybe_optional_arg(self, pos, parsing_state=None):
@@ -795,7 +1218,7 @@ class LatexWalker(object):
         """
 
         if parsing_state is None:
-            parsing_state = self.make_parsing_state() # get default parsing state
+            parsing_state = self._make_parsing_state() # get default parsing state
 
         try:
             tok = self.get_token(pos, include_brace_chars=[('[', ']')], environments=False,
@@ -842,7 +1265,7 @@ class LatexWalker(object):
         """
 
         if parsing_state is None:
-            parsing_state = self.make_parsing_state() # get default parsing state
+            parsing_state = self._make_parsing_state() # get default parsing state
 
         closing_brace = None
         if brace_type == '{':
@@ -869,7 +1292,7 @@ class LatexWalker(object):
                 s=self.s,
                 pos=pos,
                 msg='get_latex_braced_group: not an opening brace/bracket: %s' %(self.s[pos]),
-                **self.pos_to_lineno_colno(pos, as_dict=True)
+                get_lineno_colno=self._lineno_colno_getter(pos)
             )
 
         (nodelist, npos, nlen) = self.get_latex_nodes(
@@ -916,7 +1339,7 @@ class LatexWalker(object):
         """
 
         if parsing_state is None:
-            parsing_state = self.make_parsing_state() # get default parsing state
+            parsing_state = self._make_parsing_state() # get default parsing state
 
         startpos = pos
 
@@ -930,7 +1353,7 @@ class LatexWalker(object):
                     environmentname if environmentname is not None else '<environment name>',
                     firsttok.arg
                 ),
-                **self.pos_to_lineno_colno(pos, as_dict=True)
+                get_lineno_colno=self._lineno_colno_getter(pos)
             )
         if (environmentname is None):
             environmentname = firsttok.arg
@@ -941,6 +1364,10 @@ class LatexWalker(object):
         if env_spec is None:
             env_spec = macrospec.EnvironmentSpec('')
 
+        stats = self.stats
+        if stats is not None:
+            t0 = stats._clock()
+
         # self = latex walker instance
         try:
             argsresult = env_spec.parse_args(w=self, pos=pos, parsing_state=parsing_state)
@@ -953,6 +1380,9 @@ class LatexWalker(object):
             if e is not None: raise e
             argsresult = (None, pos, 0, {})
 
+        if stats is not None:
+            stats._add_args_time('environment', environmentname, t0)
+
         if len(argsresult) == 4:
             (argd, apos, alen, adic) = argsresult
         else:
@@ -964,7 +1394,7 @@ class LatexWalker(object):
         parsing_state_inner = adic.get('inner_parsing_state', parsing_state)
         #parsing_state_inner = parsing_state
         if env_spec.is_math_mode:
-            parsing_state_inner = parsing_state.sub_context(
+            parsing_state_inner = parsing_state._sub_context(
                 in_math_mode=True,
                 math_mode_delimiter='{'+environmentname+'}',
             )
@@ -991,6 +1421,284 @@ class LatexWalker(object):
                                   len=npos+nlen-startpos)
 
 
+    def iter_latex_nodes(self, pos=0, parsing_state=None, cursor=None,
+                         with_cursors=False):
+        r"""
+        Generator version of :py:meth:`get_latex_nodes()`: parses the latex
+        content given to the constructor (and stored in `self.s`) starting at
+        position `pos`, and yields each top-level node as soon as it is
+        complete.  The nodes are the same as those that
+        ``get_latex_nodes(pos, parsing_state=parsing_state)`` would return.
+
+        The nodes that were yielded are not kept by the walker, so a large
+        document can be processed without holding all its nodes in memory.
+
+        If `with_cursors=True`, then tuples `(node, cursor)` are yielded
+        instead, where `cursor` is a :py:class:`ParsingCursor` giving the
+        position and parsing state at which parsing continues after `node`.
+        Parsing can be resumed later from such a cursor, possibly with a new
+        `LatexWalker` instance for the same string, by calling
+        ``iter_latex_nodes(cursor=cursor)``.  If `cursor` is given, it
+        overrides any `pos` and `parsing_state` arguments.
+
+        If `parsing_state` is `None` (and no `cursor` is given), the default
+        parsing state is used.  In case of a parse error in non-tolerant mode,
+        the exception is raised by the generator.
+
+        .. versionadded:: 2.11
+
+           This method was introduced in `pylatexenc 2.11`.
+        """
+        if cursor is not None:
+            pos, parsing_state = cursor.pos, cursor.parsing_state
+
+        if parsing_state is None:
+            parsing_state = self._make_parsing_state() # get default parsing state
+
+        parser = _engine._LatexNodesParser(
+            self,
+            delegate_to_walker=not self._use_iterative_parsing()
+        )
+        for (node, npos, nparsing_state) in parser.iter_nodes(pos, parsing_state):
+            if with_cursors:
+                yield (node, ParsingCursor(npos, nparsing_state))
+            else:
+                yield node
+
+    def iter_latex_events(self, pos=0, parsing_state=None):
+        r"""
+        Parses the latex content given to the constructor (and stored in
+        `self.s`) starting at position `pos`, and yields a
+        :py:class:`LatexEvent` for each construct as soon as it is read,
+        without building any node tree: runs of characters, comments, macros
+        and specials (along with their parsed arguments), and the beginning
+        and the end of each environment, braced group and math mode block.
+
+        Only the stack of the currently open environments, groups and math
+        mode blocks is kept in memory, so very large documents can be
+        processed in a single pass, e.g., to count words or to collect the
+        arguments of some macros.  The arguments of macros, environments and
+        specials are parsed by their specs in the latex context, as for
+        :py:meth:`get_latex_nodes()`, and are given as nodes in the events'
+        `nodeargd` attribute.
+
+        The events correspond exactly to the nodes that
+        ``get_latex_nodes(pos, parsing_state=parsing_state)`` would return,
+        visited in document order (with an ``'end_*'`` event after the
+        contents of each environment, group and math mode block), and parse
+        errors are handled in the same way.  (If you override
+        :py:meth:`get_latex_braced_group()` or
+        :py:meth:`get_latex_environment()` in a subclass, these methods are
+        not called to parse the groups and environments themselves.)
+
+        If `parsing_state` is `None`, the default parsing state is used.  In
+        case of a parse error in non-tolerant mode, the exception is raised by
+        the generator.
+
+        .. versionadded:: 2.11
+
+           This method was introduced in `pylatexenc 2.11`.
+        """
+        if parsing_state is None:
+            parsing_state = self._make_parsing_state() # get default parsing state
+
+        return _events._iter_latex_events(self, pos, parsing_state)
+
+    def get_latex_node_table(self, pos=0, parsing_state=None):
+        r"""
+        Parses the latex content given to the constructor (and stored in
+        `self.s`) starting at position `pos`, and returns the nodes in a flat,
+        array-backed :py:class:`LatexNodeTable` instead of a tree of node
+        objects.  This is useful to analyze large amounts of LaTeX code, as the
+        table uses a fraction of the memory of the corresponding node objects.
+
+        The table is filled as the string is parsed (using the events of
+        :py:meth:`iter_latex_events()`), so that no node objects are created
+        for characters, comments, groups, environments and math mode blocks.
+        Node objects are only created for the arguments of macros,
+        environments and specials (by their argument parsers), and they are
+        only kept until the corresponding row is stored in the table.  The
+        peak memory use is thus essentially that of the table itself, even if
+        the whole document is contained in a single environment (such as
+        ``\begin{document}...\end{document}``).  (If a subclass overrides
+        any of the methods which :py:meth:`get_latex_nodes()` relies on, see
+        the `iterative_parsing` flag, or the :py:meth:`make_node()` method,
+        then the table is built from the full node tree of each top-level
+        node instead.)
+
+        Views of the nodes, which behave like the nodes that
+        :py:meth:`get_latex_nodes()` would return, can be obtained with
+        :py:meth:`LatexNodeTable.get_node()` and
+        :py:meth:`LatexNodeTable.get_nodelist()`.
+
+        If `parsing_state` is `None`, the default parsing state is used.
+
+        .. versionadded:: 2.11
+
+           This method was introduced in `pylatexenc 2.11`.
+        """
+        table = LatexNodeTable()
+        if self._use_iterative_parsing() \
+           and _engine._func(type(self).make_node) is _engine._func(LatexWalker.make_node):
+            table._append_events(self.iter_latex_events(pos=pos,
+                                                        parsing_state=parsing_state))
+        else:
+            table.append_nodes(self.iter_latex_nodes(pos=pos, parsing_state=parsing_state))
+        return table
+
+    def get_latex_nodes_after_edit(self, nodelist, pos, removed_len, inserted_chars):
+        r"""
+        Parses the latex content given to the constructor (and stored in
+        `self.s`) by updating the nodes of a previous version of the string,
+        which was edited.  This is much faster than a full parse of the edited
+        string, e.g., for a live preview which needs to re-parse the document
+        after each keystroke.
+
+        Arguments:
+
+          - `nodelist` is the node list which `get_latex_nodes()` (with the
+            default position and parsing state) returned for the previous
+            version of the string;
+
+          - `pos`, `removed_len` and `inserted_chars` describe the edit: the
+            current string `self.s` was obtained from the previous version by
+            replacing `removed_len` characters at position `pos` by the string
+            `inserted_chars`.
+
+        Only the nodes which are affected by the edit are re-parsed, within the
+        innermost group, environment or math block containing the edit if
+        possible.  The nodes that follow are kept, with their positions
+        shifted.  The nodes of the given `nodelist` are reused and modified in
+        place, so the old node list should no longer be used after calling
+        this method.  (If a parse error is raised, the old nodes are not
+        modified.)
+
+        Returns the node list, which is identical to the one that
+        ``get_latex_nodes()`` would return for the current string.
+
+        .. versionadded:: 2.11
+
+           This method was introduced in `pylatexenc 2.11`.
+        """
+        if self.s[pos:pos+len(inserted_chars)] != inserted_chars:
+            raise ValueError("get_latex_nodes_after_edit(): the given edit does not "
+                             "correspond to the current string")
+        parser = _incremental._IncrementalParser(self, nodelist, pos, removed_len,
+                                                 len(inserted_chars))
+        return parser.run()
+
+    def get_latex_nodes_parallel(self, jobs=None, chunk_size=1048576):
+        r"""
+        Parses the full latex content given to the constructor (and stored in
+        `self.s`) using several worker processes, which is faster for very
+        large documents on a machine with several processor cores.
+
+        The string is cut into pieces of at least `chunk_size` characters at
+        paragraph breaks (blank lines) or at sectioning commands (such as
+        ``\section``), outside of any braces, environments, math mode and
+        verbatim constructs.  The pieces are parsed by `jobs` worker processes
+        (by default, as many as there are processor cores, see
+        :py:func:`get_latex_nodes_many()`).  The results are then checked and
+        assembled into a single node list, where the nodes have the same
+        positions in `self.s` as if the string had been parsed in one go.
+        Parts of the string where the result of a piece might differ from a
+        full parse (e.g., because a cut was not at the top level after all)
+        are parsed again in this process.
+
+        Returns a tuple `(nodelist, pos, len)` which is identical to what
+        ``get_latex_nodes()`` would return.  If the string is too short or
+        can't be cut, it is simply parsed with ``get_latex_nodes()``.  This is
+        also the case for subclasses of `LatexWalker` (which might parse
+        differently in the worker processes) and if a `diagnostics` collector,
+        a `stats` object or a `parse_cache` was given to the constructor (or if
+        `debug_nodes` is set).  Only the `tolerant_parsing`, `strict_braces`,
+        `tokenize_chars_runs` and `iterative_parsing` flags are given to the
+        workers.
+
+        The latex context and any custom specs, argument parsers and
+        environment or macro classes must be picklable to be sent to the
+        worker processes.
+
+        .. versionadded:: 2.11
+
+           This method was introduced in `pylatexenc 2.11`.
+        """
+        if type(self) is not LatexWalker or self.diagnostics is not None \
+           or self.stats is not None or self.parse_cache is not None \
+           or self.debug_nodes or len(self.s) < 2 * chunk_size:
+            return self.get_latex_nodes()
+
+        from . import _parallel
+        return _parallel._parse_parallel(self, jobs, chunk_size)
+
+    def extract_latex_nodes(self, macronames=(), environmentnames=(), pos=0,
+                            parsing_state=None):
+        r"""
+        Finds the macros named in `macronames` and the environments named in
+        `environmentnames` in the latex content given to the constructor (and
+        stored in `self.s`) starting at position `pos`, and returns a list of
+        the corresponding nodes, in the order in which they appear, e.g.::
+
+            >>> w = LatexWalker(r'\title{A} Some text, $x$ and \cite{b} ...')
+            >>> [ n.macroname for n in w.extract_latex_nodes(['title', 'cite']) ]
+            ['title', 'cite']
+
+        This is faster than parsing the full document with
+        :py:meth:`get_latex_nodes()` and looking for the nodes in the node
+        tree; how much faster depends on how many of the requested constructs
+        the document contains, as they are parsed as usual.  For instance,
+        with the ``benchmarks`` in the source repository (``python -m
+        benchmarks --benchmark latexwalker --benchmark extract``), extracting
+        ``\title``, ``\author``, ``\cite``, ``\label`` and the ``abstract``
+        environment is about 8 times faster than a full parse for the
+        "article" corpus (which cites a reference every few sentences), and
+        about 15 times faster for the "test_input" corpus.
+
+        The rest of the document is only scanned for what determines how the
+        requested constructs are parsed: comments, braces, math mode
+        delimiters, environment boundaries, and verbatim constructs (such as
+        ``\verb+...+`` or ``\begin{verbatim}...\end{verbatim}``), whose
+        contents are skipped.  The requested macros and environments are
+        parsed as usual, along with their arguments (and contents, for
+        environments), in the appropriate parsing state.
+
+        A requested construct which appears in the arguments or in the
+        contents of another requested construct is not returned separately;
+        it is part of the node tree of the latter.  The scan doesn't know
+        which arguments the other macros take.  So a requested macro which is
+        given as an argument without braces to another macro, as in
+        ``\mbox\cite{x}`` (where :py:meth:`get_latex_nodes()` would see
+        ``\cite`` as the argument of ``\mbox``, without arguments of its own),
+        is parsed as if it appeared on its own.
+
+        If `parsing_state` is `None`, the default parsing state is used.  Parse
+        errors in the requested constructs are reported or raised as in
+        :py:meth:`get_latex_nodes()`; errors in the rest of the document are
+        not detected.
+
+        .. versionadded:: 2.11
+
+           This method was introduced in `pylatexenc 2.11`.
+        """
+        if parsing_state is None:
+            parsing_state = self._make_parsing_state() # get default parsing state
+
+        from . import _extract
+        extractor = _extract._Extractor(self, macronames, environmentnames)
+        return extractor.run(pos, parsing_state)
+
+    def _use_iterative_parsing(self):
+        if not self.iterative_parsing:
+            return False
+        # use the recursive implementation if any of the methods it relies on
+        # were overridden
+        cls = type(self)
+        for methname in _iterative_parsing_replaced_methods:
+            if _engine._func(getattr(cls, methname)) \
+               is not _engine._func(getattr(LatexWalker, methname)):
+                return False
+        return True
+
     def _exchandle_parse_subexpression(self, e, tok, what):
         """
         (INTERNAL.) Handle an exception raised by a method that you called to parse
@@ -1011,16 +1719,14 @@ class LatexWalker(object):
                 s=self.s,
                 pos=tok.pos,
                 msg="End of input while parsing {}".format(what),
-                **self.pos_to_lineno_colno(tok.pos, as_dict=True)
+                get_lineno_colno=self._lineno_colno_getter(tok.pos)
             )
 
-        if getattr(e, 'pos', None) is not None and e.lineno is None and e.colno is None:
-            e.lineno, e.colno = self.pos_to_lineno_colno(e.pos)
+        if getattr(e, 'pos', None) is not None and e._lineno is None \
+           and e._colno is None and e._get_lineno_colno is None:
+            e._get_lineno_colno = self._lineno_colno_getter(e.pos)
 
-        e.open_contexts.append(
-            _maketuple('{}'.format(what), tok.pos,
-                       *self.pos_to_lineno_colno(tok.pos))
-        )
+        e._push_open_context('{}'.format(what), tok.pos, self.pos_to_lineno_colno)
 
         if self.tolerant_parsing:
             self._report_ignore_parse_error(e)
@@ -1110,10 +1816,31 @@ class LatexWalker(object):
         .. versionadded:: 2.0
 
            The `parsing_state` argument was introduced in version 2.0.
+
+        .. versionchanged:: 2.11
+
+           If a `parse_cache` was given to the constructor, the result of a
+           full parse of the string (`pos=0`, and no `stop_upon_...` or
+           `read_max_nodes` arguments) is taken from the cache if possible.
         """
 
         if parsing_state is None:
-            parsing_state = self.make_parsing_state() # get default parsing state
+            parsing_state = self._make_parsing_state() # get default parsing state
+
+        if self.parse_cache is not None and pos == 0 and read_max_nodes is None \
+           and stop_upon_closing_brace is None and stop_upon_end_environment is None \
+           and stop_upon_closing_mathmode is None and self.diagnostics is None:
+            return self.parse_cache._get_latex_nodes(
+                self, parsing_state,
+                lambda: self._get_latex_nodes(pos, None, None, None, None, parsing_state)
+            )
+
+        return self._get_latex_nodes(pos, stop_upon_closing_brace, stop_upon_end_environment,
+                                     stop_upon_closing_mathmode, read_max_nodes,
+                                     parsing_state)
+
+    def _get_latex_nodes(self, pos, stop_upon_closing_brace, stop_upon_end_environment,
+                         stop_upon_closing_mathmode, read_max_nodes, parsing_state):
 
         nodelist = []
     
@@ -1147,6 +1874,16 @@ class LatexWalker(object):
                  )
             )
 
+        if self._use_iterative_parsing():
+            return _engine._LatexNodesParser(self).parse_nodes(
+                pos,
+                stop_upon_closing_brace=stop_upon_closing_brace,
+                stop_upon_end_environment=stop_upon_end_environment,
+                stop_upon_closing_mathmode=stop_upon_closing_mathmode,
+                read_max_nodes=read_max_nodes,
+                parsing_state=parsing_state,
+            )
+
         #
         # Man, I really need to rewrite this function properly. This is some
         # pretty ugly sh*t.
@@ -1155,21 +1892,24 @@ class LatexWalker(object):
         origpos = pos
 
         class PosPointer:
-            def __init__(self, pos, parsing_state, lastchars='', lastchars_pos=None):
+            def __init__(self, pos, parsing_state):
                 self.pos = pos
                 self.parsing_state = parsing_state
-                self.lastchars = lastchars
-                self.lastchars_pos = lastchars_pos
+                self.lastchars_pos = None
+                self.lastchars_end = None
 
-            def push_lastchars(self, pos, chars):
-                self.lastchars += chars
+            def push_lastchars(self, pos, end):
+                # we only keep track of the positions of the characters s[pos:end]
+                if end == pos:
+                    return
                 if self.lastchars_pos is None:
                     self.lastchars_pos = pos
+                self.lastchars_end = end
             
             def flush_lastchars(self):
-                res = self.lastchars_pos, self.lastchars
-                self.lastchars = ''
+                res = self.lastchars_pos, self.lastchars_end
                 self.lastchars_pos = None
+                self.lastchars_end = None
                 return res
 
         p = PosPointer(pos=pos, parsing_state=parsing_state)
@@ -1186,7 +1926,8 @@ class LatexWalker(object):
 
             try:
                 tok = self.get_token(p.pos, include_brace_chars=include_brace_chars,
-                                     parsing_state=p.parsing_state)
+                                     parsing_state=p.parsing_state,
+                                     chars_run=self.tokenize_chars_runs)
             except LatexWalkerEndOfStream as e:
                 if self.tolerant_parsing:
                     return e
@@ -1205,16 +1946,16 @@ class LatexWalker(object):
             # if it's a char, just append it to the stream of last characters.
             if tok.tok == 'char':
                 p.push_lastchars(pos=(tok.pos - len(tok.pre_space)),
-                                 chars=(tok.pre_space + tok.arg))
+                                 end=(tok.pos + tok.len))
                 return False
 
-            # if it's not a char, push the last `p.lastchars` into the node list
+            # if it's not a char, push the last characters into the node list
             # before we do anything else
-            if len(p.lastchars):
-                charspos, chars = p.flush_lastchars()
+            if p.lastchars_pos is not None:
+                charspos, _ = p.flush_lastchars()
                 strnode = self.make_node(LatexCharsNode,
                                          parsing_state=p.parsing_state,
-                                         chars=chars+tok.pre_space,
+                                         chars=None, # == chars + tok.pre_space
                                          pos=charspos, len=tok.pos - charspos)
                 nodelist.append(strnode)
                 if read_max_nodes and len(nodelist) >= read_max_nodes:
@@ -1229,7 +1970,7 @@ class LatexWalker(object):
                 # `strict_latex_spaces=True` flag correctly.
                 spacestrnode = self.make_node(LatexCharsNode,
                                               parsing_state=p.parsing_state,
-                                              chars=tok.pre_space,
+                                              chars=_engine._intern_space(tok.pre_space),
                                               pos=tok.pos-len(tok.pre_space),
                                               len=len(tok.pre_space))
                 nodelist.append(spacestrnode)
@@ -1248,7 +1989,7 @@ class LatexWalker(object):
                         s=self.s,
                         pos=tok.pos,
                         msg="Unexpected mismatching closing brace: '%s'"%(tok.arg),
-                        **self.pos_to_lineno_colno(tok.pos, as_dict=True)
+                        get_lineno_colno=self._lineno_colno_getter(tok.pos)
                     )
                 return True
 
@@ -1260,7 +2001,7 @@ class LatexWalker(object):
                         s=self.s,
                         pos=tok.pos,
                         msg=("Unexpected closing environment: '{}'".format(tok.arg)),
-                        **self.pos_to_lineno_colno(tok.pos, as_dict=True)
+                        get_lineno_colno=self._lineno_colno_getter(tok.pos)
                     )
                 elif tok.arg != stop_upon_end_environment:
                     #p.push_lastchars(tok_to_pos_and_chars_from_ppos(tok))
@@ -1269,7 +2010,7 @@ class LatexWalker(object):
                         pos=tok.pos,
                         msg=("Unexpected mismatching closing environment: '{}', "
                              "was expecting '{}'".format(tok.arg, stop_upon_end_environment)),
-                        **self.pos_to_lineno_colno(tok.pos, as_dict=True)
+                        get_lineno_colno=self._lineno_colno_getter(tok.pos)
                     )
                 return True
 
@@ -1292,7 +2033,7 @@ class LatexWalker(object):
                             msg="Mismatching closing math mode: '{}', expected '{}'".format(
                                 tok.arg, stop_upon_closing_mathmode,
                             ),
-                            **self.pos_to_lineno_colno(tok.pos, as_dict=True)
+                            get_lineno_colno=self._lineno_colno_getter(tok.pos)
                         )
                     # all ok, this is a new math mode opening.  Keep an assert
                     # in case we forget to include some math-mode delimiters in
@@ -1307,7 +2048,7 @@ class LatexWalker(object):
                         s=self.s,
                         pos=tok.pos,
                         msg="Unexpected closing math mode: '{}'".format(tok.arg),
-                        **self.pos_to_lineno_colno(tok.pos, as_dict=True)
+                        get_lineno_colno=self._lineno_colno_getter(tok.pos)
                     )
 
                 # we have encountered a new math inline, parse the math expression
@@ -1316,7 +2057,7 @@ class LatexWalker(object):
                     {r'\(': r'\)', r'\[': r'\]'}.get(tok.arg, tok.arg)
                 displaytype = 'inline' if tok.arg in [r'\(', '$'] else 'display'
 
-                parsing_state_inner = p.parsing_state.sub_context(
+                parsing_state_inner = p.parsing_state._sub_context(
                     in_math_mode=True,
                     math_mode_delimiter=tok.arg
                 )
@@ -1328,8 +2069,8 @@ class LatexWalker(object):
                         parsing_state=parsing_state_inner
                     )
                 except LatexWalkerParseError as e:
-                    e.open_contexts.append( _maketuple('math mode "{}"'.format(tok.arg), tok.pos,
-                                                       *self.pos_to_lineno_colno(tok.pos)) )
+                    e._push_open_context('math mode "{}"'.format(tok.arg), tok.pos,
+                                         self.pos_to_lineno_colno)
                     raise
                 p.pos = mpos + mlen
 
@@ -1367,8 +2108,7 @@ class LatexWalker(object):
                 # except LatexWalkerEndOfStream as e:
                 #     # shouldn't happen.
                 except LatexWalkerParseError as e:
-                    e.open_contexts.append( _maketuple('open brace', tok.pos,
-                                                       *self.pos_to_lineno_colno(tok.pos)) )
+                    e._push_open_context('open brace', tok.pos, self.pos_to_lineno_colno)
                     raise
 
                 p.pos = bpos + blen
@@ -1386,10 +2126,8 @@ class LatexWalker(object):
                         parsing_state=p.parsing_state
                     )
                 except LatexWalkerParseError as e:
-                    e.open_contexts.append(
-                        _maketuple('begin environment "{}"'.format(tok.arg), tok.pos,
-                                   *self.pos_to_lineno_colno(tok.pos))
-                    )
+                    e._push_open_context('begin environment "{}"'.format(tok.arg), tok.pos,
+                                         self.pos_to_lineno_colno)
                     raise
                 p.pos = epos + elen
                 # add node and continue.
@@ -1405,6 +2143,10 @@ class LatexWalker(object):
                 if mspec is None:
                     mspec = macrospec.MacroSpec('')
 
+                stats = self.stats
+                if stats is not None:
+                    t0 = stats._clock()
+
                 try:
                     margsresult = \
                         mspec.parse_args(w=self, pos=tok.pos + tok.len,
@@ -1418,6 +2160,9 @@ class LatexWalker(object):
                     if e is not None: raise e
                     margsresult = (None, tok.pos + tok.len, 0, {})
 
+                if stats is not None:
+                    stats._add_args_time('macro', macroname, t0)
+
                 if len(margsresult) == 4:
                     (nodeargd, mapos, malen, mdic) = margsresult
                 else:
@@ -1458,6 +2203,10 @@ class LatexWalker(object):
                 p.pos = tok.pos + tok.len
                 nodeargd = None
 
+                stats = self.stats
+                if stats is not None:
+                    t0 = stats._clock()
+
                 try:
                     res = sspec.parse_args(w=self, pos=p.pos, parsing_state=p.parsing_state)
                 except (LatexWalkerEndOfStream, LatexWalkerParseError) as e:
@@ -1469,6 +2218,9 @@ class LatexWalker(object):
                     if e is not None: raise e
                     res = (None, p.pos, 0, {})
 
+                if stats is not None:
+                    stats._add_args_time('specials', sspec.specials_chars, t0)
+
                 if res is not None:
                     # specials expects arguments, read them
                     if len(res) == 4:
@@ -1503,7 +2255,7 @@ class LatexWalker(object):
                 s=self.s,
                 pos=p.pos,
                 msg="Unknown token: {!r}".format(tok),
-                **self.pos_to_lineno_colno(p.pos, as_dict=True)
+                get_lineno_colno=self._lineno_colno_getter(p.pos)
             )
 
 
@@ -1527,7 +2279,7 @@ class LatexWalker(object):
                         pos=p.pos,
                         msg="Unexpected end of stream, was expecting {}"
                             .format(expecting),
-                        **self.pos_to_lineno_colno(len(self.s), as_dict=True)
+                        get_lineno_colno=self._lineno_colno_getter(len(self.s))
                     )
                     if self.tolerant_parsing:
                         self._report_ignore_parse_error(e)
@@ -1548,17 +2300,49 @@ class LatexWalker(object):
                 # add last chars and last space
                 if isinstance(r_endnow, LatexWalkerEndOfStream):
                     p.push_lastchars(pos=p.pos,
-                                     chars=r_endnow.final_space)
+                                     end=p.pos+len(r_endnow.final_space))
                     p.pos += len(r_endnow.final_space)
 
-                if p.lastchars:
-                    charspos, chars = p.flush_lastchars()
+                if p.lastchars_pos is not None:
+                    charspos, charsend = p.flush_lastchars()
                     strnode = self.make_node(LatexCharsNode,
                                              parsing_state=p.parsing_state,
-                                             chars=chars,
-                                             pos=charspos, len=len(chars))
+                                             chars=None,
+                                             pos=charspos, len=charsend-charspos)
                     nodelist.append(strnode)
                 return (nodelist, origpos, p.pos - origpos)
 
         # code never reaches here
 
+
+
+def _make_get_latex_nodes_function(latex_context, kwargs):
+    def get_nodelist(s):
+        return LatexWalker(s, latex_context=latex_context, **kwargs).get_latex_nodes()[0]
+    return get_nodelist
+
+
+def get_latex_nodes_many(latex_strings, jobs=1, chunksize=None, latex_context=None,
+                         **kwargs):
+    r"""
+    Parse many independent pieces of LaTeX code.  Yields the node list of each
+    string in `latex_strings` (any iterable), in the same order, i.e., the
+    result of ``LatexWalker(s, latex_context=latex_context,
+    **kwargs).get_latex_nodes()[0]`` for each string `s`.
+
+    If `jobs` is different from 1, then the strings are parsed in `jobs`
+    worker processes (or as many as there are CPUs if `jobs=None`), in chunks
+    of `chunksize` strings.  See
+    :py:func:`pylatexenc.latex2text.latex_to_text_many()`.  The nodes are
+    pickled to be sent back from the worker processes, so the latex context
+    must be picklable (see
+    :py:meth:`pylatexenc.macrospec.LatexContextDb.freeze()`).
+
+    .. versionadded:: 2.11
+
+       This function was introduced in `pylatexenc 2.11`.
+    """
+    return _util.batch_map(
+        _make_get_latex_nodes_function, (latex_context, kwargs),
+        latex_strings, jobs=jobs, chunksize=chunksize
+    )
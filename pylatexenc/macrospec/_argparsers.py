@@ -47,6 +47,112 @@ if sys.version_info.major == 2:
 
 
 
+def _inner_parsing_state(parsing_state, arg_math_mode):
+    # The parsing state in which to parse an argument, given the normalized
+    # `args_math_mode` entry for that argument (`True`, `False` or `None`)
+    if arg_math_mode is None or arg_math_mode == parsing_state.in_math_mode:
+        return parsing_state
+    return parsing_state._sub_context(in_math_mode=arg_math_mode)
+
+
+def _parse_mandatory_arg(args_parser, w, p, parsing_state, argnlist):
+    (node, np, nl) = w.get_latex_expression(
+        p,
+        strict_braces=False,
+        parsing_state=parsing_state
+    )
+    argnlist.append(node)
+    return np + nl
+
+def _parse_optional_arg(args_parser, w, p, parsing_state, argnlist):
+    if args_parser.optional_arg_no_space and p < len(w.s) and w.s[p].isspace():
+        # don't try to read optional arg, we don't allow space
+        argnlist.append(None)
+        return p
+
+    optarginfotuple = w.get_latex_maybe_optional_arg(
+        p,
+        parsing_state=parsing_state
+    )
+    if optarginfotuple is None:
+        argnlist.append(None)
+        return p
+    (node, np, nl) = optarginfotuple
+    argnlist.append(node)
+    return np + nl
+
+def _parse_star_arg(args_parser, w, p, parsing_state, argnlist):
+    # possible star.
+    tok = w.get_token(p)
+    if tok.tok == 'char' and tok.arg.startswith('*'):
+        # has star
+        argnlist.append(
+            w.make_node(latexwalker_types.LatexCharsNode,
+                        parsing_state=parsing_state,
+                        chars='*', pos=tok.pos, len=1)
+        )
+        return tok.pos + 1
+    argnlist.append(None)
+    return p
+
+_parse_arg_steps = {
+    '{': _parse_mandatory_arg,
+    '[': _parse_optional_arg,
+    '*': _parse_star_arg,
+}
+
+
+class _ArgsParsePlan(object):
+    r"""
+    The sequence of steps to parse the arguments given by `argspec` and
+    `args_math_mode` (see :py:class:`MacroStandardArgsParser`), computed once
+    and for all for each argument parser.
+
+    The attribute `steps` is a tuple of `(argt, parse_step, arg_math_mode)`
+    where `argt` is the argspec character, `parse_step` is the function that
+    parses the argument, and `arg_math_mode` is `True`, `False` or `None`
+    (normalized item of `args_math_mode`).  If `args_math_mode` is invalid,
+    `error` is the message of the `ValueError` to raise when parsing the
+    arguments; it is `None` otherwise.  The attribute `no_args` is `True` if
+    there are no arguments to parse.
+    """
+    def __init__(self, argspec, args_math_mode):
+        super(_ArgsParsePlan, self).__init__()
+        self.argspec = argspec
+        self.args_math_mode = args_math_mode
+        self.error = None
+        self.steps = ()
+        self.no_args = False
+
+        if args_math_mode is not None and len(args_math_mode) != len(argspec):
+            self.error = "Invalid args_math_mode={!r} for argspec={!r}!".format(
+                args_math_mode, argspec
+            )
+            return
+
+        steps = []
+        for j, argt in enumerate(argspec):
+            arg_math_mode = None
+            if args_math_mode is not None and args_math_mode[j] is not None:
+                arg_math_mode = (args_math_mode[j] == True)
+            parse_step = _parse_arg_steps.get(argt)
+            if parse_step is None:
+                parse_step = _unknown_arg_step(argt)
+            steps.append( (argt, parse_step, arg_math_mode) )
+        self.steps = tuple(steps)
+        self.no_args = not steps
+
+
+class _unknown_arg_step(object):
+    def __init__(self, argt):
+        self.argt = argt
+
+    def __call__(self, args_parser, w, p, parsing_state, argnlist):
+        raise latexwalker_types.LatexWalkerError(
+            "Unknown macro argument kind for macro: {!r}".format(self.argt)
+        )
+
+
 class MacroStandardArgsParser(object):
     r"""
     Parses the arguments to a LaTeX macro.
@@ -125,6 +231,20 @@ class MacroStandardArgsParser(object):
         # this to emulate pylatexenc 1.x behavior when using the MacrosDef()
         # function explicitly
         self._like_pylatexenc1x_ignore_leading_star = False
+        # precompiled steps to parse the arguments
+        self._plan = _ArgsParsePlan(self.argspec, self.args_math_mode)
+
+    def _get_plan(self):
+        # Return the _ArgsParsePlan for the current argspec and args_math_mode
+        # (these attributes might have been changed after the constructor was
+        # called, or the plan might be missing in an object that was pickled
+        # by an older version).
+        plan = getattr(self, '_plan', None)
+        if plan is None or plan.argspec is not self.argspec \
+           or plan.args_math_mode is not self.args_math_mode:
+            plan = _ArgsParsePlan(self.argspec, self.args_math_mode)
+            self._plan = plan
+        return plan
 
     def parse_args(self, w, pos, parsing_state=None):
         r"""
@@ -160,26 +280,20 @@ class MacroStandardArgsParser(object):
           to continue parsing stuff at the index `pos+len` in the string.
         """
 
+        plan = self._get_plan()
+
+        if plan.no_args and not self._like_pylatexenc1x_ignore_leading_star:
+            # fast path for macros without arguments
+            return (ParsedMacroArgs(argspec=self.argspec, argnlist=[]), pos, 0)
+
+        if plan.error is not None:
+            raise ValueError(plan.error)
+
         if parsing_state is None:
             parsing_state = w.make_parsing_state()
 
         argnlist = []
 
-        if self.args_math_mode is not None and \
-           len(self.args_math_mode) != len(self.argspec):
-            raise ValueError("Invalid args_math_mode={!r} for argspec={!r}!"
-                             .format(self.args_math_mode, self.argspec))
-
-        def get_inner_parsing_state(j):
-            if self.args_math_mode is None:
-                return parsing_state
-            amm = self.args_math_mode[j]
-            if amm is None or amm == parsing_state.in_math_mode:
-                return parsing_state
-            if amm == True:
-                return parsing_state.sub_context(in_math_mode=True)
-            return parsing_state.sub_context(in_math_mode=False)
-
         p = pos
 
         if self._like_pylatexenc1x_ignore_leading_star:
@@ -188,52 +302,9 @@ class MacroStandardArgsParser(object):
             if tok.tok == 'char' and tok.arg == '*':
                 p = tok.pos + tok.len
 
-        for j, argt in enumerate(self.argspec):
-            if argt == '{':
-                (node, np, nl) = w.get_latex_expression(
-                    p,
-                    strict_braces=False,
-                    parsing_state=get_inner_parsing_state(j)
-                )
-                p = np + nl
-                argnlist.append(node)
-
-            elif argt == '[':
-
-                if self.optional_arg_no_space and p < len(w.s) and w.s[p].isspace():
-                    # don't try to read optional arg, we don't allow space
-                    argnlist.append(None)
-                    continue
-
-                optarginfotuple = w.get_latex_maybe_optional_arg(
-                    p,
-                    parsing_state=get_inner_parsing_state(j)
-                )
-                if optarginfotuple is None:
-                    argnlist.append(None)
-                    continue
-                (node, np, nl) = optarginfotuple
-                p = np + nl
-                argnlist.append(node)
-
-            elif argt == '*':
-                # possible star.
-                tok = w.get_token(p)
-                if tok.tok == 'char' and tok.arg.startswith('*'):
-                    # has star
-                    argnlist.append(
-                        w.make_node(latexwalker_types.LatexCharsNode,
-                                    parsing_state=get_inner_parsing_state(j),
-                                    chars='*', pos=tok.pos, len=1)
-                    )
-                    p = tok.pos + 1
-                else:
-                    argnlist.append(None)
-
-            else:
-                raise latexwalker_types.LatexWalkerError(
-                    "Unknown macro argument kind for macro: {!r}".format(argt)
-                )
+        for (argt, parse_step, arg_math_mode) in plan.steps:
+            p = parse_step(self, w, p, _inner_parsing_state(parsing_state, arg_math_mode),
+                           argnlist)
 
         parsed = ParsedMacroArgs(
             argspec=self.argspec,
@@ -344,6 +415,28 @@ class ParsedVerbatimArgs(ParsedMacroArgs):
         )
 
 
+def _find_verbatim_end(w, sub, pos):
+    # Same as w.s.find(sub, pos).  We remember on the walker the smallest
+    # position from which `sub` is known not to occur, so that repeatedly looking
+    # for a missing end delimiter (e.g. a document with many unterminated
+    # verbatim environments) doesn't scan the rest of the string each time.
+    s = w.s
+    not_found = getattr(w, '_verbatim_end_not_found', None)
+    if not_found is None or not_found[0] is not s:
+        not_found = (s, {})
+        try:
+            w._verbatim_end_not_found = not_found
+        except AttributeError:
+            pass
+    not_found_pos = not_found[1].get(sub)
+    if not_found_pos is not None and pos >= not_found_pos:
+        return -1
+    i = s.find(sub, pos)
+    if i == -1:
+        not_found[1][sub] = pos
+    return i
+
+
 class VerbatimArgsParser(MacroStandardArgsParser):
     r"""
     Parses the arguments to various LaTeX "verbatim" constructs such as
@@ -439,7 +532,9 @@ class VerbatimArgsParser(MacroStandardArgsParser):
                 pos_start = pos
             # simply scan the string until we find '\end{verbatim}'.  That's
             # exactly how LaTeX processes it.
-            endverbpos = w.s.find(r'\end{'+self.verbatim_environment_name+r'}', pos)
+            endverbpos = _find_verbatim_end(
+                w, r'\end{'+self.verbatim_environment_name+r'}', pos
+            )
             if endverbpos == -1:
                 raise latexwalker_types.LatexWalkerParseError(
                     s=w.s,
@@ -465,7 +560,7 @@ class VerbatimArgsParser(MacroStandardArgsParser):
             if pos_start is None:
                 pos_start = pos
 
-            endpos = w.s.find(self.specials_delimiters[1], pos)
+            endpos = _find_verbatim_end(w, self.specials_delimiters[1], pos)
             if endpos == -1:
                 raise latexwalker_types.LatexWalkerParseError(
                     s=w.s,
@@ -491,20 +586,20 @@ class VerbatimArgsParser(MacroStandardArgsParser):
         if self.verbatim_arg_type == 'verb-macro':
             # read the next nonwhitespace char. This is the delimiter of the
             # argument
-            while w.s[pos].isspace():
-                pos += 1
+            while pos >= len(w.s) or w.s[pos].isspace():
                 if pos >= len(w.s):
                     raise latexwalker_types.LatexWalkerParseError(
                         s=w.s,
                         pos=pos,
                         msg=r"Missing argument to \verb command"
                     )
+                pos += 1
             verbdelimchar = w.s[pos]
             beginpos = pos+1
             if pos_start is None:
                 pos_start = beginpos # the argument started here
 
-            endpos = w.s.find(verbdelimchar, beginpos)
+            endpos = _find_verbatim_end(w, verbdelimchar, beginpos)
             if endpos == -1:
                 raise latexwalker_types.LatexWalkerParseError(
                     s=w.s,
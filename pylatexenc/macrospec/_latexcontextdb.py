@@ -29,8 +29,96 @@
 
 from __future__ import print_function, unicode_literals
 
+import hashlib
+import types
+import functools
 
 
+# for Py3
+_basestring = str
+_int_types = (int,)
+
+## Begin Py2 support code
+import sys
+if sys.version_info.major == 2:
+    # Py2
+    _basestring = basestring
+    _int_types = (int, long)
+## End Py2 support code
+
+
+
+def _fingerprint_data(obj, memo):
+    r"""
+    (INTERNAL.)  Return a structure of tuples, strings and numbers that
+    describes the given object (e.g., a macro specification), and whose
+    `repr()` is the same in all processes and Python sessions where the object
+    behaves in the same way.  Functions are described by their name and by
+    their code, including the values of any variables in their closure.
+    Private attributes of objects (starting with an underscore) are not taken
+    into account.
+
+    The dictionary `memo` should initially be empty.  It is used to describe
+    objects which appear several times (or reference themselves) only once.
+    """
+    if obj is None or isinstance(obj, (bool, float, _basestring, bytes) + _int_types):
+        return obj
+
+    if id(obj) in memo:
+        return ('<ref>', memo[id(obj)][0])
+    # also keep a reference to `obj`, so that its id() isn't reused
+    memo[id(obj)] = (len(memo), obj)
+
+    if isinstance(obj, LatexContextDb):
+        return ('LatexContextDb', obj.fingerprint())
+    if isinstance(obj, (list, tuple)):
+        return (obj.__class__.__name__, tuple([ _fingerprint_data(x, memo) for x in obj ]))
+    if isinstance(obj, (set, frozenset)):
+        return (obj.__class__.__name__,
+                tuple(sorted([ repr(_fingerprint_data(x, memo)) for x in obj ])))
+    if isinstance(obj, dict):
+        return ('dict', tuple(sorted([
+            (repr(_fingerprint_data(k, memo)), _fingerprint_data(v, memo))
+            for (k, v) in obj.items()
+        ], key=lambda kv: kv[0])))
+    if isinstance(obj, type):
+        return ('class', obj.__module__, getattr(obj, '__qualname__', obj.__name__))
+    if isinstance(obj, types.FunctionType):
+        cells = []
+        for cell in (obj.__closure__ or ()):
+            try:
+                cells.append(_fingerprint_data(cell.cell_contents, memo))
+            except ValueError: # empty cell
+                cells.append('<empty cell>')
+        return ('function', obj.__module__, getattr(obj, '__qualname__', obj.__name__),
+                _fingerprint_data(obj.__code__, memo),
+                _fingerprint_data(obj.__defaults__, memo),
+                tuple(cells))
+    if isinstance(obj, types.CodeType):
+        return ('code', obj.co_code, obj.co_names,
+                tuple([ _fingerprint_data(c, memo) for c in obj.co_consts ]))
+    if isinstance(obj, types.MethodType):
+        return ('method', _fingerprint_data(obj.__func__, memo),
+                _fingerprint_data(obj.__self__, memo))
+    if isinstance(obj, types.BuiltinFunctionType):
+        return ('builtin', getattr(obj, '__module__', None), obj.__name__)
+    if isinstance(obj, functools.partial):
+        return ('partial', _fingerprint_data(obj.func, memo),
+                _fingerprint_data(obj.args, memo), _fingerprint_data(obj.keywords, memo))
+
+    # generic object -- describe its class and its public attributes
+    attrs = dict( (k, v) for (k, v) in getattr(obj, '__dict__', {}).items()
+                  if not k.startswith('_') )
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        if isinstance(slots, _basestring):
+            slots = (slots,)
+        for name in slots:
+            if not name.startswith('_') and hasattr(obj, name):
+                attrs[name] = getattr(obj, name)
+    return ('object', _fingerprint_data(type(obj), memo),
+            _fingerprint_data(attrs, memo))
+
 
 
 class LatexContextDb(object):
@@ -66,6 +154,22 @@ class LatexContextDb(object):
     Instead of being tempted to modify the object, create a new one with
     :py:meth:`filter_context()`.
 
+    Some instances are frozen (see :py:meth:`freeze()`), in which case any
+    attempt to modify them with :py:meth:`add_context_category()` or the
+    `set_unknown_*()` methods raises a `TypeError`.  This is the case for the
+    shared default latex contexts that are used by
+    :py:class:`~pylatexenc.latexwalker.LatexWalker` and
+    :py:class:`~pylatexenc.latex2text.LatexNodes2Text` when no latex context
+    is specified (unless the flag `shared_default_context=False` is given to
+    them).  You can always get a modifiable copy of a frozen instance with
+    :py:meth:`filter_context()`.
+
+    Lookups are performed using lookup tables that merge all categories and
+    that are computed the first time they are needed.  These tables are
+    recomputed after calls to :py:meth:`add_context_category()` or to the
+    `set_unknown_*()` methods, but not if you modify the internal attributes
+    of this object directly.
+
     See :py:func:`pylatexenc.latexwalker.get_default_latex_context_db()` for the
     default latex context for `latexwalker` with a default collection of known
     latex macros and environments.
@@ -83,6 +187,16 @@ class LatexContextDb(object):
         self.unknown_environment_spec = None
         self.unknown_specials_spec = None
 
+        # cache for lookup tables and other objects that are derived from the
+        # specs stored in this database (see _get_cached())
+        self._lookup_cache = {}
+
+        self._frozen = False
+
+        # if set, this instance is the shared instance created by this function
+        # (see _get_shared_latex_context_db()), and it is pickled by reference
+        self._shared_instance_factory = None
+
         
     def add_context_category(self, category, macros=[], environments=[], specials=[],
                              prepend=False, insert_before=None, insert_after=None):
@@ -114,7 +228,9 @@ class LatexContextDb(object):
         You may only specify one of `prepend=True`, `insert_before='...'` or
         `insert_after='...'`.
         """
-        
+
+        self._check_not_frozen()
+
         if category in self.category_list:
             raise ValueError("Category {} is already registered in the context database"
                              .format(category))
@@ -146,27 +262,225 @@ class LatexContextDb(object):
             'environments': dict( (e.environmentname, e) for e in environments ),
             'specials': dict( (s.specials_chars, s) for s in specials ),
         }
+
+        self._lookup_cache.clear()
         
     def set_unknown_macro_spec(self, macrospec):
         r"""
         Set the macro spec to use when encountering a macro that is not in the
         database.
         """
+        self._check_not_frozen()
         self.unknown_macro_spec = macrospec
+        self._lookup_cache.clear()
 
     def set_unknown_environment_spec(self, environmentspec):
         r"""
         Set the environment spec to use when encountering a LaTeX environment that
         is not in the database.
         """
+        self._check_not_frozen()
         self.unknown_environment_spec = environmentspec
+        self._lookup_cache.clear()
 
     def set_unknown_specials_spec(self, specialsspec):
         r"""
         Set the latex specials spec to use when encountering a LaTeX environment
         that is not in the database.
         """
+        self._check_not_frozen()
         self.unknown_specials_spec = specialsspec
+        self._lookup_cache.clear()
+
+    def freeze(self):
+        r"""
+        Return a frozen copy of this latex context database.
+
+        The returned object is an instance of the same class as the current
+        object (e.g., a subclass of :py:class:`LatexContextDb` that overrides
+        some lookup methods) with the same categories and specifications.  It cannot be
+        modified (:py:meth:`add_context_category()` and the `set_unknown_*()`
+        methods raise a `TypeError`) and all its lookup tables are computed
+        immediately.  It can be used anywhere a latex context is expected,
+        e.g., as the `latex_context=` argument of
+        :py:class:`pylatexenc.latexwalker.LatexWalker` or
+        :py:class:`pylatexenc.latex2text.LatexNodes2Text`.
+
+        A frozen instance is suitable to be shared between worker processes.
+        It can be pickled (provided that the individual specification objects
+        can be pickled); the pickled data does not include the lookup tables,
+        which are recomputed when the object is loaded.  The shared default
+        latex contexts are pickled by reference, so that unpickling them in
+        another process simply returns that process' own shared default
+        instance.  When worker processes are forked after the frozen context is
+        created, no lookup tables remain to be computed lazily in the workers;
+        to further avoid that the garbage collector touches the memory pages of
+        objects created in the parent process, you may call `gc.freeze()`
+        (Python 3.7+) before forking.
+
+        If the current object is already frozen, it is returned directly.
+
+        .. versionadded:: 2.11
+
+           The `freeze()` method was introduced in `pylatexenc 2.11`.
+        """
+        if self._frozen:
+            return self
+        db = self.filter_context()
+        if type(self) is not LatexContextDb:
+            # preserve the subclass and any of its own attributes, so that
+            # overridden methods (e.g. get_macro_spec()) still apply
+            sub_db = type(self).__new__(type(self))
+            sub_db.__dict__.update(self.__dict__)
+            sub_db.__dict__.update(db.__dict__)
+            db = sub_db
+        db._set_frozen()
+        return db
+
+    def is_frozen(self):
+        r"""
+        Return `True` if this object is frozen, i.e., if it can no longer be
+        modified.  See :py:meth:`freeze()`.
+
+        .. versionadded:: 2.11
+
+           The `is_frozen()` method was introduced in `pylatexenc 2.11`.
+        """
+        return self._frozen
+
+    def __getstate__(self):
+        # The lookup cache is not pickled.  We also don't store the dictionary
+        # keys of the specs, which can be recovered from the specs themselves.
+        state = dict(self.__dict__)
+        del state['_lookup_cache']
+        state['d'] = [
+            (cat,
+             list(self.d[cat]['macros'].values()),
+             list(self.d[cat]['environments'].values()),
+             list(self.d[cat]['specials'].values()))
+            for cat in self.category_list
+        ]
+        return state
+
+    def __setstate__(self, state):
+        d = state.pop('d')
+        self._frozen = False
+        self._shared_instance_factory = None
+        self.__dict__.update(state)
+        self._lookup_cache = {}
+        if isinstance(d, dict):
+            # pickled by an earlier version of pylatexenc
+            self.d = d
+        else:
+            self.d = {}
+            for (cat, macros, environments, specials) in d:
+                self.d[cat] = {
+                    'macros': dict( (m.macroname, m) for m in macros ),
+                    'environments': dict( (e.environmentname, e) for e in environments ),
+                    'specials': dict( (s.specials_chars, s) for s in specials ),
+                }
+        if self._frozen:
+            self._set_frozen()
+
+    def __reduce_ex__(self, protocol):
+        if self._shared_instance_factory is not None:
+            return (_get_shared_latex_context_db, (self._shared_instance_factory,))
+        return super(LatexContextDb, self).__reduce_ex__(protocol)
+
+    def fingerprint(self):
+        r"""
+        Return a string which identifies the specifications stored in this
+        database.  Two databases have the same fingerprint if they have the
+        same categories with equivalent specifications, even in different
+        processes or Python sessions, and the fingerprint changes whenever the
+        database is modified with :py:meth:`add_context_category()` or the
+        `set_unknown_*()` methods.
+
+        The fingerprint is computed from the classes and public attributes of
+        the specification objects.  Functions (such as the `simplify_repl`
+        callables of :py:mod:`pylatexenc.latex2text` specs) are identified by
+        their name and their code.  The fingerprint is computed the first time
+        it is needed and stored along with the lookup tables.
+
+        The fingerprint is used, e.g., as part of the keys of a
+        :py:class:`pylatexenc.latexwalker.LatexParseCache`.
+
+        .. versionadded:: 2.11
+
+           The `fingerprint()` method was introduced in `pylatexenc 2.11`.
+        """
+        return self._get_cached('fingerprint', self._make_fingerprint)
+
+    def _make_fingerprint(self):
+        memo = {}
+        data = (
+            tuple([
+                (cat,
+                 _fingerprint_data(self.d[cat]['macros'], memo),
+                 _fingerprint_data(self.d[cat]['environments'], memo),
+                 _fingerprint_data(self.d[cat]['specials'], memo))
+                for cat in self.category_list
+            ]),
+            _fingerprint_data(self.unknown_macro_spec, memo),
+            _fingerprint_data(self.unknown_environment_spec, memo),
+            _fingerprint_data(self.unknown_specials_spec, memo),
+        )
+        return hashlib.sha1(repr(data).encode('utf-8')).hexdigest()
+
+    def _check_not_frozen(self):
+        if self._frozen:
+            raise TypeError(
+                "This LatexContextDb instance is frozen and cannot be modified.  (If "
+                "this is a shared default latex context, get your own modifiable "
+                "copy with get_default_latex_context_db() or filter_context(), or "
+                "specify shared_default_context=False when creating the object.)"
+            )
+
+    def _set_frozen(self):
+        r"""
+        (INTERNAL.)  Make this instance read-only and compute all its lookup
+        tables immediately.
+        """
+        self._get_lookup_table('macros')
+        self._get_lookup_table('environments')
+        self._get_lookup_table('specials')
+        self._get_cached('specials_by_first_char', self._make_specials_by_first_char)
+        self._frozen = True
+
+    def _get_cached(self, key, make_value):
+        r"""
+        (INTERNAL.)  Return the object stored in the internal lookup cache under
+        `key`.  If there is no such object, it is created by calling
+        `make_value()` and stored in the cache.
+
+        The cache is cleared whenever a category is added to the database or
+        when one of the unknown macro/environment/specials specs is set.  It
+        is used to store objects derived from the specifications in this
+        database, such as the compiled regular expressions used by the latex
+        walker's tokenizer.
+        """
+        try:
+            return self._lookup_cache[key]
+        except KeyError:
+            value = make_value()
+            self._lookup_cache[key] = value
+            return value
+
+    def _get_lookup_table(self, which):
+        # Return a single dictionary with all the specs of the kind `which`
+        # ('macros', 'environments' or 'specials'), where a spec defined in
+        # several categories is taken from the first category in which it
+        # appears.  The table is computed only once and stored in the lookup
+        # cache.
+        try:
+            return self._lookup_cache[which]
+        except KeyError:
+            pass
+        table = {}
+        for cat in reversed(self.category_list):
+            table.update(self.d[cat][which])
+        self._lookup_cache[which] = table
+        return table
 
     def categories(self):
         r"""
@@ -185,11 +499,7 @@ class LatexContextDb(object):
         set by :py:meth:`set_unknown_macro_spec()` or `None` if no such spec was
         set.
         """
-        for cat in self.category_list:
-            # search categories in the given order
-            if macroname in self.d[cat]['macros']:
-                return self.d[cat]['macros'][macroname]
-        return self.unknown_macro_spec
+        return self._get_lookup_table('macros').get(macroname, self.unknown_macro_spec)
     
     def get_environment_spec(self, environmentname):
         r"""
@@ -202,11 +512,7 @@ class LatexContextDb(object):
         :py:meth:`set_unknown_environment_spec()` or `None` if no such spec was
         set.
         """
-        for cat in self.category_list:
-            # search categories in the given order
-            if environmentname in self.d[cat]['environments']:
-                return self.d[cat]['environments'][environmentname]
-        return self.unknown_environment_spec
+        return self._get_lookup_table('environments').get(environmentname, self.unknown_environment_spec)
 
     def get_specials_spec(self, specials_chars):
         r"""
@@ -227,11 +533,7 @@ class LatexContextDb(object):
         :py:meth:`set_unknown_specials_spec()` or `None` if no such spec was
         set.
         """
-        for cat in self.category_list:
-            # search categories in the given order
-            if specials_chars in self.d[cat]['specials']:
-                return self.d[cat]['specials'][specials_chars]
-        return self.unknown_specials_spec
+        return self._get_lookup_table('specials').get(specials_chars, self.unknown_specials_spec)
 
     def test_for_specials(self, s, pos, parsing_state=None):
         r"""
@@ -243,17 +545,42 @@ class LatexContextDb(object):
 
         Returns a specials spec instance, or `None` if no specials are detected
         at the position `pos`.
+
+        .. versionchanged:: 2.11
+
+           Candidate specials are now looked up in an index by their first
+           character (which is built the first time this method is called), so
+           that the cost of this test no longer grows with the number of known
+           specials.
         """
-        best_match_len = 0
-        best_match_s = None
+        candidates = self._get_cached('specials_by_first_char',
+                                      self._make_specials_by_first_char)
+        # s[pos:pos+1] is '' instead of an IndexError past the end of the string
+        candidates = candidates.get(s[pos:pos+1])
+        if candidates is None:
+            return None
+        # candidates are sorted by decreasing length, so the first match is the
+        # longest one
+        for specials_chars, spec in candidates:
+            if s.startswith(specials_chars, pos):
+                return spec
+        return None
+
+    def _make_specials_by_first_char(self):
+        # Index the specials by their first character.  For specials sequences
+        # that appear in several categories, the first category in which they
+        # appear wins, as for get_specials_spec().
+        specials_by_chars = {}
         for cat in self.category_list:
-            # search categories in the given order
-            for specials_chars in self.d[cat]['specials'].keys():
-                if len(specials_chars) > best_match_len and s.startswith(specials_chars, pos):
-                    best_match_s = self.d[cat]['specials'][specials_chars]
-                    best_match_len = len(specials_chars)
-
-        return best_match_s # this is None if no match
+            for specials_chars, spec in self.d[cat]['specials'].items():
+                if specials_chars and specials_chars not in specials_by_chars:
+                    specials_by_chars[specials_chars] = spec
+        index = {}
+        for specials_chars, spec in specials_by_chars.items():
+            index.setdefault(specials_chars[0], []).append( (specials_chars, spec) )
+        for candidates in index.values():
+            candidates.sort(key=lambda x: -len(x[0]))
+        return index
 
     def iter_macro_specs(self, categories=None):
         r"""
@@ -388,3 +715,22 @@ class LatexContextDb(object):
         return new_context
 
 
+
+_shared_latex_context_dbs = {}
+
+def _get_shared_latex_context_db(make_latex_context_db):
+    r"""
+    (INTERNAL.)  Return a frozen instance of the latex context returned by
+    `make_latex_context_db()` (e.g., a `get_default_latex_context_db()`
+    function).  The instance is created the first time this function is called
+    with the given function and is shared by all callers in the current process.
+    The instance is pickled by reference, so that unpickling it in another
+    process returns that process' own shared instance.
+    """
+    db = _shared_latex_context_dbs.get(make_latex_context_db)
+    if db is None:
+        db = make_latex_context_db()
+        db._set_frozen()
+        db._shared_instance_factory = make_latex_context_db
+        _shared_latex_context_dbs[make_latex_context_db] = db
+    return db
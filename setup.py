@@ -64,7 +64,7 @@ setup(
     ],
 
     # files
-    packages = find_packages(),
+    packages = find_packages(exclude=['benchmarks', 'benchmarks.*']),
     entry_points = {
         'console_scripts': [
             'latexwalker=pylatexenc.latexwalker.__main__:main',
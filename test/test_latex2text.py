@@ -13,7 +13,7 @@ import unicodedata
 import datetime
 import logging
 
-from pylatexenc.latexwalker import LatexWalker
+from pylatexenc.latexwalker import LatexWalker, LatexParseCache
 from pylatexenc.latex2text import LatexNodes2Text
 
 
@@ -692,6 +692,92 @@ The Title
             '-𝔄𝔅ℭ𝔇𝔈𝔉𝔊ℌℑ𝔍𝔎𝔏𝔐𝔑𝔒𝔓𝔔ℜ𝔖𝔗𝔘𝔙𝔚𝔛𝔜ℨ 𝔞𝔟𝔠𝔡𝔢𝔣𝔤𝔥𝔦𝔧𝔨𝔩𝔪𝔫𝔬𝔭𝔮𝔯𝔰𝔱𝔲𝔳𝔴𝔵𝔶𝔷-'
         )
 
+    def test_shared_default_latex_context(self):
+        from pylatexenc import latex2text
+        db = LatexNodes2Text().latex_context
+        self.assertIs(LatexNodes2Text(math_mode='verbatim').latex_context, db)
+        with self.assertRaises(TypeError):
+            db.add_context_category('my-category', macros=[])
+        my_db = latex2text.get_default_latex_context_db()
+        my_db.add_context_category('my-category', prepend=True, macros=[
+            latex2text.MacroTextSpec('textbf', simplify_repl='**%s**')
+        ])
+        self.assertEqual(LatexNodes2Text(latex_context=my_db).latex_to_text(r'\textbf{x}'),
+                         '**x**')
+        self.assertEqual(LatexNodes2Text().latex_to_text(r'\textbf{x}'), 'x')
+        # or with shared_default_context=False
+        l2t = LatexNodes2Text(shared_default_context=False)
+        self.assertIsNot(l2t.latex_context, db)
+        l2t.latex_context.add_context_category('my-category', prepend=True, macros=[
+            latex2text.MacroTextSpec('textbf', simplify_repl='**%s**')
+        ])
+        self.assertEqual(l2t.latex_to_text(r'\textbf{x}'), '**x**')
+        self.assertEqual(LatexNodes2Text().latex_to_text(r'\textbf{x}'), 'x')
+
+    def test_parse_cache(self):
+        from pylatexenc import latex2text
+        cache = LatexParseCache()
+        latex = r'\textbf{x} $y$ % z'
+        self.assertEqual(LatexNodes2Text(parse_cache=cache).latex_to_text(latex), 'x y ')
+        self.assertEqual(LatexNodes2Text(parse_cache=cache).latex_to_text(latex), 'x y ')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # different flags or latex contexts are cached separately
+        self.assertEqual(LatexNodes2Text(parse_cache=cache, math_mode='verbatim',
+                                         keep_comments=True).latex_to_text(latex),
+                         'x $y$ % z')
+        my_db = latex2text.get_default_latex_context_db()
+        l2t = LatexNodes2Text(latex_context=my_db, parse_cache=cache)
+        self.assertEqual(l2t.latex_to_text(latex), 'x y ') # same specs -> hit
+        my_db.add_context_category('my-category', prepend=True, macros=[
+            latex2text.MacroTextSpec('textbf', simplify_repl='**%s**')
+        ])
+        self.assertEqual(l2t.latex_to_text(latex), '**x** y ')
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_latex_to_text_many(self):
+        from pylatexenc import latex2text
+        latex_strings = [ r'\textbf{%d} $x_%d$ %% c'%(i, i) for i in range(50) ]
+        expected = [ LatexNodes2Text(math_mode='verbatim').latex_to_text(x)
+                     for x in latex_strings ]
+        self.assertEqual(
+            list(latex2text.latex_to_text_many(iter(latex_strings), math_mode='verbatim')),
+            expected
+        )
+        self.assertEqual(
+            list(latex2text.latex_to_text_many(latex_strings, jobs=2, chunksize=7,
+                                               math_mode='verbatim')),
+            expected
+        )
+        self.assertEqual(
+            list(latex2text.latex_to_text_many([r'a\textbf{', 'b'],
+                                               parse_flags={'tolerant_parsing': True})),
+            ['a', 'b']
+        )
+
+
+
+    def test_stats(self):
+        from pylatexenc import latex2text
+        latex = r"\section{Intro} \'e \begin{pmatrix} a \end{pmatrix} \textbf{y}"
+        stats = latex2text.PerformanceStats()
+        l2t = LatexNodes2Text(stats=stats)
+        self.assertEqual(l2t.latex_to_text(latex), LatexNodes2Text().latex_to_text(latex))
+        self.assertEqual(stats.simplify_repl_calls,
+                         { r'\section': 1, r"\'": 1, r'\begin{pmatrix}': 1 })
+        self.assertEqual(set(stats.simplify_repl_time), set(stats.simplify_repl_calls))
+        # the stats object was also given to the LatexWalker
+        self.assertEqual(stats.nodes['LatexMacroNode'], 3)
+        self.assertEqual(stats.args_calls[r'\textbf'], 1)
+        # ... and can be used together with a parse cache
+        cache = LatexParseCache()
+        l2t = LatexNodes2Text(stats=stats, parse_cache=cache)
+        self.assertEqual(l2t.latex_to_text(r'\section{x}'), '\n\n§ X\n')
+        self.assertEqual(l2t.latex_to_text(r'\section{x}'), '\n\n§ X\n')
+        self.assertEqual(cache.hits, 1)
+        # (the second result came from the cache)
+        self.assertEqual(stats.simplify_repl_calls[r'\section'], 2)
+
+
 
     #
     # test utilities
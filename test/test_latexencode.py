@@ -231,6 +231,21 @@ class TestLatexEncode(unittest.TestCase, ProvideAssertCmds):
             ['A', ' ', r'\'e', ' ', r'\textrightarrow', ' ', r'\ensuremath{\alpha}']
         )
 
+    def test_stats(self):
+        stats = latexencode.PerformanceStats()
+        u = UnicodeToLatexEncoder(
+            conversion_rules=[
+                latexencode.UnicodeToLatexConversionRule(
+                    latexencode.RULE_DICT, { ord('α'): r'\alpha' }
+                ),
+                'defaults',
+            ],
+            stats=stats
+        )
+        self.assertEqual(u.unicode_to_latex('α é α $'), r'{\alpha} \'e {\alpha} \$')
+        self.assertEqual(stats.encoder_rule_hits, { '0:dict': 2, '1:defaults': 2 })
+        self.assertIn('1:defaults', stats.format_report())
+
 
 class TestPartialLatexEncode(unittest.TestCase, ProvideAssertCmds):
 
@@ -4,15 +4,34 @@ from __future__ import print_function # no unicode_literals, test with native st
 import unittest
 import sys
 import logging
+import pickle
+import random
+import json
+import io
+import tempfile
+import shutil
+import os
+import stat
+import weakref
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 if sys.version_info.major > 2:
     def unicode(string): return string
     basestring = str
 
 from pylatexenc.latexwalker import (
-    LatexWalker, LatexToken, LatexCharsNode, LatexGroupNode, LatexCommentNode,
+    LatexWalker, LatexToken, LatexNode, LatexCharsNode, LatexGroupNode, LatexCommentNode,
     LatexMacroNode, LatexSpecialsNode, LatexEnvironmentNode, LatexMathNode,
-    LatexWalkerParseError, get_default_latex_context_db
+    LatexWalkerParseError, LatexWalkerParseDiagnostic, ParsingCursor, LatexStreamWalker,
+    LatexNodeTable, LatexParseCache, PerformanceStats, LatexEvent, ParsingState,
+    get_default_latex_context_db, get_latex_nodes_many, make_json_encoder
 )
 
 from pylatexenc import macrospec
@@ -1145,6 +1164,24 @@ not cause processing problems.
             )
         )
 
+    def test_verbatim_unterminated(self):
+
+        latextext = r"""A \begin{verbatim}x\end{verbatim} B \begin{verbatim} y \verb+z"""
+        k = latextext.index(r'\begin{verbatim} y')
+
+        lw = LatexWalker(latextext, tolerant_parsing=False)
+
+        # a missing \end{verbatim} or \verb delimiter is reported each time
+        for _ in range(2):
+            with self.assertRaises(LatexWalkerParseError):
+                lw.get_latex_nodes(pos=k)
+            with self.assertRaises(LatexWalkerParseError):
+                lw.get_latex_nodes(pos=latextext.index(r'\verb'))
+
+        # ... without affecting the verbatim constructs before that position
+        (nodelist, pos, len_) = lw.get_latex_nodes(pos=0, read_max_nodes=2)
+        self.assertEqual(nodelist[1].nodeargd.verbatim_text, 'x')
+
     def test_lstlisting_handling(self):
 
         s = r"""Use lstlisting environment for code
@@ -1267,6 +1304,56 @@ int foo() {
 
 
 
+    def test_parsing_state_sub_context_cached(self):
+        lw = LatexWalker(r"$a$ and $b$, \[ c \] and \( d \)")
+
+        # the public methods return new objects, which can be modified
+        ps = lw.make_parsing_state()
+        self.assertIsNot(lw.make_parsing_state(), ps)
+        self.assertIsNot(ps.sub_context(in_math_mode=True), ps.sub_context(in_math_mode=True))
+        ps.latex_context = None
+        self.assertIsNotNone(lw.make_parsing_state().latex_context)
+        self.assertIsNotNone(lw._make_parsing_state().latex_context)
+
+        # the parser's internal sub-contexts are cached
+        ps = lw._make_parsing_state()
+        self.assertIs(lw._make_parsing_state(), ps)
+        psmath = ps._sub_context(in_math_mode=True, math_mode_delimiter='$')
+        self.assertTrue(psmath.in_math_mode)
+        self.assertIs(ps._sub_context(math_mode_delimiter='$', in_math_mode=True), psmath)
+        self.assertIsNot(ps._sub_context(in_math_mode=True, math_mode_delimiter=r'\('),
+                         psmath)
+        self.assertIsNot(ps._sub_context(in_math_mode=1), ps._sub_context(in_math_mode=True))
+        # unhashable field values can be used, too
+        psx = ps._sub_context(math_mode_delimiter=['x'])
+        self.assertEqual(psx.math_mode_delimiter, None) # sanitized
+        self.assertIsNot(ps._sub_context(math_mode_delimiter=['x']), psx)
+        # the nodes share identical parsing states
+        nodelist = lw.get_latex_nodes()[0]
+        self.assertIs(nodelist[0].nodelist[0].parsing_state,
+                      nodelist[2].nodelist[0].parsing_state)
+        self.assertIs(nodelist[0].parsing_state, nodelist[2].parsing_state)
+        self.assertEqual(lw.get_latex_nodes()[0], nodelist)
+        ps2 = pickle.loads(pickle.dumps(psmath))
+        self.assertEqual(ps2.get_fields(), psmath.get_fields())
+        self.assertIs(ps2._sub_context(), ps2._sub_context())
+
+        # overridden sub_context() and make_parsing_state() are honored
+        class MyParsingState(ParsingState):
+            def sub_context(self, **kwargs):
+                p = super(MyParsingState, self).sub_context(**kwargs)
+                p.mine = True
+                return p
+        class MyLatexWalker(LatexWalker):
+            def make_parsing_state(self, **kwargs):
+                return MyParsingState(**dict(
+                    self.default_parsing_state.get_fields(), **kwargs
+                ))
+        lw = MyLatexWalker(r"$a$")
+        nodelist = lw.get_latex_nodes()[0]
+        self.assertIsInstance(nodelist[0].parsing_state, MyParsingState)
+        self.assertTrue(nodelist[0].nodelist[0].parsing_state.mine)
+
     def test_parsing_state_changes(self):
 
         class MySimpleNewcommandArgsParser(macrospec.MacroStandardArgsParser):
@@ -1645,6 +1732,1073 @@ Use macros: """,
         self.assertTrue(node.nodeargd)
         self.assertEqual(len(node.nodeargd.argnlist), 3)
 
+    def test_get_token_chars_run(self):
+        latextext = r'''Some text, here.   \macro  more  text~and $x$'''
+        lw = LatexWalker(latextext)
+        self.assertEqual(lw.get_token(pos=0, chars_run=True),
+                         LatexToken(tok='char', arg='Some text, here.', pos=0, len=16,
+                                    pre_space=''))
+        # trailing whitespace goes to the next token's pre_space
+        self.assertEqual(lw.get_token(pos=16, chars_run=True),
+                         LatexToken(tok='macro', arg='macro', pos=19, len=8,
+                                    pre_space='   ', post_space='  '))
+        # leading whitespace is part of the run; the run stops at specials
+        self.assertEqual(lw.get_token(pos=25, chars_run=True),
+                         LatexToken(tok='char', arg='  more  text', pos=25, len=12,
+                                    pre_space=''))
+        p = latextext.find('~')
+        self.assertEqual(lw.get_token(pos=p, chars_run=True).tok, 'specials')
+        p = latextext.find('and')
+        self.assertEqual(lw.get_token(pos=p, chars_run=True),
+                         LatexToken(tok='char', arg='and', pos=p, len=3, pre_space=''))
+        # extra brace chars stop the run
+        self.assertEqual(lw.get_token(pos=5, chars_run=True,
+                                      include_brace_chars=[('(', ',')]),
+                         LatexToken(tok='char', arg='text', pos=5, len=4, pre_space=''))
+
+    def test_get_token_positions(self):
+        latextext = u'\\b\u00e9ta\u00e7  \n \n\nX \\begin \t{my env*}%c\n  \n\\end\n{a}'
+        lw = LatexWalker(latextext)
+        self.assertEqual(lw.get_token(pos=0),
+                         LatexToken(tok='macro', arg=u'b\u00e9ta\u00e7', pos=0, len=10,
+                                    pre_space='', post_space='  \n '))
+        self.assertEqual(lw.get_token(pos=10),
+                         LatexToken(tok='char', arg='\n\n', pos=10, len=2, pre_space=''))
+        self.assertEqual(lw.get_token(pos=6),
+                         LatexToken(tok='char', arg='\n\n', pos=10, len=2, pre_space='  \n '))
+        p = latextext.find('\\begin')
+        self.assertEqual(lw.get_token(pos=p-1),
+                         LatexToken(tok='begin_environment', arg='my env*', pos=p, len=17,
+                                    pre_space=' '))
+        self.assertEqual(lw.get_token(pos=p+17),
+                         LatexToken(tok='comment', arg='c', pos=p+17, len=6,
+                                    pre_space='', post_space='\n  \n'))
+        p = latextext.find('\\end')
+        self.assertEqual(lw.get_token(pos=p),
+                         LatexToken(tok='end_environment', arg='a', pos=p, len=8,
+                                    pre_space=''))
+
+    def test_get_token_lookahead_cache(self):
+        latextext = r'''\macro [x] \begin{a}b'''
+        lw = LatexWalker(latextext)
+        # peeking for an optional argument and then reading the token again
+        # with other braces reuses the token
+        tok = lw.get_token(pos=6, include_brace_chars=[('[', ']')], environments=False)
+        self.assertEqual(tok, LatexToken(tok='brace_open', arg='[', pos=7, len=1,
+                                         pre_space=' '))
+        self.assertIs(lw.get_token(pos=6, include_brace_chars=[('[', ']')]), tok)
+        self.assertIs(lw.get_token(pos=0, include_brace_chars=[('[', ']')]),
+                      lw.get_token(pos=0))
+        self.assertEqual(lw.get_token(pos=6),
+                         LatexToken(tok='char', arg='[', pos=7, len=1, pre_space=' '))
+        p = latextext.find(r'\begin')
+        self.assertEqual(lw.get_token(pos=p, environments=False),
+                         LatexToken(tok='macro', arg='begin', pos=p, len=6,
+                                    pre_space='', post_space=''))
+        self.assertEqual(lw.get_token(pos=p),
+                         LatexToken(tok='begin_environment', arg='a', pos=p, len=9,
+                                    pre_space=''))
+        self.assertEqual(lw.get_token(pos=0, chars_run=True).tok, 'macro')
+        self.assertEqual(lw.get_token(pos=p+9),
+                         LatexToken(tok='char', arg='b', pos=p+9, len=1, pre_space=''))
+        # modifying the latex context invalidates cached tokens
+        latex_context = macrospec.LatexContextDb()
+        latex_context.set_unknown_macro_spec(macrospec.MacroSpec(''))
+        ps = lw.make_parsing_state(latex_context=latex_context)
+        self.assertEqual(lw.get_token(pos=p+9, parsing_state=ps).tok, 'char')
+        latex_context.add_context_category(
+            'mycategory', specials=[ macrospec.SpecialsSpec('b') ]
+        )
+        self.assertEqual(lw.get_token(pos=p+9, parsing_state=ps).tok, 'specials')
+
+    def test_get_token_cache_same_nodes(self):
+        # reusing cached tokens doesn't change the nodes or the reported errors
+        from pylatexenc.latexwalker import _walker as latexwalker_walker
+
+        def parse(latextext, iterative_parsing):
+            diagnostics = []
+            lw = LatexWalker(latextext, tolerant_parsing=True, diagnostics=diagnostics,
+                             iterative_parsing=iterative_parsing)
+            nodes = _node_struct(lw.get_latex_nodes()[0])
+            return (nodes, [ (d.msg, d.pos) for d in diagnostics ])
+
+        pieces = [ r'\section', r'\textbf', r'\begin', r'\end', r'\item', r'\\', '*',
+                   ' x ', '{', '}', '[', ']', '$', '%c\n', r'{a}', r'\begin{x}', r'\end{x}' ]
+        rng = random.Random(1)
+        latextexts = [
+            r'\section\end x',
+            r'\section\begin x',
+            r'\section*\end{x} \textbf\begin y \item[\end] z',
+            get_test_latex_data_with_possible_inconsistencies(),
+        ] + [
+            ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 12)))
+            for _ in range(300)
+        ]
+
+        results = [ (parse(latextext, True), parse(latextext, False))
+                    for latextext in latextexts ]
+        reuse_cached_token = latexwalker_walker._reuse_cached_token
+        latexwalker_walker._reuse_cached_token = lambda *args: None
+        try:
+            expected = [ (parse(latextext, True), parse(latextext, False))
+                         for latextext in latextexts ]
+        finally:
+            latexwalker_walker._reuse_cached_token = reuse_cached_token
+        for (latextext, r, e) in zip(latextexts, results, expected):
+            self.assertEqual(r, e, latextext)
+
+        # \section has an empty argument, the malformed \end is read as chars
+        nodes = LatexWalker(r'\section\end x', tolerant_parsing=True).get_latex_nodes()[0]
+        self.assertEqual([ (n.pos, n.len) for n in nodes ], [ (0, 8), (8, 6) ])
+        self.assertEqual(nodes[0].nodeargd.argnlist[-1].chars, '')
+        self.assertEqual(nodes[1].chars, r'\end x')
+
+    def test_tokenize_chars_runs_same_nodes(self):
+        for latextext in [
+                get_test_latex_data_with_possible_inconsistencies(),
+                r'''Hello, \textbf{world}.  Some \emph{more}   text''' + '\n\n\n  '
+                + r'''para -- graph ``quoted'' text---with~specials!`  \\''',
+                r'''\begin{verbatim}a $b$ c\end{verbatim} x \verb+y % z+ w % comment
+  \item[opt] text \(a < b\) and $$ c $$ [not optional]''',
+                r'''Trailing spaces before EOF   ''',
+                'Trailing backslash \\',
+        ]:
+            for tolerant_parsing in (True, False):
+                lw = LatexWalker(latextext, tolerant_parsing=tolerant_parsing)
+                lw_ref = LatexWalker(latextext, tolerant_parsing=tolerant_parsing,
+                                     tokenize_chars_runs=False)
+                try:
+                    nodes_ref = lw_ref.get_latex_nodes()
+                except LatexWalkerParseError as e:
+                    with self.assertRaises(LatexWalkerParseError) as cm:
+                        lw.get_latex_nodes()
+                    self.assertEqual(str(cm.exception), str(e))
+                    continue
+                self.assertEqual(_node_struct(lw.get_latex_nodes()),
+                                 _node_struct(nodes_ref))
+
+    def test_tokenize_chars_runs_custom_specials(self):
+        latex_context = get_default_latex_context_db()
+        latex_context.add_context_category(
+            'my-specials',
+            specials=[ macrospec.SpecialsSpec('xy'), macrospec.SpecialsSpec('!!') ],
+        )
+        latextext = r'''Text with xy and x and !!-specials'''
+        lw = LatexWalker(latextext, latex_context=latex_context)
+        lw_ref = LatexWalker(latextext, latex_context=latex_context,
+                             tokenize_chars_runs=False)
+        nodes = lw.get_latex_nodes()
+        self.assertEqual(_node_struct(nodes), _node_struct(lw_ref.get_latex_nodes()))
+        self.assertEqual([n.specials_chars for n in nodes[0]
+                          if n.isNodeType(LatexSpecialsNode)],
+                         ['xy', '!!'])
+
+
+    def test_iterative_parsing_same_nodes(self):
+        latex_context = get_default_latex_context_db()
+        latex_context.add_context_category(
+            'my-stuff',
+            macros=[ macrospec.MacroSpec('mathargs', macrospec.MacroStandardArgsParser(
+                '{[{', args_math_mode=[True, False, None])) ],
+            environments=[ macrospec.EnvironmentSpec('myenv', '[{*') ],
+            specials=[ macrospec.SpecialsSpec('!!', macrospec.MacroStandardArgsParser('{')) ],
+        )
+        for latextext in [
+                get_test_latex_data_with_possible_inconsistencies(),
+                r'''\mathargs{x^2}[\alpha]{y} \begin{myenv}[a]{b}*c\end{myenv}
+!!{x} $a \frac{b}{\sqrt[3]{c %comment
+}}$ \[ \begin{array}{cc} a & b \end{array} \]
+\begin{itemize}[label={[x]}] \item[a] \verb+\x+ \end{itemize}''',
+                r'''Unclosed {group \textbf{bold''',
+                r'''\begin{itemize} $x\end{itemize}$ \end{enumerate}''',
+                r'''\frac{a}''',
+                r'''\textbf{a} \(b\] c} \end{x}''',
+                r'''\begin{equation}\frac{\end{equation}''',
+                r'''\newcommand{\x}[2]{''' + '\\',
+                r'''\section[a \section[ \frac{b \section[ c''',
+                r'''x \frac{a}{\mathargs{b}[ \textbf ]{c \frac{d} e''',
+        ]:
+            for kwargs in [ dict(tolerant_parsing=True),
+                            dict(tolerant_parsing=False),
+                            dict(tolerant_parsing=False, strict_braces=True) ]:
+                lw = LatexWalker(latextext, latex_context=latex_context, **kwargs)
+                lw_ref = LatexWalker(latextext, latex_context=latex_context,
+                                     iterative_parsing=False, **kwargs)
+                try:
+                    nodes_ref = lw_ref.get_latex_nodes()
+                except LatexWalkerParseError as e:
+                    with self.assertRaises(LatexWalkerParseError) as cm:
+                        lw.get_latex_nodes()
+                    self.assertEqual(str(cm.exception), str(e))
+                    self.assertEqual(cm.exception.open_contexts, e.open_contexts)
+                    continue
+                self.assertEqual(_node_struct(lw.get_latex_nodes()),
+                                 _node_struct(nodes_ref))
+                self.assertEqual(_node_struct(lw.get_latex_nodes(read_max_nodes=3)),
+                                 _node_struct(lw_ref.get_latex_nodes(read_max_nodes=3)))
+
+    def test_iterative_parsing_deep_nesting(self):
+        n = 5 * sys.getrecursionlimit()
+
+        def get_depth(nodelist):
+            depth = 0
+            while not nodelist[-1].isNodeType(LatexCharsNode):
+                node = nodelist[-1]
+                if node.isNodeType(LatexMacroNode):
+                    nodelist = node.nodeargd.argnlist
+                else:
+                    nodelist = node.nodelist
+                depth += 1
+            return depth
+
+        for latextext, depth in [
+                ('{'*n + 'x' + '}'*n, n),
+                (r'\textbf{'*n + 'x' + '}'*n, 2*n),
+                (r'\begin{center}'*n + 'x' + r'\end{center}'*n, n),
+                ('$x^{'*n + 'y' + '}$'*n, 2*n),
+        ]:
+            lw = LatexWalker(latextext, tolerant_parsing=False)
+            nodelist, pos, len_ = lw.get_latex_nodes()
+            self.assertEqual((pos, len_), (0, len(latextext)))
+            self.assertEqual(get_depth(nodelist), depth)
+
+    def test_iterative_parsing_overridden_methods(self):
+        class MyLatexWalker(LatexWalker):
+            def __init__(self, *args, **kwargs):
+                super(MyLatexWalker, self).__init__(*args, **kwargs)
+                self.braced_groups = []
+            def get_latex_braced_group(self, pos, brace_type='{', parsing_state=None):
+                (node, npos, nlen) = \
+                    super(MyLatexWalker, self).get_latex_braced_group(pos, brace_type,
+                                                                      parsing_state)
+                self.braced_groups.append(node)
+                return (node, npos, nlen)
+
+        lw = MyLatexWalker(r'\textbf{a} {b}')
+        nodelist, _, _ = lw.get_latex_nodes()
+        self.assertEqual(len(lw.braced_groups), 2)
+        self.assertIs(lw.braced_groups[0], nodelist[0].nodeargd.argnlist[0])
+        self.assertIs(lw.braced_groups[1], nodelist[2])
+
+    def test_iter_latex_nodes(self):
+        latextext = get_test_latex_data_with_possible_inconsistencies()
+        for iterative_parsing in (True, False):
+            lw = LatexWalker(latextext, iterative_parsing=iterative_parsing)
+            nodelist, _, _ = lw.get_latex_nodes()
+            self.assertEqual(_node_struct(list(lw.iter_latex_nodes())),
+                             _node_struct(nodelist))
+
+            pairs = list(lw.iter_latex_nodes(with_cursors=True))
+            self.assertEqual(_node_struct([node for node, cursor in pairs]),
+                             _node_struct(nodelist))
+            self.assertEqual(pairs[-1][1].pos, len(latextext))
+            for k in (0, 3, len(pairs)//2, len(pairs)-1):
+                node, cursor = pairs[k]
+                self.assertEqual(cursor.pos, node.pos + node.len)
+                # resume with a new walker from a checkpointed cursor
+                cursor = pickle.loads(pickle.dumps(cursor))
+                lw2 = LatexWalker(latextext, iterative_parsing=iterative_parsing)
+                self.assertEqual(_node_struct(list(lw2.iter_latex_nodes(cursor=cursor))),
+                                 _node_struct(nodelist[k+1:]))
+
+    def test_iter_latex_nodes_parsing_state_changes(self):
+        class MathOnArgsParser(macrospec.MacroStandardArgsParser):
+            def parse_args(self, w, pos, parsing_state=None):
+                (argd, apos, alen) = super(MathOnArgsParser, self).parse_args(
+                    w, pos, parsing_state=parsing_state
+                )
+                return (argd, apos, alen, {
+                    'new_parsing_state': parsing_state.sub_context(in_math_mode=True)
+                })
+
+        latex_context = get_default_latex_context_db()
+        latex_context.add_context_category('my-stuff', prepend=True, macros=[
+            macrospec.MacroSpec('mathon', MathOnArgsParser()),
+        ])
+        latextext = r'''text \mathon x^2 {y}'''
+        lw = LatexWalker(latextext, latex_context=latex_context)
+        pairs = list(lw.iter_latex_nodes(with_cursors=True))
+        self.assertEqual([ (n.nodeType().__name__, n.parsing_state.in_math_mode)
+                           for n, c in pairs ],
+                         [ ('LatexCharsNode', False), ('LatexMacroNode', False),
+                           ('LatexCharsNode', True), ('LatexGroupNode', True) ])
+        self.assertEqual([ c.parsing_state.in_math_mode for n, c in pairs ],
+                         [ False, True, True, True ])
+        cursor = pairs[1][1]
+        self.assertEqual(cursor, ParsingCursor(pos=13, parsing_state=pairs[2][0].parsing_state))
+        nodes = list(lw.iter_latex_nodes(cursor=cursor))
+        self.assertEqual(_node_struct(nodes), _node_struct([n for n, c in pairs[2:]]))
+        self.assertTrue(nodes[0].parsing_state.in_math_mode)
+
+    def test_stream_walker(self):
+        latextext = get_test_latex_data_with_possible_inconsistencies()
+        nodelist, _, _ = LatexWalker(latextext).get_latex_nodes()
+        for chunk_size in (1, 7, 16, 64, 100000):
+            sw = LatexStreamWalker(io.StringIO(unicode(latextext)), chunk_size=chunk_size)
+            nodes = list(sw.iter_latex_nodes())
+            self.assertEqual(_node_struct(nodes), _node_struct(nodelist))
+            self.assertEqual([ n.latex_verbatim() for n in nodes ],
+                             [ n.latex_verbatim() for n in nodelist ])
+
+    def test_stream_walker_verbatim_and_errors(self):
+        latextext = r'''Text \verb+{a}+ and
+\begin{verbatim}
+\unclosed{ $
+\end{verbatim}
+$x^2$ and {more'''
+        nodelist, _, _ = LatexWalker(latextext).get_latex_nodes()
+        for chunk_size in (1, 5, 32):
+            sw = LatexStreamWalker(io.StringIO(unicode(latextext)), chunk_size=chunk_size)
+            nodes = list(sw.iter_latex_nodes())
+            self.assertEqual(_node_struct(nodes), _node_struct(nodelist))
+            self.assertEqual(nodes[3].nodeargd.argnlist[0].latex_verbatim(),
+                             '\n\\unclosed{ $\n')
+
+        latextext = 'a\n\n\\textbf{b}\nand {c\n\n$x'
+        with self.assertRaises(LatexWalkerParseError) as cm:
+            LatexWalker(latextext, tolerant_parsing=False).get_latex_nodes()
+        e0 = cm.exception
+        for chunk_size in (1, 4, 64):
+            sw = LatexStreamWalker(io.StringIO(unicode(latextext)), chunk_size=chunk_size,
+                                   tolerant_parsing=False)
+            with self.assertRaises(LatexWalkerParseError) as cm:
+                list(sw.iter_latex_nodes())
+            e = cm.exception
+            self.assertEqual((e.pos, e.lineno, e.colno, e.open_contexts),
+                             (e0.pos, e0.lineno, e0.colno, e0.open_contexts))
+
+    def test_get_latex_nodes_after_edit(self):
+        rng = random.Random(1234)
+        pieces = ['{', '}', '$', '\\', r'\emph', '[', ']', r'\item', r'\begin{itemize}',
+                  r'\end{itemize}', 'a', ' ', '\n', '\n\n', '%', 'x y', r'\[', r'\]',
+                  '*', '--', '``', r'\verb+', '+', r'\(', r'\)']
+        valid_latextext = r'''\documentclass{article}
+\begin{document}
+\section*{Introduction}
+Some \emph{text} with $x^{2}$ and \[ a = b \] % comment
+\begin{itemize}
+\item[(a)] First item {\bfseries bold}
+\item Second \verb+{+ item
+\end{itemize}
+\begin{verbatim}
+verbatim } text
+\end{verbatim}
+Final ``text''---and more.
+\end{document}
+'''
+        for tolerant_parsing, latextext in (
+                (True, get_test_latex_data_with_possible_inconsistencies()),
+                (False, valid_latextext),
+        ):
+            nodelist = LatexWalker(latextext, tolerant_parsing=tolerant_parsing) \
+                .get_latex_nodes()[0]
+            for _ in range(60):
+                pos = rng.randrange(len(latextext) + 1)
+                removed_len = min(rng.choice([0, 0, 1, 2, 5, 20]), len(latextext) - pos)
+                inserted_chars = ''.join(rng.choice(pieces)
+                                         for _ in range(rng.choice([0, 1, 1, 2, 3])))
+                newtext = latextext[:pos] + inserted_chars + latextext[pos+removed_len:]
+                try:
+                    full_nodelist = LatexWalker(newtext, tolerant_parsing=tolerant_parsing) \
+                        .get_latex_nodes()[0]
+                except LatexWalkerParseError:
+                    with self.assertRaises(LatexWalkerParseError):
+                        LatexWalker(newtext, tolerant_parsing=tolerant_parsing) \
+                            .get_latex_nodes_after_edit(nodelist, pos, removed_len,
+                                                        inserted_chars)
+                    continue # don't apply this edit
+                nodelist = LatexWalker(newtext, tolerant_parsing=tolerant_parsing) \
+                    .get_latex_nodes_after_edit(nodelist, pos, removed_len, inserted_chars)
+                self.assertEqual(_node_struct(nodelist), _node_struct(full_nodelist))
+                self.assertEqual([ n.latex_verbatim() for n in nodelist ],
+                                 [ n.latex_verbatim() for n in full_nodelist ])
+                latextext = newtext
+
+    def test_get_latex_nodes_after_edit_reuses_nodes(self):
+        latextext = r'''\section{Intro}
+\begin{itemize}
+\item First \emph{point}
+\item Second point
+\end{itemize}
+Conclusion \textbf{here}.
+'''
+        nodelist = LatexWalker(latextext).get_latex_nodes()[0]
+        env = nodelist[2]
+        pos = latextext.find('Second')
+        newtext = latextext[:pos] + 'A ' + latextext[pos:]
+        lw = LatexWalker(newtext)
+        newnodelist = lw.get_latex_nodes_after_edit(nodelist, pos, 0, 'A ')
+        self.assertEqual(_node_struct(newnodelist),
+                         _node_struct(LatexWalker(newtext).get_latex_nodes()[0]))
+        # only the environment body was re-parsed, the other nodes were kept
+        for j in range(len(nodelist)):
+            self.assertIs(newnodelist[j], nodelist[j])
+        self.assertIs(env.nodelist[0], newnodelist[2].nodelist[0])
+        self.assertEqual(newnodelist[3].pos, latextext.find('Conclusion') - 1 + 2)
+        self.assertIs(newnodelist[3].parsing_state.s, newtext)
+        self.assertEqual(newnodelist[4].latex_verbatim(), r'\textbf{here}')
+
+        with self.assertRaises(ValueError):
+            lw.get_latex_nodes_after_edit(newnodelist, pos, 0, 'B ')
+
+    def test_nodes_fields_json_and_pickle(self):
+        latextext = r'''\textbf{Hi} % c
+\begin{itemize}\item[a] $x$ ~ {b}\end{itemize}'''
+        lw = LatexWalker(latextext)
+        nodelist, _, _ = lw.get_latex_nodes()
+        self.assertEqual(LatexMacroNode._fields,
+                         ('pos', 'len', 'macroname', 'nodeargd', 'macro_post_space'))
+        self.assertIs(nodelist[0]._fields, LatexMacroNode._fields)
+        self.assertEqual(nodelist[3]._redundant_fields[-3:], ('envname', 'optargs', 'args'))
+
+        # custom attributes can still be attached to nodes, and nodes can be
+        # weakly referenced
+        nodelist[1].myattr = 1
+        self.assertEqual(nodelist[1].myattr, 1)
+        self.assertIs(weakref.ref(nodelist[0])(), nodelist[0])
+
+        d = json.loads(json.dumps(nodelist, cls=make_json_encoder(lw)))
+        self.assertEqual([ n['nodetype'] for n in d ],
+                         [ 'LatexMacroNode', 'LatexCharsNode', 'LatexCommentNode',
+                           'LatexEnvironmentNode' ])
+        self.assertEqual(d[0]['macroname'], 'textbf')
+        self.assertEqual(d[0]['nodeargd']['argnlist'][0]['nodelist'][0]['chars'], 'Hi')
+        self.assertEqual(d[2]['comment'], ' c')
+        self.assertEqual((d[3]['pos'], d[3]['len'], d[3]['lineno'], d[3]['colno']),
+                         (16, len(latextext) - 16, 2, 0))
+
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            nodelist2 = pickle.loads(pickle.dumps(nodelist, protocol=protocol))
+            self.assertEqual(_node_struct(nodelist2), _node_struct(nodelist))
+            self.assertEqual(nodelist2[3].latex_verbatim(), nodelist[3].latex_verbatim())
+            self.assertEqual(nodelist2[1].myattr, 1)
+            self.assertFalse(hasattr(nodelist2[0], 'myattr'))
+
+    def test_nodes_legacy_subclass_fields(self):
+        class MyNode(LatexNode):
+            def __init__(self, myfield, **kwargs):
+                super(MyNode, self).__init__(_fields=('myfield',), **kwargs)
+                self.myfield = myfield
+
+        n = MyNode(myfield=3, pos=1, len=2)
+        self.assertEqual(n._fields, ('pos', 'len', 'myfield'))
+        self.assertEqual(n._redundant_fields, n._fields)
+        self.assertEqual(LatexNode._fields, ('pos', 'len'))
+        self.assertEqual(n, MyNode(myfield=3, pos=1, len=2))
+
+    @unittest.skipIf(tracemalloc is None, "tracemalloc not available")
+    def test_nodes_memory_footprint(self):
+        # benchmark: memory used per node (excluding the node's field values)
+        parsing_state = LatexWalker('').make_parsing_state()
+        nodeargd = macrospec.ParsedMacroArgs()
+        chars = 'abc'
+        num = 10000
+        for make_node, max_bytes_per_node in (
+                (lambda i: LatexCharsNode(parsing_state=parsing_state, chars=chars,
+                                          pos=i, len=3),
+                 150),
+                (lambda i: LatexMacroNode(parsing_state=parsing_state, macroname=chars,
+                                          nodeargd=nodeargd, macro_post_space=chars,
+                                          nodeargs=nodeargd.argnlist, pos=i, len=3),
+                 250),
+        ):
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                nodes = [ make_node(i) for i in range(num) ]
+                bytes_per_node = float(tracemalloc.get_traced_memory()[0] - before) / num
+            finally:
+                tracemalloc.stop()
+            self.assertLess(bytes_per_node, max_bytes_per_node)
+
+    def test_chars_node_lazy_chars(self):
+        latextext = r"Text \emph{a b} more text {x}  \relax and the end.  "
+        lw = LatexWalker(latextext)
+        nodelist = lw.get_latex_nodes()[0]
+        self.assertEqual(nodelist[0].chars, 'Text ')
+        self.assertEqual(nodelist[2].chars, ' more text ')
+        self.assertEqual(nodelist[-1].chars, 'and the end.  ')
+        self.assertEqual(nodelist[1].nodeargd.argnlist[0].nodelist[0].chars, 'a b')
+        # the chars are only extracted from the string when needed
+        self.assertIsNone(nodelist[0]._chars)
+        n2 = pickle.loads(pickle.dumps(nodelist[2]))
+        self.assertEqual(n2.chars, ' more text ')
+        # chars given explicitly are kept as they are
+        n = LatexCharsNode(chars='xyz', parsing_state=nodelist[0].parsing_state, pos=0, len=3)
+        self.assertEqual(n.chars, 'xyz')
+        n.chars = 'abc'
+        self.assertEqual(n.chars, 'abc')
+        self.assertEqual(LatexCharsNode('abc').chars, 'abc')
+        # whitespace-only nodes share their string
+        spacenodes = [ nn for nn in nodelist if nn.isNodeType(LatexCharsNode)
+                       and nn.chars == '  ' ]
+        self.assertEqual(len(spacenodes), 1)
+        nodelist2 = LatexWalker(r"{y}  \relax").get_latex_nodes()[0]
+        self.assertIs(nodelist2[1].chars, spacenodes[0].chars)
+
+    def test_latex_node_table(self):
+        latextext = get_test_latex_data_with_possible_inconsistencies() + \
+            r"\verb+a b+ \item[x] %comment" + "\n" + r"$$y$$ \(z\)"
+        lw = LatexWalker(latextext, tolerant_parsing=True)
+        nodelist = lw.get_latex_nodes()[0]
+        table = lw.get_latex_node_table()
+
+        self.assertIsInstance(table, LatexNodeTable)
+        nodes = table.get_nodelist()
+        self.assertEqual(_node_struct(nodes), _node_struct(nodelist))
+        self.assertIsInstance(nodes[0], LatexMacroNode)
+        self.assertEqual(nodes[0].latex_verbatim(), nodelist[0].latex_verbatim())
+        # legacy fields are available, too
+        self.assertEqual(_node_struct(nodes[0].nodeoptarg), _node_struct(nodelist[0].nodeoptarg))
+        (verbidx,) = table.iter_indices(LatexMacroNode, name='verb')
+        verb = table.get_node(verbidx)
+        self.assertEqual(verb.nodeargd.verbatim_text, 'a b')
+
+        # the columns describe the same tree, in document order
+        def walk(nodelist, parent):
+            for n in nodelist:
+                if n is None:
+                    continue
+                yield (n, parent)
+                for arg in (n.nodeargd.argnlist if getattr(n, 'nodeargd', None) is not None
+                            and type(n.nodeargd) is macrospec.ParsedMacroArgs else []):
+                    for x in walk([arg], n):
+                        yield x
+                for x in walk(getattr(n, 'nodelist', []), n):
+                    yield x
+        allnodes = list(walk(nodelist, None))
+        self.assertEqual(len(table), len(allnodes))
+        self.assertEqual(list(table.pos), [ n.pos for (n, _) in allnodes ])
+        self.assertEqual(list(table.len), [ n.len for (n, _) in allnodes ])
+        self.assertEqual(list(table.pos), sorted(table.pos))
+        rows = dict( (id(n), j) for (j, (n, _)) in enumerate(allnodes) )
+        self.assertEqual(list(table.parent),
+                         [ (rows[id(p)] if p is not None else -1) for (_, p) in allnodes ])
+        self.assertEqual([ table.get_name(j) for j in table.iter_indices(LatexMacroNode) ],
+                         [ n.macroname for (n, _) in allnodes if n.isNodeType(LatexMacroNode) ])
+        self.assertEqual(
+            list(table.iter_indices(LatexEnvironmentNode, name='align')),
+            [ j for (j, (n, _)) in enumerate(allnodes)
+              if n.isNodeType(LatexEnvironmentNode) and n.environmentname == 'align' ]
+        )
+        self.assertEqual(list(table.iter_indices(name='nonexistentmacro')), [])
+        self.assertEqual(table.get_name_id('nonexistentmacro'), -1)
+
+        # tables can be pickled
+        table2 = pickle.loads(pickle.dumps(table))
+        self.assertEqual(list(table2.kind), list(table.kind))
+        self.assertEqual(_node_struct(table2.get_node(5)), _node_struct(table.get_node(5)))
+
+    def test_latex_node_table_document(self):
+        # the usual case of a document which consists of a single environment
+        latextext = r'\begin{document}' + ''.join([
+            r'\section{S%d} Some \emph{text} with $x_%d$ and a {group} %% c' % (i, i)
+            + '\n\n'
+            for i in range(200)
+        ]) + r'\end{document}'
+        lw = LatexWalker(latextext)
+        table = lw.get_latex_node_table()
+        table_ref = LatexNodeTable()
+        table_ref.append_nodes(lw.get_latex_nodes()[0])
+        for name in ('kind', 'pos', 'len', 'parent', 'first_child', 'next_sibling',
+                     'arg_index', 'name_id', 'argspec_id', 'aux'):
+            self.assertEqual(list(getattr(table, name)), list(getattr(table_ref, name)))
+        self.assertEqual(table.names, table_ref.names)
+        self.assertEqual(_node_struct(table.get_nodelist()),
+                         _node_struct(table_ref.get_nodelist()))
+        self.assertEqual(len(list(table.iter_children(-1))), 1)
+
+        if tracemalloc is None:
+            return
+        # the node tree of the document is never built: the peak memory used
+        # while building the table is well below the size of the node tree
+        def measure(fn):
+            tracemalloc.start()
+            try:
+                result = fn()
+                return tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        (nodes_size, _) = measure(lambda: LatexWalker(latextext).get_latex_nodes())
+        (_, table_peak) = measure(lambda: LatexWalker(latextext).get_latex_node_table())
+        self.assertLess(table_peak, nodes_size / 2)
+
+    def test_latex_node_table_custom_nodes(self):
+        # nodes which are not of the standard classes are stored as they are
+        class MyNode(LatexNode):
+            def __init__(self, myfield, **kwargs):
+                super(MyNode, self).__init__(_fields=('myfield',), **kwargs)
+                self.myfield = myfield
+        mynode = MyNode(myfield=3, pos=1, len=2)
+        table = LatexNodeTable()
+        group = LatexWalker('{a}').get_latex_nodes()[0][0]
+        table.append_nodes([ mynode, group ])
+        self.assertEqual(list(table.kind), [ LatexNodeTable.KIND_OTHER,
+                                             LatexNodeTable.KIND_GROUP,
+                                             LatexNodeTable.KIND_CHARS ])
+        self.assertIs(table.get_node(0), mynode)
+        self.assertEqual(table.get_node(1).delimiters, ('{', '}'))
+        self.assertEqual(table.get_node(2).chars, 'a')
+
+    @unittest.skipIf(numpy is None, "NumPy not available")
+    def test_latex_node_table_numpy(self):
+        table = LatexWalker(r'\emph{a} b \emph{c}').get_latex_node_table()
+        columns = table.get_numpy_columns()
+        self.assertEqual(
+            list(numpy.nonzero(columns['name_id'] == table.get_name_id('emph'))[0]),
+            list(table.iter_indices(name='emph'))
+        )
+        self.assertEqual(list(columns['pos']), list(table.pos))
+
+    def test_shared_default_latex_context(self):
+        db = LatexWalker('a').make_parsing_state().latex_context
+        self.assertIs(LatexWalker('b').make_parsing_state().latex_context, db)
+        with self.assertRaises(TypeError):
+            db.add_context_category('my-category', macros=[ macrospec.std_macro('x', '{') ])
+        with self.assertRaises(TypeError):
+            db.set_unknown_macro_spec(macrospec.MacroSpec(''))
+        # opt out of the shared instance by providing a fresh modifiable copy
+        my_db = get_default_latex_context_db()
+        self.assertIsNot(my_db, db)
+        my_db.add_context_category('my-category', prepend=True,
+                                   macros=[ macrospec.std_macro('textbf', '{{') ])
+        lw = LatexWalker(r'\textbf{a}{b}', latex_context=my_db)
+        self.assertEqual(len(lw.get_latex_nodes()[0][0].nodeargd.argnlist), 2)
+        self.assertEqual(len(LatexWalker(r'\textbf{a}{b}').get_latex_nodes()[0]), 2)
+        # or with shared_default_context=False
+        lw = LatexWalker(r'\textbf{a}{b}', shared_default_context=False)
+        lw_db = lw.default_parsing_state.latex_context
+        self.assertIsNot(lw_db, db)
+        self.assertFalse(lw_db.is_frozen())
+        lw_db.add_context_category('my-category', prepend=True,
+                                   macros=[ macrospec.std_macro('textbf', '{{') ])
+        self.assertEqual(len(lw.get_latex_nodes()[0][0].nodeargd.argnlist), 2)
+        self.assertIsNot(
+            LatexWalker('a', shared_default_context=False).make_parsing_state().latex_context,
+            lw_db
+        )
+        self.assertIs(LatexWalker('b').make_parsing_state().latex_context, db)
+
+    def test_diagnostics(self):
+        latextext = get_test_latex_data_with_possible_inconsistencies()
+        diagnostics = []
+        lw = LatexWalker(latextext, tolerant_parsing=True, diagnostics=diagnostics)
+        nodes = lw.get_latex_nodes()[0]
+        # same nodes as without a diagnostics collector
+        self.assertEqual(_node_struct(nodes),
+                         _node_struct(LatexWalker(latextext, tolerant_parsing=True)
+                                      .get_latex_nodes()[0]))
+        self.assertGreater(len(diagnostics), 0)
+        for d in diagnostics:
+            self.assertIsInstance(d, LatexWalkerParseDiagnostic)
+            self.assertEqual((d.lineno, d.colno), lw.pos_to_lineno_colno(d.pos))
+        p = latextext.find(r'\end{zzzzz}')
+        d = [ d for d in diagnostics if d.pos == p ][0]
+        self.assertIn('zzzzz', d.msg)
+        d2 = pickle.loads(pickle.dumps(d))
+        self.assertEqual((d2.msg, d2.pos, d2.lineno, d2.colno),
+                         (d.msg, d.pos, d.lineno, d.colno))
+        # the records don't keep the parser (and the string) alive
+        for d in diagnostics:
+            self.assertFalse(hasattr(d, '__dict__'))
+            self.assertEqual([ type(getattr(d, a)) for a in ('lineno', 'colno') ],
+                             [ int, int ])
+
+    def test_parse_cache(self):
+        latextext = r'''\textbf{Hi} % c
+\begin{itemize}\item[a] $x$ ~ {b}\end{itemize}'''
+        expected = _node_struct(LatexWalker(latextext).get_latex_nodes())
+        tmpdir = tempfile.mkdtemp()
+        try:
+            cache = LatexParseCache(max_entries=2, directory=tmpdir)
+            result = LatexWalker(latextext, parse_cache=cache).get_latex_nodes()
+            self.assertEqual(_node_struct(result), expected)
+            self.assertIs(LatexWalker(latextext, parse_cache=cache).get_latex_nodes(),
+                          result)
+            self.assertEqual((cache.hits, cache.disk_hits, cache.misses), (1, 0, 1))
+            # partial parses and different flags or latex contexts are separate
+            lw = LatexWalker(latextext, parse_cache=cache)
+            self.assertEqual(len(lw.get_latex_nodes(read_max_nodes=1)[0]), 1)
+            LatexWalker(latextext, parse_cache=cache, tolerant_parsing=False) \
+                .get_latex_nodes()
+            db = get_default_latex_context_db()
+            # same specs as the default latex context -> hit
+            LatexWalker(latextext, parse_cache=cache, latex_context=db).get_latex_nodes()
+            db.add_context_category('my-category', prepend=True,
+                                    macros=[ macrospec.std_macro('textbf', '{{') ])
+            result2 = LatexWalker(latextext, parse_cache=cache,
+                                  latex_context=db).get_latex_nodes()
+            self.assertEqual(len(result2[0][0].nodeargd.argnlist), 2)
+            self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+            # new cache (e.g. in another process) with the same directory
+            cache2 = LatexParseCache(directory=tmpdir)
+            lw = LatexWalker(latextext, parse_cache=cache2)
+            result = lw.get_latex_nodes()
+            self.assertEqual((cache2.hits, cache2.disk_hits, cache2.misses), (1, 1, 0))
+            self.assertEqual(_node_struct(result), expected)
+            self.assertIs(result[0][0].parsing_state, lw._make_parsing_state())
+            self.assertIs(result[0][3].parsing_state.latex_context,
+                          lw.make_parsing_state().latex_context)
+            cache3 = LatexParseCache(directory=tmpdir, invalidation_key='v2')
+            LatexWalker(latextext, parse_cache=cache3).get_latex_nodes()
+            self.assertEqual((cache3.hits, cache3.misses), (0, 1))
+            cache2.clear(directory=True)
+            LatexWalker(latextext, parse_cache=cache2).get_latex_nodes()
+            self.assertEqual((cache2.hits, cache2.misses), (1, 1))
+
+            # missing directories are created with restricted permissions
+            cachedir = os.path.join(tmpdir, 'new-cache-dir')
+            cache4 = LatexParseCache(directory=cachedir)
+            LatexWalker(latextext, parse_cache=cache4).get_latex_nodes()
+            self.assertEqual((cache4.hits, cache4.misses), (0, 1))
+            if os.name == 'posix':
+                for (dirpath, dirnames, filenames) in os.walk(cachedir):
+                    self.assertEqual(stat.S_IMODE(os.stat(dirpath).st_mode), 0o700)
+                    for fn in filenames:
+                        self.assertEqual(
+                            stat.S_IMODE(os.stat(os.path.join(dirpath, fn)).st_mode) & 0o077,
+                            0
+                        )
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_get_latex_nodes_many(self):
+        latex_strings = [ r'\emph{%d} \begin{x}$y$\end{x}'%(i) for i in range(20) ]
+        expected = [ _node_struct(LatexWalker(x).get_latex_nodes()[0])
+                     for x in latex_strings ]
+        for jobs in (1, 2):
+            nodelists = list(get_latex_nodes_many(latex_strings, jobs=jobs, chunksize=3))
+            self.assertEqual([ _node_struct(n) for n in nodelists ], expected)
+            self.assertEqual(nodelists[4][0].latex_verbatim(), r'\emph{4}')
+
+    def test_get_latex_nodes_parallel(self):
+        pieces = [
+            r'\section{Intro %d} Some $x_{%d}$ text with \emph{emphasis}.',
+            'A paragraph with a comment %% { $ \\begin{x}\nand \\verb+\\section{%d}+.',
+            '\\begin{itemize}\n\\item one %d\n\n\\item two %d\n\\end{itemize}',
+            '{An open group %d\n\n\\section{not a cut %d}}',
+            '\\begin{verbatim}\n\\end{itemize} { %d\n\n%d\n\\end{verbatim}',
+            '\\[ a %d\n\n b %d \\]',
+        ]
+        latextext = '\n\n'.join( pieces[i % len(pieces)].replace('%d', str(i))
+                                 for i in range(120) )
+        (nodes_ref, pos_ref, len_ref) = LatexWalker(latextext).get_latex_nodes()
+        for jobs in (1, 2):
+            lw = LatexWalker(latextext)
+            (nodes, pos, len_) = lw.get_latex_nodes_parallel(jobs=jobs, chunk_size=200)
+            self.assertEqual((pos, len_), (pos_ref, len_ref))
+            self.assertEqual(_node_struct(nodes), _node_struct(nodes_ref))
+            self.assertIs(nodes[-1].parsing_state.s, latextext)
+
+        document = latextext
+
+        # no possible cut -- falls back to a serial parse
+        latextext = '{' + document + '}'
+        (nodes, pos, len_) = \
+            LatexWalker(latextext).get_latex_nodes_parallel(jobs=2, chunk_size=200)
+        self.assertEqual(_node_struct(nodes),
+                         _node_struct(LatexWalker(latextext).get_latex_nodes()[0]))
+
+        # the full result is the same as a serial parse, including the length
+        # of any trailing ignored content, and with other walker flags
+        for (latextext, chunk_size, kwargs) in [
+                ('para one\n\npara two }', 1, {}),
+                ('a \\end{x}'*400 + '\n\n' + 'a \\end{x}', 200, {}),
+                ('a \\end{x}'*400 + '\n\n' + 'a \\end{x} {b}} ', 200, {}),
+                (document, 200, dict(tokenize_chars_runs=False)),
+                (document, 200, dict(iterative_parsing=False)),
+                (document, 200, dict(parse_cache=LatexParseCache())),
+        ]:
+            lw = LatexWalker(latextext, **kwargs)
+            (nodes, pos, len_) = lw.get_latex_nodes_parallel(jobs=1, chunk_size=chunk_size)
+            (nodes_ref, pos_ref, len_ref) = \
+                LatexWalker(latextext, **kwargs).get_latex_nodes()
+            self.assertEqual((_node_struct(nodes), pos, len_),
+                             (_node_struct(nodes_ref), pos_ref, len_ref))
+
+        # parse errors are reported as in a serial parse
+        latextext = '\n\n'.join( 'Paragraph %d.'%(i) for i in range(200) )
+        k = latextext.index('Paragraph 150')
+        latextext = latextext[:k] + r'{a \end{x} b}' + latextext[k:]
+        with self.assertRaises(LatexWalkerParseError) as cm:
+            LatexWalker(latextext, tolerant_parsing=False) \
+                .get_latex_nodes_parallel(jobs=2, chunk_size=200)
+        self.assertEqual(cm.exception.pos, k + 3)
+        self.assertEqual((cm.exception.lineno, cm.exception.colno),
+                         LatexWalker(latextext).pos_to_lineno_colno(k + 3))
+
+    def test_stats(self):
+        latextext = r"""\textbf{A} and \frac{x}{\textbf{y}} a~b \begin{itemize}\item z
+\end{itemize} $x$ % c
+\end{x} }"""
+        for iterative_parsing in (True, False):
+            stats = PerformanceStats()
+            lw = LatexWalker(latextext, stats=stats, iterative_parsing=iterative_parsing)
+            (nodelist, pos, len_) = lw.get_latex_nodes()
+            self.assertEqual(stats.nodes, {
+                'LatexCharsNode': 11, 'LatexGroupNode': 4, 'LatexMacroNode': 4,
+                'LatexSpecialsNode': 1, 'LatexEnvironmentNode': 1, 'LatexMathNode': 1,
+                'LatexCommentNode': 1,
+            })
+            # (tokens may be read more than once)
+            self.assertGreaterEqual(stats.tokens['macro'], 4)
+            self.assertGreaterEqual(stats.tokens['comment'], 1)
+            self.assertGreaterEqual(stats.tokens['mathmode_inline'], 2)
+            self.assertNotIn(None, stats.tokens)
+            self.assertEqual(stats.recovered_errors, 2)
+            self.assertEqual(
+                stats.args_calls,
+                { r'\textbf': 2, r'\frac': 1, '~': 1, r'\begin{itemize}': 1, r'\item': 1 }
+            )
+            self.assertEqual(set(stats.args_time), set(stats.args_calls))
+            self.assertTrue(all( t >= 0 for t in stats.args_time.values() ))
+            self.assertIn(r'\frac', stats.format_report())
+            # the statistics don't change the result
+            self.assertEqual(_node_struct(nodelist),
+                             _node_struct(LatexWalker(latextext).get_latex_nodes()[0]))
+
+        # macros, environments and specials without arguments are listed by
+        # both parsers
+        latextext = r"""\alpha \beta{} \alpha \begin{center}x\end{center} a--b"""
+        for iterative_parsing in (True, False):
+            stats = PerformanceStats()
+            LatexWalker(latextext, stats=stats,
+                        iterative_parsing=iterative_parsing).get_latex_nodes()
+            self.assertEqual(stats.args_calls, {
+                r'\alpha': 2, r'\beta': 1, r'\begin{center}': 1, '--': 1,
+            })
+            self.assertEqual(set(stats.args_time), set(stats.args_calls))
+
+        stats.reset()
+        self.assertEqual((stats.tokens, stats.nodes, stats.recovered_errors), ({}, {}, 0))
+
+    def test_iter_latex_events(self):
+        latextext = r"""\textbf{A} % c
+{x $\alpha$} \begin{itemize}[a]\item z\end{itemize}~"""
+        self.assertEqual(
+            [ (ev.event, ev.pos, ev.len, ev.name, ev.latex_verbatim())
+              for ev in LatexWalker(latextext).iter_latex_events() ],
+            [ ('macro', 0, 10, 'textbf', r'\textbf{A}'),
+              ('chars', 10, 1, None, ' '),
+              ('comment', 11, 4, None, '% c\n'),
+              ('begin_group', 15, 1, None, '{'),
+              ('chars', 16, 2, None, 'x '),
+              ('begin_math', 18, 1, None, '$'),
+              ('macro', 19, 6, 'alpha', r'\alpha'),
+              ('end_math', 25, 1, None, '$'),
+              ('end_group', 26, 1, None, '}'),
+              ('chars', 27, 1, None, ' '),
+              ('begin_environment', 28, 18, 'itemize', r'\begin{itemize}[a]'),
+              ('macro', 46, 6, 'item', r'\item '),
+              ('chars', 52, 1, None, 'z'),
+              ('end_environment', 53, 13, 'itemize', r'\end{itemize}'),
+              ('specials', 66, 1, '~', '~') ]
+        )
+        events = list(LatexWalker(latextext).iter_latex_events())
+        self.assertEqual(events[2].comment, ' c')
+        self.assertEqual(events[4].chars, 'x ')
+        self.assertTrue(events[6].parsing_state.in_math_mode)
+        self.assertEqual((events[5].delimiters, events[5].displaytype), (('$', '$'), 'inline'))
+        self.assertEqual(_node_struct(events[10].nodeargd.argnlist),
+                         _node_struct(LatexWalker(latextext).get_latex_nodes()[0][5]
+                                      .nodeargd.argnlist))
+
+        # the events correspond to the nodes of get_latex_nodes(), including
+        # in case of errors
+        for latextext in [
+                get_test_latex_data_with_possible_inconsistencies(),
+                r'\section{A} $x$ $$y$$ \(z\) \[w\] {a {b}} \verb+x+ \begin{verbatim}x\end{verbatim}',
+                r'a {b \end{x} } c \) d $e \] f$ g } \begin{x} h \end{y} \end{x}',
+                r'\begin{equation} x \end{equation} \textbf{a',
+                r'x { $a \begin{x} \frac{b ',
+                r'{a ',
+        ]:
+            for tolerant_parsing in (True, False):
+                try:
+                    expected = _node_struct(
+                        LatexWalker(latextext, tolerant_parsing=tolerant_parsing)
+                        .get_latex_nodes()[0]
+                    )
+                except LatexWalkerParseError as e:
+                    expected = (e.msg, e.pos, e.open_contexts)
+                lw = LatexWalker(latextext, tolerant_parsing=tolerant_parsing)
+                try:
+                    result = _node_struct(_nodes_from_events(lw, lw.iter_latex_events()))
+                except LatexWalkerParseError as e:
+                    result = (e.msg, e.pos, e.open_contexts)
+                self.assertEqual(result, expected)
+
+        # no recursion limit
+        n = 2 * sys.getrecursionlimit()
+        events = list(LatexWalker('{' * n).iter_latex_events())
+        self.assertEqual([ ev.event for ev in events ],
+                         [ 'begin_group' ] * n + [ 'end_group' ] * n)
+
+    def test_extract_latex_nodes(self):
+        latextext = r"""\title{A \cite{x}} % \cite{no}
+\verb|\cite{no}| \begin{verbatim}\cite{no}\end{verbatim}
+\begin{abstract}Abstract \label{y}\end{abstract}
+$\cite[p]{z} \mbox{\cite{w}}$ \begin{equation}\label{e}\end{equation} \citep{v}
+"""
+        lw = LatexWalker(latextext)
+        nodes = lw.extract_latex_nodes(['title', 'cite', 'label'], ['abstract', 'foo'])
+        self.assertEqual(
+            [ n.latex_verbatim() for n in nodes ],
+            [ r'\title{A \cite{x}}', r'\begin{abstract}Abstract \label{y}\end{abstract}',
+              r'\cite[p]{z}', r'\cite{w}', r'\label{e}' ]
+        )
+        self.assertEqual(
+            [ (n.parsing_state.in_math_mode, n.parsing_state.math_mode_delimiter)
+              for n in nodes ],
+            [ (False, None), (False, None), (True, '$'), (False, None),
+              (True, '{equation}') ]
+        )
+        self.assertEqual(_node_struct(nodes[0]),
+                         _node_struct(lw.get_latex_nodes()[0][0]))
+        self.assertEqual(lw.extract_latex_nodes(), [])
+
+        # the same nodes as get_latex_nodes(), including in case of errors
+        macronames = ['cite', 'label', 'section', 'textbf']
+        environmentnames = ['itemize', 'equation']
+        for latextext in [
+                get_test_latex_data_with_possible_inconsistencies(),
+                r'\section{A} $x \label{a}$ $$y\textbf{z}$$ \(z\) \[\cite{w}\] {a {b}}',
+                r'a {b \end{x} \cite{a} } c \) d $e \] f \label{x} $ g } \begin{x} h \end{y}',
+                r'\begin{equation} x \end{equation} \begin{verbatim} \label{x}',
+                r'$ \verb+\cite{x}+ \mbox{ \begin{itemize} \cite{x} \end{itemize} } \label{y} $',
+                r'x { $a \begin{x} \frac{b \cite{c',
+                r'{a} $ {b} \label{x} $ {c $} \cite{y} {d} $ {e} \cite{z} {%} f',
+                r'$${{}$$ \label{x}',
+        ]:
+            for tolerant_parsing in (True, False):
+                try:
+                    expected = _node_struct(_find_latex_nodes(
+                        LatexWalker(latextext, tolerant_parsing=tolerant_parsing)
+                        .get_latex_nodes()[0],
+                        macronames, environmentnames
+                    ))
+                except LatexWalkerParseError:
+                    # parse errors outside the requested constructs are not
+                    # seen by extract_latex_nodes()
+                    continue
+                lw = LatexWalker(latextext, tolerant_parsing=tolerant_parsing)
+                self.assertEqual(
+                    _node_struct(lw.extract_latex_nodes(macronames, environmentnames)),
+                    expected
+                )
+
+        with self.assertRaises(LatexWalkerParseError):
+            LatexWalker(r'a } b \cite{c', tolerant_parsing=False) \
+                .extract_latex_nodes(['cite'])
+
+    def test_parse_error_lazy_lineno_colno(self):
+        latextext = 'a\nbc \\end{x} d'
+        lw = LatexWalker(latextext, tolerant_parsing=False)
+        with self.assertRaises(LatexWalkerParseError) as cm:
+            lw.get_latex_nodes()
+        e = cm.exception
+        self.assertEqual(e.pos, 5)
+        self.assertEqual((e.lineno, e.colno), lw.pos_to_lineno_colno(5))
+        self.assertIn('@(%d,%d)'%(e.lineno, e.colno), str(e))
+        # same args as when they were computed in the constructor
+        self.assertEqual(e.args, (e.msg + ' @(%d,%d)'%(e.lineno, e.colno),))
+        self.assertEqual(repr(e), 'LatexWalkerParseError({!r})'.format(e.args[0]))
+        self.assertEqual(LatexWalkerParseError('msg', pos=3, lineno=2, colno=1).args,
+                         ('msg @(2,1)',))
+        e2 = pickle.loads(pickle.dumps(e))
+        self.assertEqual((e2.msg, e2.pos, e2.lineno, e2.colno, e2.args),
+                         (e.msg, e.pos, e.lineno, e.colno, e.args))
+        with self.assertRaises(LatexWalkerParseError) as cm:
+            LatexWalker(r'x {\begin{a} y', tolerant_parsing=False).get_latex_nodes()
+        self.assertEqual([ c[:2] for c in cm.exception.open_contexts ],
+                         [ ('begin environment "a"', 3), ('open brace', 2) ])
+
+
+
+def _node_struct(n):
+    # Structural representation of nodes, which can be compared across
+    # different parsing state instances (LatexNode.__eq__ requires identical
+    # parsing state objects).
+    if n is None:
+        return None
+    if isinstance(n, (list, tuple)):
+        return [ _node_struct(x) for x in n ]
+    if isinstance(n, macrospec.ParsedMacroArgs):
+        return (n.__class__.__name__, n.argspec, _node_struct(n.argnlist))
+    if not hasattr(n, 'parsing_state'):
+        return n
+    d = [ n.nodeType().__name__,
+          (n.parsing_state.in_math_mode, n.parsing_state.math_mode_delimiter) ]
+    for f in n._fields:
+        v = getattr(n, f)
+        if isinstance(v, (list, tuple, macrospec.ParsedMacroArgs)) \
+           and f != 'delimiters':
+            v = _node_struct(v)
+        d.append( (f, v) )
+    return tuple(d)
+
+
+
+def _nodes_from_events(lw, events):
+    # Build the node tree from the events of iter_latex_events()
+    nodelists = [ [] ]
+    begin_events = []
+    for ev in events:
+        if ev.event.startswith('begin_'):
+            begin_events.append(ev)
+            nodelists.append([])
+            continue
+        if ev.event.startswith('end_'):
+            b = begin_events.pop()
+            nodelist = nodelists.pop()
+            kwargs = dict(parsing_state=b.parsing_state, nodelist=nodelist,
+                          pos=b.pos, len=ev.pos + ev.len - b.pos)
+            if ev.event == 'end_group':
+                node = lw.make_node(LatexGroupNode, delimiters=b.delimiters, **kwargs)
+            elif ev.event == 'end_math':
+                node = lw.make_node(LatexMathNode, delimiters=b.delimiters,
+                                    displaytype=b.displaytype, **kwargs)
+            else:
+                node = lw.make_node(LatexEnvironmentNode, environmentname=b.name,
+                                    nodeargd=b.nodeargd, **kwargs)
+        else:
+            kwargs = dict(parsing_state=ev.parsing_state, pos=ev.pos, len=ev.len)
+            if ev.event == 'chars':
+                node = lw.make_node(LatexCharsNode, chars=ev.chars, **kwargs)
+            elif ev.event == 'comment':
+                node = lw.make_node(LatexCommentNode, comment=ev.comment,
+                                    comment_post_space=ev.post_space, **kwargs)
+            elif ev.event == 'macro':
+                node = lw.make_node(LatexMacroNode, macroname=ev.name, nodeargd=ev.nodeargd,
+                                    macro_post_space=ev.post_space, **kwargs)
+            else:
+                node = lw.make_node(LatexSpecialsNode, specials_chars=ev.name,
+                                    nodeargd=ev.nodeargd, **kwargs)
+        nodelists[-1].append(node)
+    assert len(nodelists) == 1
+    return nodelists[0]
+
+
+
+def _find_latex_nodes(nodelist, macronames, environmentnames):
+    # The outermost nodes of the given macros and environments in the node tree
+    # `nodelist`, in document order, see LatexWalker.extract_latex_nodes()
+    found = []
+    for n in nodelist:
+        if n is None:
+            continue
+        if (n.isNodeType(LatexMacroNode) and n.macroname in macronames) \
+           or (n.isNodeType(LatexEnvironmentNode) and n.environmentname in environmentnames):
+            found.append(n)
+            continue
+        children = []
+        if getattr(n, 'nodeargd', None) is not None:
+            children += n.nodeargd.argnlist
+        if getattr(n, 'nodelist', None) is not None:
+            children += n.nodelist
+        found += _find_latex_nodes(children, macronames, environmentnames)
+    return found
 
 
 
@@ -1,6 +1,7 @@
 import unittest
 import sys
 import logging
+import pickle
 
 if sys.version_info.major > 2:
     def unicode(string): return string
@@ -8,7 +9,7 @@ if sys.version_info.major > 2:
 
 from pylatexenc.macrospec import (
     ParsedMacroArgs, MacroStandardArgsParser,
-    MacroSpec, EnvironmentSpec, #SpecialsSpec,
+    MacroSpec, EnvironmentSpec, SpecialsSpec,
     std_macro, std_environment, LatexContextDb
 )
 
@@ -209,6 +210,41 @@ class TestMacroStandardArgsParser(unittest.TestCase, MyAsserts):
 
 
 
+    def test_no_args(self):
+        lw = latexwalker.LatexWalker(r'\cmd {ab}')
+        s = MacroStandardArgsParser('')
+        (argd, p, l) = s.parse_args(lw, len(r'\cmd'))
+        self.assertPMAEqual(argd, ParsedMacroArgs(argspec='', argnlist=[]))
+        self.assertEqual((p, l), (len(r'\cmd'), 0))
+        # each call returns a fresh object
+        self.assertIsNot(s.parse_args(lw, len(r'\cmd'))[0], argd)
+
+    def test_args_math_mode(self):
+        lw = latexwalker.LatexWalker(r'\cmd{a}{b}{c}')
+        s = MacroStandardArgsParser('{{{', args_math_mode=[True, False, None])
+        parsing_state = lw.make_parsing_state(in_math_mode=True)
+        (argd, p, l) = s.parse_args(lw, len(r'\cmd'), parsing_state=parsing_state)
+        self.assertEqual([ n.parsing_state.in_math_mode for n in argd.argnlist ],
+                         [ True, False, True ])
+        self.assertIs(argd.argnlist[0].parsing_state, parsing_state)
+        self.assertIs(argd.argnlist[2].parsing_state, parsing_state)
+
+        with self.assertRaises(ValueError):
+            MacroStandardArgsParser('{{', args_math_mode=[True]).parse_args(lw, 4)
+
+    def test_changed_argspec_and_pickle(self):
+        lw = latexwalker.LatexWalker(r'\cmd{a}[b]')
+        s = MacroStandardArgsParser('{')
+        # the attributes can still be changed after the constructor was called
+        s.argspec = '{['
+        (argd, p, l) = s.parse_args(lw, len(r'\cmd'))
+        self.assertEqual(argd.argspec, '{[')
+        self.assertEqual(argd.argnlist[1].nodelist[0].chars, 'b')
+        s2 = pickle.loads(pickle.dumps(s))
+        (argd2, p2, l2) = s2.parse_args(lw, len(r'\cmd'))
+        self.assertEqual((p2, l2), (p, l))
+        self.assertEqual(argd2.argnlist[1].nodelist[0].chars, 'b')
+
     def test_custom_argparser_absorb_all_detected_args(self):
 
         class AbsorbAllDetectedPossibleMacroArgumentsParser(MacroStandardArgsParser):
@@ -600,6 +636,172 @@ class TestLatexContextDb(unittest.TestCase):
         self.assertEqual(db2.get_environment_spec('eddd').environmentname, '<env unknown>')
         self.assertEqual(db2.get_environment_spec('eddd').args_parser.argspec, '')
 
+    def test_lookups_after_modifications(self):
+
+        db = LatexContextDb()
+        db.add_context_category('cat1',
+                                [ std_macro('aaa', '{'), std_macro('bbb', '[{[') ],
+                                [ std_environment('eaaa', '{') ],
+                                [ SpecialsSpec('~') ])
+        self.assertEqual(db.get_macro_spec('aaa').args_parser.argspec, '{')
+        self.assertIsNone(db.get_macro_spec('ccc'))
+        self.assertIsNone(db.get_environment_spec('ebbb'))
+        self.assertEqual(db.get_specials_spec('~').specials_chars, '~')
+        self.assertIsNone(db.get_specials_spec('!'))
+
+        db.add_context_category('cat2',
+                                [ std_macro('aaa', '[{'), std_macro('ccc', None) ],
+                                [ std_environment('ebbb', '[{') ],
+                                [ SpecialsSpec('!') ],
+                                prepend=True)
+        self.assertEqual(db.get_macro_spec('aaa').args_parser.argspec, '[{')
+        self.assertEqual(db.get_macro_spec('bbb').args_parser.argspec, '[{[')
+        self.assertEqual(db.get_macro_spec('ccc').args_parser.argspec, '')
+        self.assertEqual(db.get_environment_spec('ebbb').args_parser.argspec, '[{')
+        self.assertEqual(db.get_specials_spec('!').specials_chars, '!')
+
+        db.set_unknown_macro_spec(MacroSpec('<macro unknown>'))
+        db.set_unknown_environment_spec(EnvironmentSpec('<env unknown>'))
+        db.set_unknown_specials_spec(SpecialsSpec('<specials unknown>'))
+        self.assertEqual(db.get_macro_spec('ddd').macroname, '<macro unknown>')
+        self.assertEqual(db.get_environment_spec('eddd').environmentname, '<env unknown>')
+        self.assertEqual(db.get_specials_spec('?').specials_chars, '<specials unknown>')
+
+    def test_freeze(self):
+
+        db = LatexContextDb()
+        db.set_unknown_macro_spec(MacroSpec('<macro unknown>'))
+        db.add_context_category('cat1',
+                                [ std_macro('aaa', '{'), std_macro('bbb', '[{[') ],
+                                [ std_environment('eaaa', '{') ],
+                                [ SpecialsSpec('~') ])
+        fdb = db.freeze()
+        self.assertFalse(db.is_frozen())
+        self.assertTrue(fdb.is_frozen())
+        self.assertIs(fdb.freeze(), fdb)
+        with self.assertRaises(TypeError):
+            fdb.add_context_category('cat2', [ std_macro('ccc', '{') ])
+        with self.assertRaises(TypeError):
+            fdb.set_unknown_environment_spec(EnvironmentSpec('<env unknown>'))
+        self.assertEqual(fdb.get_macro_spec('bbb').args_parser.argspec, '[{[')
+        self.assertEqual(fdb.get_macro_spec('ccc').macroname, '<macro unknown>')
+        self.assertEqual(fdb.test_for_specials('a~b', 1).specials_chars, '~')
+
+        # original object is still modifiable, and changes don't affect the
+        # frozen copy
+        db.add_context_category('cat2', [ std_macro('ccc', '{') ], prepend=True)
+        self.assertEqual(db.get_macro_spec('ccc').args_parser.argspec, '{')
+        self.assertEqual(fdb.get_macro_spec('ccc').macroname, '<macro unknown>')
+
+        # filter_context() gives a modifiable copy
+        db2 = fdb.filter_context()
+        db2.add_context_category('cat2', [ std_macro('ccc', '{{') ])
+        self.assertEqual(db2.get_macro_spec('ccc').args_parser.argspec, '{{')
+
+    def test_freeze_subclass(self):
+
+        class MyLatexContextDb(LatexContextDb):
+            def __init__(self, special_chars):
+                super(MyLatexContextDb, self).__init__()
+                self.special_chars = special_chars
+            def get_macro_spec(self, macroname):
+                if macroname == 'zzz':
+                    return std_macro('zzz', '{{')
+                return super(MyLatexContextDb, self).get_macro_spec(macroname)
+            def test_for_specials(self, s, pos, parsing_state=None):
+                if s.startswith(self.special_chars, pos):
+                    return SpecialsSpec(self.special_chars)
+                return None
+
+        db = MyLatexContextDb('!!')
+        db.add_context_category('cat1', [ std_macro('aaa', '{') ])
+        fdb = db.freeze()
+        self.assertIsInstance(fdb, MyLatexContextDb)
+        self.assertTrue(fdb.is_frozen())
+        self.assertEqual(fdb.special_chars, '!!')
+        self.assertEqual(fdb.get_macro_spec('aaa').args_parser.argspec, '{')
+        self.assertEqual(fdb.get_macro_spec('zzz').args_parser.argspec, '{{')
+        self.assertEqual(fdb.test_for_specials('a!!b', 1).specials_chars, '!!')
+        with self.assertRaises(TypeError):
+            fdb.add_context_category('cat2', [ std_macro('ccc', '{') ])
+
+        # the frozen subclass instance is used when parsing
+        lw = latexwalker.LatexWalker(r'\zzz{x}{y}!!', latex_context=fdb)
+        nodes, _, _ = lw.get_latex_nodes()
+        self.assertEqual([n.__class__ for n in nodes],
+                         [latexwalker.LatexMacroNode, latexwalker.LatexSpecialsNode])
+        self.assertEqual(len(nodes[0].nodeargd.argnlist), 2)
+
+    def test_freeze_pickle(self):
+        import pickle
+
+        db = latexwalker.get_default_latex_context_db().freeze()
+        db2 = pickle.loads(pickle.dumps(db, protocol=2))
+        self.assertTrue(db2.is_frozen())
+        self.assertEqual(db2.categories(), db.categories())
+        self.assertEqual(db2.get_macro_spec('textbf').args_parser.argspec,
+                         db.get_macro_spec('textbf').args_parser.argspec)
+        latex = r'\textbf{A} \begin{equation}x~y\end{equation}'
+        def _parse(db):
+            nodes = latexwalker.LatexWalker(latex, latex_context=db).get_latex_nodes()[0]
+            return [ (n.nodeType(), n.pos, n.len) for n in nodes ] \
+                + [ (n.nodeType(), n.pos, n.len) for n in nodes[2].nodelist ]
+        self.assertEqual(_parse(db2), _parse(db))
+
+        # the shared default latex context is pickled by reference
+        shared_db = latexwalker.LatexWalker('').make_parsing_state().latex_context
+        data = pickle.dumps(shared_db, protocol=2)
+        self.assertLess(len(data), 200)
+        self.assertIs(pickle.loads(data), shared_db)
+
+    def test_test_for_specials(self):
+
+        db = LatexContextDb()
+        db.add_context_category('cat1', specials=[
+            SpecialsSpec('`'), SpecialsSpec('-'), SpecialsSpec('---', args_parser='{'),
+        ])
+        db.add_context_category('cat2', specials=[
+            SpecialsSpec('``'), SpecialsSpec('--'), SpecialsSpec('-', args_parser='['),
+        ])
+
+        s = 'a `` b ` c - d -- e --- f ---- g'
+        def spec_at(c):
+            return db.test_for_specials(s, s.index(c) + 2)
+
+        self.assertIsNone(db.test_for_specials(s, 0))
+        self.assertIsNone(db.test_for_specials(s, len(s)))
+        # longest match wins across categories
+        self.assertEqual(spec_at('a').specials_chars, '``')
+        self.assertEqual(spec_at('b').specials_chars, '`')
+        self.assertEqual(spec_at('d').specials_chars, '--')
+        self.assertEqual(spec_at('e').specials_chars, '---')
+        self.assertEqual(spec_at('f').specials_chars, '---')
+        # same specials in two categories -> the first category wins
+        self.assertEqual(spec_at('c').specials_chars, '-')
+        self.assertIsNone(spec_at('c').args_parser)
+
+        # the lookup index is updated when new categories are added
+        db.add_context_category('cat3', specials=[ SpecialsSpec('c -') ], prepend=True)
+        self.assertEqual(db.test_for_specials(s, s.index('c')).specials_chars, 'c -')
+
+    def test_fingerprint(self):
+        def make_db(argspec, c=1):
+            db = LatexContextDb()
+            db.add_context_category('cat1', macros=[ std_macro('a', argspec) ],
+                                    specials=[ SpecialsSpec('~') ])
+            db.add_context_category('cat2', environments=[
+                EnvironmentSpec('e', args_parser=MacroStandardArgsParser('[')),
+            ], macros=[ MacroSpec('f', args_parser=lambda x: x + c) ])
+            return db
+        db = make_db('{')
+        fp = db.fingerprint()
+        self.assertEqual(make_db('{').fingerprint(), fp)
+        self.assertEqual(db.freeze().fingerprint(), fp)
+        self.assertNotEqual(make_db('{{').fingerprint(), fp)
+        self.assertNotEqual(make_db('{', c=2).fingerprint(), fp)
+        db.set_unknown_macro_spec(MacroSpec(''))
+        self.assertNotEqual(db.fingerprint(), fp)
+
 
         
 
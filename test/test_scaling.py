@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+import unittest
+
+import os
+import gc
+import math
+import time
+import logging
+
+from pylatexenc.latexwalker import LatexWalker
+from pylatexenc.latex2text import LatexNodes2Text
+
+try:
+    _clock = time.perf_counter
+except AttributeError:
+    # Python 2
+    _clock = time.time
+
+
+# Families of pathological inputs, as a function of a repetition count `n`.
+# The flat families are also converted to text; the nested families create
+# node trees whose depth grows with `n`, which LatexNodes2Text (which is
+# recursive) can't handle at the sizes used here.
+_flat_families = [
+    ('unclosed_inline_math', lambda n: 'x $ ' + 'a {b} c ' * n),
+    ('unclosed_display_math', lambda n: 'x $$ ' + 'a {b} c ' * n),
+    ('alternating_dollars', lambda n: 'a $b $$ c ' * n),
+    ('unterminated_brace', lambda n: '{ ' + 'a {b} c ' * n),
+    ('stray_end_environment', lambda n: r'a \end{x} ' * n),
+    ('stray_end_environment_in_group', lambda n: '{' + r'a \end{x} ' * n + '}'),
+    ('stray_closing_braces', lambda n: 'a } ] ' * n),
+    ('stray_closing_math', lambda n: r'a \) \] ' * n),
+    ('begin_storm_balanced', lambda n: (r'\begin{x}' * 10 + 'a' + r'\end{x}' * 10 + ' ') * n),
+    ('begin_without_name', lambda n: r'\begin a ' * n),
+    ('comment_lines', lambda n: '% a comment {$\\begin{x}\n' * n),
+    ('long_comment', lambda n: '%' + 'a comment {$ ' * n),
+    ('unterminated_verb', lambda n: r'\verb+ a ' * n),
+]
+
+_nested_families = [
+    ('nested_unterminated_braces', lambda n: '{a ' * n),
+    ('nested_unclosed_math', lambda n: r'\( a ' * n),
+    ('begin_storm', lambda n: r'\begin{x} a ' * n),
+    ('unterminated_verbatim_environments', lambda n: r'\begin{verbatim} a ' * n),
+    ('unterminated_optional_args', lambda n: r'\section[' * n),
+    ('unterminated_mandatory_args', lambda n: r'\frac{' * n),
+]
+
+
+# These tests measure the time of the calls, so they can fail on a busy
+# machine; they only run if this environment variable is set to a nonempty
+# value, e.g. ``PYLATEXENC_TEST_SCALING=1 python -m pytest test/test_scaling.py``
+_enable_env_var = 'PYLATEXENC_TEST_SCALING'
+
+# Time of the smallest measurement, and number of times each measurement is
+# repeated (the best time is kept)
+_min_time = 0.05
+_repeat = 3
+# Number of times the size is doubled
+_num_doublings = 3
+# Maximal exponent `k` in time ~ size^k.  Linear is 1, quadratic is 2; the
+# threshold leaves room for timing noise.
+_max_exponent = 1.5
+# Number of times a family's measurement is made before reporting it as
+# scaling badly, in case another process interfered with the timing
+_attempts = 3
+
+
+def _time_call(fn, arg):
+    gcold = gc.isenabled()
+    gc.disable()
+    try:
+        best = None
+        for _ in range(_repeat):
+            t0 = _clock()
+            fn(arg)
+            dt = _clock() - t0
+            if best is None or dt < best:
+                best = dt
+        return best
+    finally:
+        if gcold:
+            gc.enable()
+
+
+def _scaling_exponent(fn, make_input):
+    # find a size for which the call takes long enough to be timed reliably
+    n = 16
+    while _time_call(fn, make_input(n)) < _min_time:
+        n *= 2
+    sizes = [ n * 2**j for j in range(_num_doublings + 1) ]
+    times = [ _time_call(fn, make_input(size)) for size in sizes ]
+    # least-squares slope in log-log scale
+    xs = [ math.log(size) for size in sizes ]
+    ys = [ math.log(max(t, 1e-9)) for t in times ]
+    xm = sum(xs) / len(xs)
+    ym = sum(ys) / len(ys)
+    slope = sum( (x - xm) * (y - ym) for (x, y) in zip(xs, ys) ) \
+        / sum( (x - xm)**2 for x in xs )
+    return slope, list(zip(sizes, times))
+
+
+def _get_latex_nodes(s):
+    LatexWalker(s).get_latex_nodes()
+
+def _latex_to_text(s):
+    LatexNodes2Text().latex_to_text(s)
+
+def _extract_latex_nodes(s):
+    LatexWalker(s).extract_latex_nodes(['section', 'frac', 'verb'], ['x'])
+
+
+@unittest.skipUnless(os.environ.get(_enable_env_var),
+                     "timing-based; set {}=1 to run".format(_enable_env_var))
+class TestScaling(unittest.TestCase):
+
+    def setUp(self):
+        # tolerant parsing reports lots of errors
+        self._logger = logging.getLogger('pylatexenc')
+        self._logger_level = self._logger.level
+        self._logger.setLevel(logging.CRITICAL)
+
+    def tearDown(self):
+        self._logger.setLevel(self._logger_level)
+
+    def assert_near_linear(self, fn, families):
+        for (name, make_input) in families:
+            for _ in range(_attempts):
+                (slope, measurements) = _scaling_exponent(fn, make_input)
+                if slope < _max_exponent:
+                    break
+            self.assertLess(
+                slope, _max_exponent,
+                "{}() scales as size^{:.2f} for '{}' (size, time: {})".format(
+                    fn.__name__.lstrip('_'), slope, name,
+                    ', '.join('{}: {:.4f}s'.format(size, t) for (size, t) in measurements)
+                )
+            )
+
+    def test_get_latex_nodes(self):
+        self.assert_near_linear(_get_latex_nodes, _flat_families + _nested_families)
+
+    def test_latex_to_text(self):
+        self.assert_near_linear(_latex_to_text, _flat_families)
+
+    def test_extract_latex_nodes(self):
+        self.assert_near_linear(_extract_latex_nodes, _flat_families + _nested_families)
+
+    def test_get_token_begin(self):
+        # the time needed to tokenize a \begin{...} must not depend on the
+        # amount of text that follows it
+
+        def time_per_begin(filler):
+            latextext = ''.join([ r'\begin{itemize}' + filler + r'\end{itemize}'
+                                  for _ in range(200) ])
+            lw = LatexWalker(latextext)
+            positions = []
+            p = latextext.find(r'\begin')
+            while p != -1:
+                positions.append(p)
+                p = latextext.find(r'\begin', p+1)
+            def get_tokens(positions):
+                for p in positions:
+                    lw.get_token(pos=p)
+            # the token cache remembers only the last few positions read, so
+            # the tokens are actually read again at each repetition
+            return _time_call(get_tokens, positions) / len(positions)
+
+        for _ in range(_attempts):
+            t_small = time_per_begin('x'*10)
+            t_large = time_per_begin('x'*20000) # document ~400x larger
+            if t_large < 5*t_small + 2e-6:
+                break
+        self.assertLess(t_large, 5*t_small + 2e-6)
+
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG)
+    unittest.main()